@@ -0,0 +1,273 @@
+import asyncio
+import random
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+
+TS_PACKET: int = 188
+
+
+@dataclass
+class CDNProfile:
+    """模擬 CDN 的網路狀況"""
+    latency_ms: float = 20.0
+    jitter_ms: float = 5.0
+    # 每個回應的頻寬上限，0 表示不限制
+    bandwidth_kbps: int = 0
+    # 以 503 + Retry-After 回應的比例
+    error_rate: float = 0.0
+    # 傳到一半就斷線的比例
+    truncate_rate: float = 0.0
+    seed: int = 1
+
+
+@dataclass
+class CDNStats:
+    requests: int = 0
+    bytes_sent: int = 0
+    injected_errors: int = 0
+    injected_truncations: int = 0
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return (8 + len(payload)).to_bytes(4, 'big') + box_type + payload
+
+
+class SyntheticMedia:
+    """產生結構正確（box / TS 封包）但內容隨機的 DASH 與 HLS 片段"""
+
+    def __init__(
+        self,
+        segments: int = 300,
+        video_segment_kb: int = 512,
+        audio_segment_kb: int = 32,
+        segment_ms: int = 2000,
+    ) -> None:
+        self.segments: int = segments
+        self.segment_ms: int = segment_ms
+        self.sizes: Dict[str, int] = {'v1': video_segment_kb * 1024, 'a1': audio_segment_kb * 1024}
+        self._noise: bytes = random.Random(0).randbytes(max(self.sizes.values()) + TS_PACKET)
+        self._real: Dict[str, Tuple[bytes, List[bytes]]] = {}
+
+    def load_real(self, fragments: Dict[str, Tuple[bytes, List[bytes]]]) -> None:
+        """改用 ffmpeg 產生的真實 fMP4 片段，供混流階段量測"""
+        self._real = fragments
+        self.segments = min(len(segs) for _, segs in fragments.values())
+
+    def init(self, rep: str) -> bytes:
+        if rep in self._real:
+            return self._real[rep][0]
+        return _box(b'ftyp', b'iso6\x00\x00\x00\x00iso6dash') + _box(b'moov', _box(b'free', rep.encode() * 64))
+
+    def mp4_segment(self, rep: str, index: int) -> bytes:
+        if rep in self._real:
+            return self._real[rep][1][index]
+        size: int = self.sizes[rep]
+        head: bytes = _box(b'styp', b'msdh\x00\x00\x00\x00msdh') + _box(b'moof', _box(b'mfhd', index.to_bytes(8, 'big')))
+        return head + _box(b'mdat', self._noise[:max(0, size - len(head) - 8)])
+
+    def ts_segment(self, rep: str, index: int) -> bytes:
+        packets: int = max(1, self.sizes[rep] // TS_PACKET)
+        payload: bytes = self._noise[index % 7:index % 7 + 187]
+        return (b'\x47' + payload) * packets
+
+    def mpd(self) -> str:
+        duration_s: float = self.segments * self.segment_ms / 1000
+
+        def adaptation(mime: str, rep: str, attrs: str) -> str:
+            return (
+                f'    <AdaptationSet mimeType="{mime}" segmentAlignment="true">\n'
+                f'      <Representation id="{rep}" {attrs}>\n'
+                f'        <SegmentTemplate timescale="1000" initialization="init_$RepresentationID$.mp4" '
+                f'media="seg_$RepresentationID$_$Time$.m4s">\n'
+                f'          <SegmentTimeline><S t="0" d="{self.segment_ms}" r="{self.segments - 1}"/></SegmentTimeline>\n'
+                f'        </SegmentTemplate>\n'
+                f'      </Representation>\n'
+                f'    </AdaptationSet>\n'
+            )
+
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{duration_s:.3f}S" minBufferTime="PT2S">\n'
+            '  <Period id="0" start="PT0S">\n'
+            + adaptation('video/mp4', 'v1', 'bandwidth="2000000" codecs="avc1.64001f" width="1280" height="720"')
+            + adaptation('audio/mp4', 'a1', 'bandwidth="128000" codecs="mp4a.40.2" audioSamplingRate="48000"')
+            + '  </Period>\n</MPD>\n'
+        )
+
+    def m3u8(self, rep: str) -> str:
+        seconds: float = self.segment_ms / 1000
+        lines: List[str] = [
+            '#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{int(seconds + 0.999)}',
+            '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD',
+        ]
+        for i in range(self.segments):
+            lines += [f'#EXTINF:{seconds:.3f},', f'{i}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def hls_urls(self, base_url: str, rep: str) -> Tuple[str, ...]:
+        return tuple(f"{base_url}/hls/{rep}/{i}.ts" for i in range(self.segments))
+
+
+def split_fmp4(data: bytes) -> Tuple[bytes, List[bytes]]:
+    """把 fragmented MP4 拆成 init（ftyp + moov）與每個 moof + mdat 片段"""
+    init: bytearray = bytearray()
+    fragments: List[bytes] = []
+    current: bytearray = bytearray()
+    pos: int = 0
+    while pos + 8 <= len(data):
+        size: int = int.from_bytes(data[pos:pos + 4], 'big')
+        box_type: bytes = data[pos + 4:pos + 8]
+        if size == 1:
+            size = int.from_bytes(data[pos + 8:pos + 16], 'big')
+        elif size == 0:
+            size = len(data) - pos
+        box: bytes = data[pos:pos + size]
+        if box_type in (b'ftyp', b'moov'):
+            init += box
+        elif box_type in (b'styp', b'sidx', b'moof'):
+            current += box
+        elif box_type == b'mdat':
+            current += box
+            fragments.append(bytes(current))
+            current = bytearray()
+        pos += size
+    if current:
+        fragments.append(bytes(current))
+    return bytes(init), fragments
+
+
+def generate_real_media(cache_dir: Path, seconds: int, segment_ms: int) -> Optional[Dict[str, Tuple[bytes, List[bytes]]]]:
+    """用 ffmpeg 產生測試影音並切成片段；沒有 ffmpeg 時回傳 None"""
+    if shutil.which('ffmpeg') is None:
+        return None
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    frag_us: str = str(segment_ms * 1000)
+    outputs: Dict[str, Path] = {'v1': cache_dir / f'video_{seconds}.mp4', 'a1': cache_dir / f'audio_{seconds}.mp4'}
+    commands: Dict[str, List[str]] = {
+        'v1': [
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(segment_ms * 30 // 1000),
+            '-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-frag_duration', frag_us, str(outputs['v1']),
+        ],
+        'a1': [
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-c:a', 'aac', '-b:a', '128k',
+            '-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-frag_duration', frag_us, str(outputs['a1']),
+        ],
+    }
+    fragments: Dict[str, Tuple[bytes, List[bytes]]] = {}
+    for rep, output in outputs.items():
+        if not output.exists():
+            subprocess.run(commands[rep], check=True)
+        fragments[rep] = split_fmp4(output.read_bytes())
+    return fragments
+
+
+class SyntheticCDN:
+    """本機 aiohttp 伺服器，依 CDNProfile 注入延遲、頻寬限制與錯誤"""
+
+    def __init__(self, media: SyntheticMedia, profile: CDNProfile) -> None:
+        self.media: SyntheticMedia = media
+        self.profile: CDNProfile = profile
+        self.stats: CDNStats = CDNStats()
+        self.base_url: str = ''
+        self._rng: random.Random = random.Random(profile.seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.app: web.Application = web.Application()
+        self.app.router.add_get('/dash/manifest.mpd', self._mpd)
+        self.app.router.add_get('/dash/init_{rep}.mp4', self._dash_init)
+        self.app.router.add_get('/dash/seg_{rep}_{time}.m4s', self._dash_segment)
+        self.app.router.add_get('/hls/{rep}.m3u8', self._m3u8)
+        self.app.router.add_get('/hls/{rep}/{index}.ts', self._ts_segment)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port: int = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _mpd(self, request: web.Request) -> web.StreamResponse:
+        return await self._send(request, self.media.mpd().encode(), 'application/dash+xml')
+
+    async def _m3u8(self, request: web.Request) -> web.StreamResponse:
+        return await self._send(request, self.media.m3u8(request.match_info['rep']).encode(), 'application/vnd.apple.mpegurl')
+
+    async def _dash_init(self, request: web.Request) -> web.StreamResponse:
+        return await self._send(request, self.media.init(request.match_info['rep']), 'video/mp4')
+
+    async def _dash_segment(self, request: web.Request) -> web.StreamResponse:
+        rep: str = request.match_info['rep']
+        index: int = int(request.match_info['time']) // self.media.segment_ms
+        if rep not in self.media.sizes or not 0 <= index < self.media.segments:
+            raise web.HTTPNotFound()
+        return await self._send(request, self.media.mp4_segment(rep, index), 'video/iso.segment')
+
+    async def _ts_segment(self, request: web.Request) -> web.StreamResponse:
+        rep: str = request.match_info['rep']
+        index: int = int(request.match_info['index'])
+        if rep not in self.media.sizes or not 0 <= index < self.media.segments:
+            raise web.HTTPNotFound()
+        return await self._send(request, self.media.ts_segment(rep, index), 'video/mp2t')
+
+    async def _send(self, request: web.Request, body: bytes, content_type: str) -> web.StreamResponse:
+        profile: CDNProfile = self.profile
+        self.stats.requests += 1
+        delay: float = profile.latency_ms + self._rng.uniform(-profile.jitter_ms, profile.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if request.method == 'GET' and self._rng.random() < profile.error_rate:
+            self.stats.injected_errors += 1
+            return web.Response(status=503, headers={'Retry-After': '1'})
+
+        status: int = 200
+        start: int = 0
+        range_header: Optional[str] = request.headers.get('Range')
+        if range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[6:].partition('-')
+            start = int(first or 0)
+            end: int = int(last) + 1 if last else len(body)
+            body = body[start:end]
+            status = 206
+
+        response = web.StreamResponse(status=status, headers={'Content-Type': content_type})
+        response.content_length = len(body)
+        if status == 206:
+            response.headers['Content-Range'] = f"bytes {start}-{start + len(body) - 1}/*"
+        await response.prepare(request)
+        if request.method == 'HEAD':
+            return response
+
+        limit: int = len(body)
+        if self._rng.random() < profile.truncate_rate:
+            self.stats.injected_truncations += 1
+            limit = len(body) // 2
+        piece: int = 64 * 1024
+        per_piece: float = piece / (profile.bandwidth_kbps * 1024 / 8) if profile.bandwidth_kbps else 0.0
+        for offset in range(0, limit, piece):
+            chunk: bytes = body[offset:min(offset + piece, limit)]
+            await response.write(chunk)
+            self.stats.bytes_sent += len(chunk)
+            if per_piece:
+                await asyncio.sleep(per_piece * len(chunk) / piece)
+        if limit < len(body):
+            # 模擬 CDN 中途斷線
+            request.transport.close()
+            return response
+        await response.write_eof()
+        return response
@@ -0,0 +1,280 @@
+"""下載 → 合併 → 混流管線的效能量測
+
+從專案根目錄執行：
+
+    python -m bench.run_bench --segments 300 --latency 30 --error-rate 0.02
+
+加上 --check 時會以 ffmpeg 讀過混流結果確認檔案可用，任何一個情境失敗就以非零狀態結束，例如：
+
+    python -m bench.run_bench --segments 20 --modes pipe --no-hls --check
+
+對本機的 CDN 模擬伺服器（bench/cdn_server.py）依序跑 DASH 的每一種 merge_mode 與 HLS，
+輸出吞吐量、片段延遲 p50 / p99、最高 RSS 與實際寫入磁碟的位元組數，結果同時附加到 bench_output.txt
+"""
+import argparse
+import asyncio
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path as PlainPath
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from bench.cdn_server import CDNProfile, SyntheticCDN, SyntheticMedia, generate_real_media
+from lib.download import MediaDownloader
+from lib.mux.parse_hls import HLSContent
+from lib.mux.parse_mpd import MPDParser
+from lib.path import Path
+from lib.session_pool import close_cdn_sessions
+from static.parameter import paramstore
+
+
+OUTPUT_FILE: PlainPath = PlainPath('bench_output.txt')
+MERGE_MODES = ('files', 'stream', 'prealloc', 'pipe')
+
+
+@dataclass
+class StageTimes:
+    segments: List[float] = field(default_factory=list)
+    merge: float = 0.0
+
+
+class TimedDownloader(MediaDownloader):
+    """記錄每個片段請求與合併階段耗時的 MediaDownloader"""
+
+    def __init__(self, media_id: str, outout_dir: str, times: StageTimes) -> None:
+        super().__init__(media_id, outout_dir)
+        self.times: StageTimes = times
+
+    async def _download_file(self, *args: Any, **kwargs: Any) -> bool:
+        start: float = time.perf_counter()
+        try:
+            return await super()._download_file(*args, **kwargs)
+        finally:
+            self.times.segments.append(time.perf_counter() - start)
+
+    async def _fetch_segment(self, *args: Any, **kwargs: Any) -> Optional[bytes]:
+        start: float = time.perf_counter()
+        try:
+            return await super()._fetch_segment(*args, **kwargs)
+        finally:
+            self.times.segments.append(time.perf_counter() - start)
+
+    async def _merge_track(self, track_type: str, merge_type: str) -> bool:
+        start: float = time.perf_counter()
+        try:
+            return await super()._merge_track(track_type, merge_type)
+        finally:
+            self.times.merge += time.perf_counter() - start
+
+
+def _write_bytes() -> Optional[int]:
+    """目前行程累計寫入儲存裝置的位元組數（僅 Linux 有 /proc/self/io）"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_mb() -> float:
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 回傳 bytes，Linux 回傳 KiB
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[int(pct) - 1]
+
+
+async def _dash_content(cdn: SyntheticCDN) -> Any:
+    mpd_url: str = f"{cdn.base_url}/dash/manifest.mpd"
+    parser = MPDParser(SimpleNamespace(text=cdn.media.mpd()), mpd_url)
+    return await parser.get_selected_mpd_content('720', '128')
+
+
+def _hls_content(cdn: SyntheticCDN) -> HLSContent:
+    return HLSContent(
+        video_track=cdn.media.hls_urls(cdn.base_url, 'v1'),
+        audio_track=cdn.media.hls_urls(cdn.base_url, 'a1'),
+        base_url=f"{cdn.base_url}/hls/",
+        audio_link=f"{cdn.base_url}/hls/a1.m3u8",
+        video_link=f"{cdn.base_url}/hls/v1.m3u8",
+        best_info='bench',
+    )
+
+
+async def _mux(work_dir: Path, merge_type: str) -> Optional[float]:
+    if shutil.which('ffmpeg') is None:
+        return None
+    from lib.mux.mux import FFmpegMuxer
+    start: float = time.perf_counter()
+    ok: bool = await FFmpegMuxer(work_dir, None).mux_main(merge_type, work_dir / 'bench_output.mp4')
+    return time.perf_counter() - start if ok else None
+
+
+async def _verify_output(path: PlainPath) -> bool:
+    """以 ffmpeg 完整讀過混流結果：影音軌都要存在，且讀取時沒有任何錯誤"""
+    ffmpeg: Optional[str] = shutil.which('ffmpeg')
+    if ffmpeg is None or not path.exists():
+        return False
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg, '-v', 'error', '-i', str(path), '-map', '0:v:0', '-map', '0:a:0', '-c', 'copy', '-f', 'null', '-',
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, err = await proc.communicate()
+    return proc.returncode == 0 and not err.strip()
+
+
+async def run_case(
+    cdn: SyntheticCDN, label: str, merge_type: str, merge_mode: str, root: PlainPath, with_mux: bool, check: bool = False
+) -> Dict[str, Any]:
+    work_dir: Path = Path(root / label)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdirp()
+
+    times = StageTimes()
+    downloader = TimedDownloader(label, str(work_dir), times)
+    downloader.merge_mode = merge_mode
+    if merge_mode == 'pipe':
+        # pipe 模式下載時就由 ffmpeg 混流，需要 --mux 產生的真實媒體
+        downloader.pipe_output = work_dir / 'bench_output.mp4'
+    content = await _dash_content(cdn) if merge_type == 'mpd' else _hls_content(cdn)
+
+    sent_before: int = cdn.stats.bytes_sent
+    written_before: Optional[int] = _write_bytes()
+    start: float = time.perf_counter()
+    ok, _ = await downloader.download_content(content)
+    elapsed: float = time.perf_counter() - start
+    mux_time: Optional[float] = await _mux(work_dir, merge_type) if ok and with_mux and not downloader.piped else None
+    written_after: Optional[int] = _write_bytes()
+    passed: Optional[bool] = None
+    if check:
+        passed = ok
+        if merge_mode == 'pipe':
+            # 退回 stream 模式也算失敗，才能確認真的走過 FIFO
+            passed = ok and downloader.piped and await _verify_output(work_dir / 'bench_output.mp4')
+        elif with_mux:
+            passed = ok and mux_time is not None and await _verify_output(work_dir / 'bench_output.mp4')
+
+    received: int = cdn.stats.bytes_sent - sent_before
+    return {
+        'case': label,
+        'ok': ok,
+        'seconds': elapsed,
+        'throughput': received / elapsed / (1024 * 1024) if elapsed else 0.0,
+        'p50': _percentile(times.segments, 50) * 1000,
+        'p99': _percentile(times.segments, 99) * 1000,
+        'merge': times.merge,
+        'mux': mux_time,
+        'rss': _peak_rss_mb(),
+        'written': (written_after - written_before) / (1024 * 1024) if written_before is not None and written_after is not None else None,
+        'check': passed,
+    }
+
+
+def _report(results: List[Dict[str, Any]], args: argparse.Namespace, cdn: SyntheticCDN) -> None:
+    table = Table(title=f"Pipeline benchmark ({args.segments} segments, {args.latency} ms latency, {args.error_rate:.0%} errors)")
+    for column in ('case', 'ok', 'time s', 'MiB/s', 'p50 ms', 'p99 ms', 'merge s', 'mux s', 'peak RSS MiB', 'disk write MiB'):
+        table.add_column(column, justify='left' if column == 'case' else 'right')
+    lines: List[str] = [
+        f"# {datetime.now().isoformat(timespec='seconds')} {' '.join(sys.argv[1:])}",
+        'case\tok\tseconds\tMiB/s\tp50_ms\tp99_ms\tmerge_s\tmux_s\tpeak_rss_mb\tdisk_write_mb',
+    ]
+    for r in results:
+        mux: str = f"{r['mux']:.2f}" if r['mux'] is not None else '-'
+        written: str = f"{r['written']:.1f}" if r['written'] is not None else '-'
+        cells: List[str] = [
+            r['case'], str(r['ok']), f"{r['seconds']:.2f}", f"{r['throughput']:.1f}", f"{r['p50']:.1f}",
+            f"{r['p99']:.1f}", f"{r['merge']:.2f}", mux, f"{r['rss']:.0f}", written,
+        ]
+        table.add_row(*cells)
+        lines.append('\t'.join(cells))
+    lines.append(
+        f"# CDN requests {cdn.stats.requests}, injected 503 {cdn.stats.injected_errors}, "
+        f"truncated {cdn.stats.injected_truncations}"
+    )
+    Console().print(table)
+    with OUTPUT_FILE.open('a', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n\n')
+
+
+async def main(args: argparse.Namespace) -> None:
+    media = SyntheticMedia(args.segments, args.video_kb, args.audio_kb, args.segment_ms)
+    root = PlainPath(args.work_dir or tempfile.mkdtemp(prefix='berriz_bench_'))
+    with_mux: bool = (args.mux or args.check) and shutil.which('ffmpeg') is not None
+    if args.check and not with_mux:
+        sys.exit('--check needs ffmpeg to generate real media and read back the output')
+    if with_mux:
+        real = generate_real_media(root / 'media', args.segments * args.segment_ms // 1000, args.segment_ms)
+        if real:
+            media.load_real(real)
+
+    cdn = SyntheticCDN(media, CDNProfile(
+        latency_ms=args.latency, jitter_ms=args.jitter, bandwidth_kbps=args.bandwidth_kbps,
+        error_rate=args.error_rate, truncate_rate=args.truncate_rate, seed=args.seed,
+    ))
+    await cdn.start()
+    # 模擬使用者已選擇音訊與影片兩條軌道
+    for key in ('mpd_audio', 'mpd_video', 'hls_audio', 'hls_video'):
+        paramstore._store[key] = True
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for mode in args.modes:
+            results.append(await run_case(cdn, f"dash-{mode}", 'mpd', mode, root, with_mux, args.check))
+        if not args.no_hls:
+            results.append(await run_case(cdn, 'hls-files', 'hls', 'files', root, False, args.check))
+    finally:
+        await close_cdn_sessions()
+        await cdn.stop()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+    _report(results, args, cdn)
+    if args.check:
+        failed: List[str] = [r['case'] for r in results if not r['check']]
+        if failed:
+            sys.exit(f"Check failed: {', '.join(failed)}")
+        print(f"Check passed: {', '.join(r['case'] for r in results)}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark segment download, merge and mux against a local CDN stand-in')
+    parser.add_argument('--segments', type=int, default=300)
+    parser.add_argument('--segment-ms', type=int, default=2000)
+    parser.add_argument('--video-kb', type=int, default=512, help='synthetic video segment size')
+    parser.add_argument('--audio-kb', type=int, default=32, help='synthetic audio segment size')
+    parser.add_argument('--latency', type=float, default=20.0, help='per-request latency in ms')
+    parser.add_argument('--jitter', type=float, default=5.0, help='latency jitter in ms')
+    parser.add_argument('--bandwidth-kbps', type=int, default=0, help='per-response bandwidth cap, 0 = unlimited')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='share of responses cut off halfway')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--modes', nargs='+', choices=MERGE_MODES, default=list(MERGE_MODES[:3]),
+                        help='pipe needs --mux (real media) to produce a valid file')
+    parser.add_argument('--no-hls', action='store_true', help='skip the HLS case')
+    parser.add_argument('--mux', action='store_true', help='generate real media with ffmpeg and time the mux stage')
+    parser.add_argument('--check', action='store_true',
+                        help='implies --mux; verify every case end to end and exit non-zero on failure')
+    parser.add_argument('--work-dir', help='where to download (default: a temp dir)')
+    parser.add_argument('--keep', action='store_true', help='keep downloaded files')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
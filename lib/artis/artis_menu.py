@@ -5,9 +5,11 @@ from datetime import datetime
 from InquirerPy import inquirer
 
 from lib.__init__ import use_proxy
+from lib.community_index import IndexSync, open_index
 from static.color import Color
 from static.api_error_handle import api_error_handle
 from static.parameter import paramstore
+from unit.date.date import page_before_window, window_start
 from unit.http.request_berriz_api import Arits, Community
 from unit.handle.handle_log import setup_logging
 from unit.handle.handle_board_from import BoardMain, BoardNotice
@@ -49,6 +51,7 @@ class Board:
         self.time_b: Optional[datetime] = time_b
         self.Arits = Arits()
         self.Community = Community()
+        self.index = open_index(community_id)
 
     async def match_noticeonly(self, choices: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
         match choices:
@@ -173,7 +176,7 @@ class Board:
         if data.get('type') in('board', 'shop', 'event', 'Event', 'SHOP', 'Shop'):
             return await self.get_all_board_content_lists(str(boards_id), str(boards_name))
         elif data.get('type') == 'notice':
-            return await Notice(self.communityid, self.communityname).get_all_notice_content_lists()
+            return await Notice(self.communityid, self.communityname, self.time_a, self.time_b).get_all_notice_content_lists()
         return None
         
     def basic_sort_json(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any], bool]:
@@ -198,6 +201,8 @@ class Board:
         next_int: Optional[int] = 0
         hasNext: bool = True
         
+        sync: Optional[IndexSync] = self.index.sync(f"board:{boards_id}") if self.index is not None else None
+        
         # 初始請求
         params: Dict[str, Union[str, int]] = {"pageSize": 100, "languageCode": "en"}
         self.json_data = await self._fetch_board_data(boards_id, params)
@@ -205,17 +210,25 @@ class Board:
         contents, _, hasNext = self.basic_sort_json()
         all_contents.extend(contents)
         Board_ERROR_Hanldle.board_error_handle(self.json_data, boards_name)
-        if not hasNext:
-            return self.deduplicate_contents(all_contents)
         # 取得初始 next_int
         cursor: Dict[str, Any] = self.json_data.get('data', {}).get('cursor', {})
         next_int = cursor.get('next', 0)
+        if self.json_data.get('code') != '0000':
+            return self.finish_sync(sync, all_contents, complete=False)
+        if sync is not None and sync.add_page(contents, next_int):
+            hasNext = False
+        elif self.before_window(contents):
+            return self.finish_sync(sync, all_contents, complete=False)
+        if not hasNext:
+            return self.finish_sync(sync, all_contents, complete=True)
+        complete: bool = True
 
         # 單筆擴展，每次用回應的指針
         while hasNext and next_int is not None:
             params = {"pageSize": 100, "languageCode": "en", "next": next_int}
             result: Optional[Dict[str, Any]] = await self._fetch_board_data(boards_id, params)
-            if result is None:
+            if result.get('code') != '0000':
+                complete = False
                 break
             
             self.json_data = result
@@ -227,12 +240,32 @@ class Board:
             
             if page_contents:
                 all_contents.extend(page_contents)
+            if sync is not None and sync.add_page(page_contents, actual_next):
+                # 接上本機索引上次同步的位置
+                break
+            if self.before_window(page_contents):
+                # 之後的頁面都早於時間範圍
+                complete = False
+                break
             
             if actual_next:
                 next_int = actual_next
             else:
                 hasNext = False
-        return self.deduplicate_contents(all_contents)
+        return self.finish_sync(sync, all_contents, complete)
+
+    def published_at(self, item: Dict[str, Any]) -> Optional[str]:
+        return (item.get('post') or {}).get('createdAt')
+
+    def before_window(self, contents: List[Dict[str, Any]]) -> bool:
+        """看板由新到舊排序：整頁都早於時間範圍時不必再往下翻"""
+        return page_before_window((self.published_at(item) for item in contents), window_start(self.time_a, self.time_b))
+
+    def finish_sync(self, sync: Optional[IndexSync], contents: List[Dict[str, Any]], complete: bool) -> List[Dict[str, Any]]:
+        """有本機索引時回傳索引中的完整列表，否則只有這次抓到的頁面"""
+        if sync is not None:
+            contents = sync.finish(complete)
+        return self.deduplicate_contents(contents)
 
     def deduplicate_contents(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         seen: set = set()
@@ -251,42 +284,55 @@ class Board:
 
 
 class Notice(Board):
-    def __init__(self, community_id: int, communityname: str) -> None:
-        super().__init__(community_id, communityname)
+    def __init__(self, community_id: int, communityname: str, time_a: Optional[datetime] = None, time_b: Optional[datetime] = None) -> None:
+        super().__init__(community_id, communityname, time_a, time_b)
+
+    def published_at(self, item: Dict[str, Any]) -> Optional[str]:
+        return item.get('reservedAt')
     
     async def fetch_notice_content_lists(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         return await self.Arits.request_notice(self.communityid, params, use_proxy)
 
     async def get_all_notice_content_lists(self) -> List[Dict[str, Any]]:
-        params: Dict[str, Union[str, int]] = {'languageCode': 'en', 'pageSize': 999999999339134974}
+        # 與看板相同每頁 100 筆，有本機索引時通常第一頁就能接上上次同步的位置
+        params: Dict[str, Union[str, int]] = {'languageCode': 'en', 'pageSize': 100}
         all_contents: List[Dict[str, Any]] = []
         hasNext: bool = True
         next_int: Optional[int] = 0
+        sync: Optional[IndexSync] = self.index.sync('notice') if self.index is not None else None
 
         # 初始請求
         result: Optional[Dict[str, Any]] = await self.fetch_notice_content_lists(params)
         
         if result is None:
-            return all_contents
+            return sync.finish(False) if sync is not None else all_contents
             
         self.json_data = result
         contents: List[Dict[str, Any]]
         contents, _, hasNext = self.basic_sort_json()
         all_contents.extend(contents)
         Board_ERROR_Hanldle.board_error_handle(self.json_data, 'NOTICE')
-        if not hasNext:
-            return all_contents
 
         # 取得初始 next_int
         cursor: Dict[str, Any] = self.json_data.get('data', {}).get('cursor', {})
         next_int = cursor.get('next', 0)
+        if self.json_data.get('code') != '0000':
+            return sync.finish(False) if sync is not None else all_contents
+        if sync is not None and sync.add_page(contents, next_int):
+            hasNext = False
+        elif self.before_window(contents):
+            return sync.finish(False) if sync is not None else all_contents
+        if not hasNext:
+            return sync.finish(True) if sync is not None else all_contents
+        complete: bool = True
 
         # 單筆擴展，每次用回應的指針
         while hasNext and next_int is not None:
-            params = {"pageSize": 999999999339134974, "languageCode": "en", "next": next_int}
+            params = {"pageSize": 100, "languageCode": "en", "next": next_int}
             result = await self.fetch_notice_content_lists(params)
             
-            if result is None:
+            if result is None or result.get('code') != '0000':
+                complete = False
                 break
                 
             self.json_data = result
@@ -298,9 +344,14 @@ class Notice(Board):
             
             if page_contents:
                 all_contents.extend(page_contents)
+            if sync is not None and sync.add_page(page_contents, actual_next):
+                break
+            if self.before_window(page_contents):
+                complete = False
+                break
             
             if actual_next:
                 next_int = actual_next
             else:
                 hasNext = False
-        return all_contents
\ No newline at end of file
+        return sync.finish(complete) if sync is not None else all_contents
\ No newline at end of file
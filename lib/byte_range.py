@@ -0,0 +1,72 @@
+from typing import Iterable, List, Optional, Tuple
+
+
+ByteRange = Tuple[int, Optional[int]]
+
+# 位元組範圍附加在 URL 的 fragment，不會送到伺服器，也能原樣存進 manifest
+_MARKER: str = '#bytes='
+
+
+def with_byte_range(url: str, start: int, end: Optional[int] = None) -> str:
+    """標記只下載 url 的 start ~ end（含）位元組，end 為 None 表示到檔案結尾"""
+    return f"{url}{_MARKER}{start}-{'' if end is None else end}"
+
+
+def split_byte_range(url: str) -> Tuple[str, Optional[ByteRange]]:
+    """拆回實際請求的 URL 與位元組範圍，沒有標記時範圍為 None"""
+    request_url, marker, spec = url.rpartition(_MARKER)
+    if not marker:
+        return url, None
+    return request_url, parse_range(spec)
+
+
+def parse_range(spec: str) -> ByteRange:
+    """解析 MPD 的 "first-last" 或 HTTP 的 "first-" 形式"""
+    first, sep, last = spec.strip().partition('-')
+    if not sep or not first.isdigit() or (last and not last.isdigit()):
+        raise ValueError(f"Invalid byte range '{spec}'")
+    start: int = int(first)
+    end: Optional[int] = int(last) if last else None
+    if end is not None and end < start:
+        raise ValueError(f"Invalid byte range '{spec}'")
+    return start, end
+
+
+def range_header(byte_range: Optional[ByteRange], offset: int = 0) -> Optional[str]:
+    """組出 Range 標頭；offset 是已下載的位元組數，用於續傳"""
+    if byte_range is None:
+        return f"bytes={offset}-" if offset else None
+    start, end = byte_range
+    return f"bytes={start + offset}-{'' if end is None else end}"
+
+
+def range_length(byte_range: Optional[ByteRange]) -> Optional[int]:
+    if byte_range is None or byte_range[1] is None:
+        return None
+    return byte_range[1] - byte_range[0] + 1
+
+
+def coalesce_ranges(parts: Iterable[Tuple[str, Optional[ByteRange]]], max_bytes: int) -> List[str]:
+    """同一個檔案上前後相接的位元組範圍合併成一個 Range 請求，單一請求不超過 max_bytes；
+    沒有範圍的部分原樣保留，max_bytes 為 0 時不合併"""
+    urls: List[str] = []
+    current: Optional[str] = None
+    start: int = 0
+    end: int = 0
+    for url, byte_range in parts:
+        if (
+            current == url and byte_range is not None and byte_range[1] is not None
+            and byte_range[0] == end + 1 and byte_range[1] - start + 1 <= max_bytes
+        ):
+            end = byte_range[1]
+            continue
+        if current is not None:
+            urls.append(with_byte_range(current, start, end))
+            current = None
+        if byte_range is None or byte_range[1] is None:
+            urls.append(with_byte_range(url, *byte_range) if byte_range else url)
+        else:
+            current, (start, end) = url, byte_range
+    if current is not None:
+        urls.append(with_byte_range(current, start, end))
+    return urls
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from lib.load_yaml_config import CFG
+from static.color import Color
+from static.route import Route
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('community_index', 'sienna')
+
+
+# (item_id, publishedAt, type, isFanclubOnly)
+ItemInfo = Tuple[Optional[str], Optional[str], Optional[str], bool]
+
+
+def describe(kind: str, item: Dict[str, Any]) -> ItemInfo:
+    """從 API 回傳的原始項目取出索引欄位；kind 為 media / live / notice / board:<id>"""
+    if kind in ('media', 'live'):
+        media: Dict[str, Any] = item.get('media') or {}
+        return media.get('mediaId'), media.get('publishedAt'), media.get('mediaType'), media.get('isFanclubOnly') is True
+    if kind == 'notice':
+        return item.get('communityNoticeId'), item.get('reservedAt'), 'NOTICE', False
+    post: Dict[str, Any] = item.get('post') or {}
+    board_info: Dict[str, Any] = item.get('boardInfo') or {}
+    return post.get('postId'), post.get('createdAt'), 'POST', board_info.get('isFanclubOnly') is True
+
+
+def _timestamp(published_at: Optional[str]) -> Optional[float]:
+    if not published_at:
+        return None
+    try:
+        return datetime.fromisoformat(published_at.replace('Z', '+00:00')).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+
+class CommunityIndex:
+    """每個社群看過的媒體、貼文與公告存在本機 SQLite，
+    之後只需要從最新一頁往回抓到上次同步過的位置"""
+    DB_FILE = Route().community_index_db
+
+    def __init__(self, community_id: int) -> None:
+        self.community_id: int = int(community_id)
+        os.makedirs(os.path.dirname(self.DB_FILE), exist_ok=True)
+        self._init_db()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # 媒體與直播回放的 cursor 同時寫入，等待另一個連線釋放鎖
+        return sqlite3.connect(self.DB_FILE, timeout=30)
+
+    def _init_db(self) -> None:
+        with self._get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS items (
+                    community_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    item_type TEXT,
+                    published_at TEXT,
+                    published_ts REAL,
+                    is_fanclub_only INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (community_id, kind, item_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS items_by_time
+                ON items (community_id, kind, published_ts DESC)
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    community_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    newest_ts REAL,
+                    last_cursor TEXT,
+                    synced_at REAL,
+                    full_synced_at REAL,
+                    PRIMARY KEY (community_id, kind)
+                )
+            ''')
+            conn.commit()
+
+    def sync(self, kind: str) -> "IndexSync":
+        return IndexSync(self, kind)
+
+    def state(self, kind: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        """回傳 (newest_ts, full_synced_at)，從未完整同步時為 None"""
+        with self._get_connection() as conn:
+            row = conn.execute(
+                'SELECT newest_ts, full_synced_at FROM sync_state WHERE community_id = ? AND kind = ?',
+                (self.community_id, kind),
+            ).fetchone()
+        return row if row and row[1] is not None else None
+
+    def upsert(self, kind: str, contents: Iterable[Dict[str, Any]], seen_at: float) -> int:
+        rows: List[Tuple[Any, ...]] = []
+        for item in contents:
+            item_id, published_at, item_type, fanclub = describe(kind, item)
+            if item_id is None:
+                continue
+            rows.append((
+                self.community_id, kind, str(item_id), item_type, published_at, _timestamp(published_at),
+                int(fanclub), orjson.dumps(item).decode('utf-8'), seen_at,
+            ))
+        with self._get_connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO items
+                (community_id, kind, item_id, item_type, published_at, published_ts, is_fanclub_only, data, seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+        return len(rows)
+
+    def items(self, kind: str) -> List[Dict[str, Any]]:
+        """由新到舊回傳索引中的原始項目，與 API 的排序一致"""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                'SELECT data FROM items WHERE community_id = ? AND kind = ? ORDER BY published_ts DESC',
+                (self.community_id, kind),
+            ).fetchall()
+        return [orjson.loads(row[0]) for row in rows]
+
+    def save_state(self, kind: str, newest_ts: Optional[float], cursor: Optional[str], full_started: Optional[float]) -> None:
+        """記錄同步位置；full_started 不為 None 表示完整走過整個列表，刪除這次沒看到的項目"""
+        now: float = time.time()
+        with self._get_connection() as conn:
+            if full_started is not None:
+                conn.execute(
+                    'DELETE FROM items WHERE community_id = ? AND kind = ? AND seen_at < ?',
+                    (self.community_id, kind, full_started),
+                )
+            conn.execute('''
+                INSERT INTO sync_state (community_id, kind, newest_ts, last_cursor, synced_at, full_synced_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (community_id, kind) DO UPDATE SET
+                    newest_ts = MAX(COALESCE(sync_state.newest_ts, 0), COALESCE(excluded.newest_ts, 0)),
+                    last_cursor = excluded.last_cursor,
+                    synced_at = excluded.synced_at,
+                    full_synced_at = COALESCE(excluded.full_synced_at, sync_state.full_synced_at)
+            ''', (self.community_id, kind, newest_ts, cursor, now, now if full_started is not None else None))
+            conn.commit()
+
+
+class IndexSync:
+    """一次列表走訪的同步狀態：每頁寫入索引，遇到上次同步過的項目即可停止"""
+
+    def __init__(self, index: CommunityIndex, kind: str) -> None:
+        self.index: CommunityIndex = index
+        self.kind: str = kind
+        self.started: float = time.time()
+        self.since: Optional[float] = None
+        state = index.state(kind)
+        full_sync_hours: float = CFG['Index']['full_sync_hours']
+        if state is not None and not (full_sync_hours and self.started - state[1] > full_sync_hours * 3600):
+            self.since = state[0]
+        self.newest: Optional[float] = None
+        self.cursor: Optional[str] = None
+        self.added: int = 0
+
+    @property
+    def full(self) -> bool:
+        return self.since is None
+
+    def add_page(self, contents: List[Dict[str, Any]], cursor: Optional[str]) -> bool:
+        """寫入一頁並回傳是否已接上上次同步的位置"""
+        self.added += self.index.upsert(self.kind, contents, self.started)
+        self.cursor = cursor or self.cursor
+        reached: bool = False
+        for item in contents:
+            ts: Optional[float] = _timestamp(describe(self.kind, item)[1])
+            if ts is None:
+                continue
+            if self.newest is None or ts > self.newest:
+                self.newest = ts
+            if self.since is not None and ts <= self.since:
+                reached = True
+        return reached
+
+    def finish(self, complete: bool) -> List[Dict[str, Any]]:
+        """complete 表示已走到列表結尾或接上上次同步的位置，才記錄同步點；
+        中途停止（時間範圍、錯誤）時索引仍保留已寫入的項目"""
+        if complete:
+            self.index.save_state(self.kind, self.newest, self.cursor, self.started if self.full else None)
+        items: List[Dict[str, Any]] = self.index.items(self.kind)
+        logger.info(
+            f"{Color.fg('light_gray')}Index{Color.reset()} {Color.fg('light_yellow')}{self.kind}{Color.reset()}: "
+            f"{Color.fg('light_gray')}{'full sync' if self.full else 'since last sync'}{Color.reset()} "
+            f"{Color.fg('light_yellow')}{self.added}{Color.reset()} {Color.fg('light_gray')}fetched,{Color.reset()} "
+            f"{Color.fg('light_yellow')}{len(items)}{Color.reset()} {Color.fg('light_gray')}indexed{Color.reset()}"
+        )
+        return items
+
+
+def open_index(community_id: Any) -> Optional[CommunityIndex]:
+    """Index.enable 關閉或社群 ID 無法使用時回傳 None，呼叫端照舊走完整列表"""
+    if CFG['Index']['enable'] is not True:
+        return None
+    try:
+        return CommunityIndex(int(community_id))
+    except (TypeError, ValueError, sqlite3.Error) as e:
+        logger.warning(f"Community index unavailable: {e}")
+        return None
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from lib.load_yaml_config import CFG
+from static.color import Color
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('concurrency', 'turquoise')
+
+
+def parse_retry_after(value: Optional[str]) -> float:
+    """Retry-After 可以是秒數或 HTTP 日期，無法解析時回傳 0"""
+    if not value:
+        return 0.0
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class AdaptiveLimiter:
+    """單一主機的 AIMD 並行控制：吞吐量持續上升時加一，逾時 / 429 / 5xx 時減半
+    一開始處於慢啟動，吞吐量上升時直接加倍，直到第一次壅塞訊號或吞吐量不再上升"""
+
+    def __init__(self, host: str, initial: int, minimum: int, maximum: int, window: float = 2.0) -> None:
+        self.host: str = host
+        self.minimum: int = minimum
+        self.maximum: int = maximum
+        self.target: int = max(minimum, min(initial, maximum))
+        self.window: float = window
+        self.in_flight: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._blocked_until: float = 0.0
+        self._window_start: float = time.monotonic()
+        self._window_bytes: int = 0
+        self._last_rate: float = 0.0
+        self._last_decrease: float = 0.0
+        self._saturated: bool = False
+        self._slow_start: bool = True
+
+    @property
+    def current(self) -> int:
+        return self.in_flight
+
+    async def acquire(self) -> None:
+        while True:
+            delay: float = self._blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self.in_flight < self.target:
+                break
+            waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # 已被喚醒卻被取消，把名額讓給下一個等待者
+                    self._wake()
+                raise
+        self.in_flight += 1
+        if self.in_flight >= self.target:
+            self._saturated = True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free: int = self.target - self.in_flight
+        while free > 0 and self._waiters:
+            waiter: asyncio.Future = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+    def observe(self, nbytes: int) -> None:
+        """累計成功傳輸的位元組，每個觀察窗比較一次吞吐量"""
+        self._window_bytes += nbytes
+        now: float = time.monotonic()
+        elapsed: float = now - self._window_start
+        if elapsed < self.window:
+            return
+        rate: float = self._window_bytes / elapsed
+        # 只有在並行數真的用滿時，吞吐量上升才代表還有餘裕
+        if self._saturated and rate > self._last_rate * 1.05 and self.target < self.maximum:
+            step: int = self.target if self._slow_start else 1
+            self._set_target(min(self.maximum, self.target + step), f"throughput {rate / 1048576:.1f} MiB/s")
+        elif self._saturated and self._last_rate:
+            # 用滿了吞吐量卻沒有上升，已接近頻寬上限，改為逐一增加
+            self._slow_start = False
+        self._last_rate = rate
+        self._window_start = now
+        self._window_bytes = 0
+        self._saturated = self.in_flight >= self.target
+
+    def on_status(self, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        if status == 429 or status >= 500:
+            retry_after: float = parse_retry_after(headers.get('Retry-After') if headers else None)
+            self.back_off(f"HTTP {status}", retry_after)
+
+    def on_timeout(self) -> None:
+        self.back_off("timeout")
+
+    def back_off(self, reason: str, retry_after: float = 0.0) -> None:
+        now: float = time.monotonic()
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+        # 同一波錯誤只減半一次，避免瞬間掉到最低值
+        if now - self._last_decrease < self.window:
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self._set_target(max(self.minimum, self.target // 2), reason)
+        self._last_rate = 0.0
+
+    def _set_target(self, target: int, reason: str) -> None:
+        if target == self.target:
+            return
+        logger.debug(
+            f"{Color.fg('light_gray')}{self.host} concurrency{Color.reset()} "
+            f"{Color.fg('gray')}{self.target}{Color.reset()} -> {Color.fg('light_yellow')}{target}{Color.reset()} "
+            f"{Color.fg('light_gray')}({reason}, in flight {self.in_flight}){Color.reset()}"
+        )
+        self.target = target
+        self._wake()
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(url: str) -> AdaptiveLimiter:
+    """依主機取得共用的並行控制器，影片片段與圖片下載共用同一份"""
+    host: str = urlsplit(str(url)).netloc or str(url)
+    limiter: Optional[AdaptiveLimiter] = _limiters.get(host)
+    if limiter is None:
+        cfg = CFG['Download']
+        limiter = AdaptiveLimiter(
+            host, cfg['initial_concurrency'], cfg['min_concurrency'], cfg['max_concurrency']
+        )
+        _limiters[host] = limiter
+    return limiter
+
+
+def concurrency_status() -> Dict[str, str]:
+    """目前各主機的 current/target 並行數，供日誌輸出"""
+    return {host: f"{lim.current}/{lim.target}" for host, lim in _limiters.items()}
@@ -1,21 +1,31 @@
 import asyncio
 import shutil
 import os
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
 import aiofiles
 import aiohttp
 from contextlib import AsyncExitStack
 
 from lib.__init__ import container
+from lib.byte_range import coalesce_ranges, range_header, range_length, split_byte_range
+from lib.concurrency import AdaptiveLimiter, get_limiter
+from lib.live_recorder import LiveTrackRecorder
 from lib.load_yaml_config import CFG
 from lib.mux.parse_hls import HLS_Paser
-from lib.mux.parse_mpd import MPDContent, MPDParser, MediaTrack
+from lib.mux.parse_mpd import MPDContent, MPDParser, MediaTrack, parse_sidx
 from lib.processbar import ProgressBar
-from lib.merge import MERGE
+from lib.ratelimit import throttle
+from lib.segment_check import SegmentProblem, SegmentValidator
+from lib.session_pool import get_cdn_session
+from lib.manifest import SegmentManifest, crc32_file
+from lib.merge import MERGE, OrderedTrackWriter, PreallocatedTrackFile
+from lib.mux.mux import FFmpegMuxer
 from lib.video_folder import start_download_queue
 from lib.path import Path
 from static.color import Color
+from static.PlaybackInfo import ON_AIR_STATUSES
 from static.parameter import paramstore
 from unit.__init__ import USERAGENT
 from unit.handle.handle_log import setup_logging
@@ -29,6 +39,16 @@ class MediaDownloader:
         self.media_id: str = media_id
         self.base_dir: Path = Path(outout_dir)
         self.session: Optional[aiohttp.ClientSession] = None
+        self.merge_mode: str = CFG['Download']['merge_mode']
+        self.verify_mode: str = CFG['Download']['verify_segments']
+        # 已直接寫成軌道檔（stream / prealloc）的軌道，不需要再合併
+        self.direct_tracks: Set[str] = set()
+        # pipe 模式：由呼叫端指定最終混流檔，片段經 FIFO 直接交給 ffmpeg
+        self.pipe_output: Optional[Path] = None
+        self.pipe_inputs: Dict[str, Path] = {}
+        self.piped: bool = False
+        # 已解析的 MPD / HLS 內容，改名時用來取得編碼與解析度
+        self.media_content: Optional[MPDContent | HLS_Paser] = None
 
     def _get_file_extension(self, mime_type: str) -> str:
         """Determine file extension based on MIME type for DASH streaming"""
@@ -53,15 +73,8 @@ class MediaDownloader:
 
     async def _ensure_session(self) -> None:
         if self.session is None or self.session.closed:
-            connector: aiohttp.TCPConnector = aiohttp.TCPConnector(limit_per_host=200)
-            timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=600, connect=10, sock_connect=10, sock_read=30)
-            self.session = aiohttp.ClientSession(
-                connector=connector, timeout=timeout, headers={
-                    f"user-Agent": USERAGENT,
-                    "accept": "*/*",
-                    "accept-Encoding": "identity",
-                    }
-            )
+            # 共用的 session 由 close_cdn_sessions 在程式結束時關閉
+            self.session = await get_cdn_session()
 
     async def _download_file(
         self,
@@ -69,34 +82,87 @@ class MediaDownloader:
         save_path: Path,
         chunk_size: int = 1.5 * 1024 * 1024,
         max_retries: int = 3,
-        progress_callback: Optional[Callable[[int], Any]] = None
+        progress_callback: Optional[Callable[[int], Any]] = None,
+        manifest: Optional[SegmentManifest] = None,
+        index: Optional[int] = None,
+        flow: str = 'segment',
     ) -> bool:
         retries: int = 0
+        limiter: AdaptiveLimiter = get_limiter(url)
+        request_url, byte_range = split_byte_range(url)
         save_path.parent.mkdirp()
+        track_manifest: bool = manifest is not None and index is not None
+        if track_manifest and manifest.is_complete(index, save_path):
+            if progress_callback:
+                progress_callback(manifest.entries[index].size)
+            return True
         while retries <= max_retries:
             await self._ensure_session()
+            # 未完成的片段從現有檔案大小處以 Range 續傳
+            offset: int = 0
+            if track_manifest and save_path.exists():
+                offset = save_path.stat().st_size
+                expected: int = manifest.entries[index].size
+                if expected and offset >= expected:
+                    offset = 0
+            range_value: Optional[str] = range_header(byte_range, offset)
+            headers: Optional[Dict[str, str]] = {"Range": range_value} if range_value else None
             try:
                 assert self.session is not None
-                async with self.session.get(url) as response:
-                    if response.status not in (200, 206):
-                        logger.warning(f"Request failed with status {response.status}, retrying...")
-                        retries += 1
-                        await asyncio.sleep(1 ** retries)
-                        continue
-                    try:
-                        async with AsyncExitStack() as stack:
-                            f = await stack.enter_async_context(aiofiles.open(save_path, "wb"))
-                            async for chunk in response.content.iter_chunked(chunk_size):
-                                await f.write(chunk)
-                                if progress_callback:
-                                    progress_callback(len(chunk))
-                    except asyncio.CancelledError:
-                        await self.session.close()
-                        await self.force_remove_with_retry(save_path.parents[2])
+                problem: Optional[SegmentProblem] = None
+                async with limiter, self.session.get(request_url, headers=headers) as response:
+                    status: int = response.status
+                    if byte_range is not None and status == 200:
+                        # 回傳整個檔案的話內容和片段對不上，重試也沒用
+                        logger.error(f"Server ignored byte range request: {url}")
                         return False
-                    return True
+                    if status in (200, 206):
+                        if offset and status == 200:
+                            # 伺服器忽略 Range，從頭下載
+                            offset = 0
+                        if track_manifest and response.content_length is not None:
+                            manifest.mark_size(index, offset + response.content_length)
+                        crc: int = await asyncio.to_thread(crc32_file, save_path) if offset else 0
+                        written: int = offset
+                        validator: Optional[SegmentValidator] = self._new_validator(response, offset)
+                        try:
+                            async with AsyncExitStack() as stack:
+                                f = await stack.enter_async_context(aiofiles.open(save_path, "ab" if offset else "wb"))
+                                async for chunk in response.content.iter_chunked(chunk_size):
+                                    if validator:
+                                        validator.feed(chunk)
+                                    await f.write(chunk)
+                                    written += len(chunk)
+                                    limiter.observe(len(chunk))
+                                    await throttle(len(chunk), flow, self.media_id)
+                                    if track_manifest:
+                                        crc = zlib.crc32(chunk, crc)
+                                    if progress_callback:
+                                        progress_callback(len(chunk))
+                        except asyncio.CancelledError:
+                            # 保留已下載的部分與清單，下次執行時續傳
+                            if track_manifest:
+                                manifest.save()
+                            return False
+                        problem = validator.finish() if validator else None
+                        if problem is None:
+                            if track_manifest:
+                                manifest.mark_done(index, written, crc)
+                            return True
+                    else:
+                        limiter.on_status(status, response.headers)
+                # 在釋放並行名額之後才等待重試
+                if problem is not None:
+                    logger.warning(f"{Color.fg('light_gray')}Segment check failed, re-fetching{Color.reset()}: {problem} {url}")
+                    self._discard_bad_segment(save_path, problem, manifest if track_manifest else None, index)
+                else:
+                    logger.warning(f"Request failed with status {status}, retrying...")
+                retries += 1
+                await asyncio.sleep(1 ** retries)
 
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    limiter.on_timeout()
                 logger.warning(f"Download attempt {retries + 1} failed: {str(e)}")
                 retries += 1
                 if retries <= max_retries:
@@ -104,20 +170,119 @@ class MediaDownloader:
                 else:
                     logger.error(f"Download failed after {max_retries} retries: {url}")
                     if save_path.exists():
-                        async with self.session.head(url) as head_resp:
-                            if head_resp.status == 200 and save_path.stat().st_size == int(head_resp.headers.get('Content-Length', 0)):
+                        async with self.session.head(request_url) as head_resp:
+                            if byte_range is None and head_resp.status == 200 and save_path.stat().st_size == int(head_resp.headers.get('Content-Length', 0)):
                                 if progress_callback:
                                     progress_callback(save_path.stat().st_size)
+                                if track_manifest:
+                                    crc = await asyncio.to_thread(crc32_file, save_path)
+                                    manifest.mark_done(index, save_path.stat().st_size, crc)
                                 return True
-                        try:
-                            shutil.rmtree(save_path, ignore_errors=True)
-                        except Exception as e:
-                            logger.error(f"{Color.fg('black')}Failed to remove failed download: {e}{Color.reset()}")
+                        if not track_manifest:
+                            try:
+                                save_path.unlink(missing_ok=True)
+                            except Exception as e:
+                                logger.error(f"{Color.fg('black')}Failed to remove failed download: {e}{Color.reset()}")
                     return False
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
         return False
 
+    async def _fetch_segment(
+        self,
+        url: str,
+        chunk_size: int = 1.5 * 1024 * 1024,
+        max_retries: int = 3,
+        progress_callback: Optional[Callable[[int], Any]] = None,
+        flow: str = 'segment',
+    ) -> Optional[bytes]:
+        """下載片段到記憶體，供 stream 模式依序寫入軌道檔"""
+        retries: int = 0
+        limiter: AdaptiveLimiter = get_limiter(url)
+        request_url, byte_range = split_byte_range(url)
+        range_value: Optional[str] = range_header(byte_range)
+        headers: Optional[Dict[str, str]] = {"Range": range_value} if range_value else None
+        while retries <= max_retries:
+            await self._ensure_session()
+            try:
+                assert self.session is not None
+                async with limiter, self.session.get(request_url, headers=headers) as response:
+                    status: int = response.status
+                    problem: Optional[SegmentProblem] = None
+                    if byte_range is not None and status == 200:
+                        logger.error(f"Server ignored byte range request: {url}")
+                        return None
+                    if status in (200, 206):
+                        buffer: bytearray = bytearray()
+                        validator: Optional[SegmentValidator] = self._new_validator(response, 0)
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            if validator:
+                                validator.feed(chunk)
+                            buffer += chunk
+                            limiter.observe(len(chunk))
+                            await throttle(len(chunk), flow, self.media_id)
+                            if progress_callback:
+                                progress_callback(len(chunk))
+                        problem = validator.finish() if validator else None
+                        if problem is None:
+                            return bytes(buffer)
+                    else:
+                        limiter.on_status(status, response.headers)
+                if problem is not None:
+                    logger.warning(f"{Color.fg('light_gray')}Segment check failed, re-fetching{Color.reset()}: {problem} {url}")
+                else:
+                    logger.warning(f"Request failed with status {status}, retrying...")
+                retries += 1
+                await asyncio.sleep(1 ** retries)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    limiter.on_timeout()
+                logger.warning(f"Download attempt {retries + 1} failed: {str(e)}")
+                retries += 1
+                if retries <= max_retries:
+                    await asyncio.sleep(1 ** retries)
+        logger.error(f"Download failed after {max_retries} retries: {url}")
+        return None
+
+    def _new_validator(self, response: aiohttp.ClientResponse, offset: int) -> Optional[SegmentValidator]:
+        """依 verify_segments 設定建立片段檢查器；Range 續傳時只能檢查位元組數"""
+        if self.verify_mode == 'off':
+            return None
+        return SegmentValidator(response.content_length, structure=self.verify_mode == 'structure' and not offset)
+
+    def _discard_bad_segment(
+        self, save_path: Path, problem: SegmentProblem, manifest: Optional[SegmentManifest], index: Optional[int]
+    ) -> None:
+        """只是提早斷線（位元組不足）時保留已下載部分以 Range 續傳，其餘情況整個重抓"""
+        if manifest is not None:
+            manifest.mark_pending(index)
+            expected: int = manifest.entries[index].size
+            if problem.truncated and save_path.exists() and save_path.stat().st_size < expected:
+                return
+        save_path.unlink(missing_ok=True)
+
+    async def _probe_size(self, url: str) -> Optional[int]:
+        """以 HEAD 取得片段大小，伺服器沒有回傳 Content-Length 時回傳 None；
+        有結尾的位元組範圍不需要發出請求"""
+        request_url, byte_range = split_byte_range(url)
+        known: Optional[int] = range_length(byte_range)
+        if known is not None:
+            return known
+        await self._ensure_session()
+        try:
+            assert self.session is not None
+            async with get_limiter(url), self.session.head(request_url, allow_redirects=True) as response:
+                if response.status != 200:
+                    return None
+                length: Optional[str] = response.headers.get('Content-Length')
+                if not length or not length.isdigit():
+                    return None
+                # 開放結尾的範圍：檔案大小扣掉起點
+                return int(length) - byte_range[0] if byte_range is not None else int(length)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"HEAD failed for {url}: {e}")
+            return None
+
     def check_download_dir(self, folder_path: Path) -> bool:
         if not os.path.exists(folder_path):
             paramstore._store['slice_path_fail'] = True
@@ -146,36 +311,84 @@ class MediaDownloader:
                     slice_parameters = track
                     file_ext: str = '.bin'
                     track_id: str = track[0].split('/')[-2]
-                    logger.info(
-                        f"{Color.fg('light_gray')}Start downloading{Color.reset()} "
-                        f"{Color.bg('cyan')}{track_type}{Color.reset()} track: {Color.fg('cyan')}{track_id}{Color.reset()} "
-                    )
+                    # fMP4 HLS 的 EXT-X-MAP
+                    init_url: str = getattr(self.media_content, f"{track_type}_init", None) or ''
                 else:
                     slice_parameters = track.segment_urls
                     # Get appropriate extension for files
                     file_ext = self._get_file_extension(track.mime_type)
                     track_id = track.id
-                    # Download initialization segment
-                    init_path: Path = track_dir / f"init_{track_type}_{file_ext}"
-                    if len(track.init_url) > 4:
-                        if not await self._download_file(track.init_url, init_path):
-                            logger.error(f"{track_type} Initialization file download failed")
-                            return False
-                        logger.info(
-                            f"{Color.fg('light_gray')}Start downloading{Color.reset()} "
-                            f"{Color.bg('cyan')}{track_type}{Color.reset()} track: {Color.fg('cyan')}{track_id}{Color.reset()} "
+                    init_url = track.init_url
+                # Download initialization segment
+                init_path: Optional[Path] = track_dir / f"init_{track_type}_{file_ext}"
+                if len(init_url) > 4:
+                    if not await self._download_file(init_url, init_path, flow=track_type):
+                        logger.error(f"{track_type} Initialization file download failed")
+                        return False
+                logger.info(
+                    f"{Color.fg('light_gray')}Start downloading{Color.reset()} "
+                    f"{Color.bg('cyan')}{track_type}{Color.reset()} track: {Color.fg('cyan')}{track_id}{Color.reset()} "
+                )
+                if merge_type != 'hls' and track.index_range is not None:
+                    slice_parameters = await self._split_segment_base(track, init_path, slice_parameters)
+                if slice_parameters != [] and merge_type != 'hls' and _is_segment_base(track) and any(
+                    _open_ended(url) for url in slice_parameters
+                ):
+                    # 切不開的 SegmentBase media 只能邊下載邊寫入片段檔，stream / prealloc 會把整段放在記憶體
+                    if track_type in self.pipe_inputs:
+                        logger.error(f"{track_type} SegmentBase track has no usable sidx, cannot pipe it")
+                        return False
+                    if self.merge_mode in ('stream', 'prealloc'):
+                        logger.warning(
+                            f"{Color.fg('light_gray')}No sidx to split{Color.reset()} {Color.fg('cyan')}{track_type}{Color.reset()}"
+                            f"{Color.fg('light_gray')}, falling back to files mode{Color.reset()}"
                         )
+                    return await self.task_and_dl(slice_parameters, track_dir, file_ext, track_type)
                 if slice_parameters != []:
+                    if self.merge_mode == 'prealloc':
+                        if init_path is not None and not init_path.exists():
+                            init_path = None
+                        return await self.prealloc_and_dl(slice_parameters, track_dir, init_path, file_ext, track_type)
+                    # pipe 模式的軌道同樣依序寫入，只是目的地換成 FIFO
+                    if self.merge_mode == 'stream' or track_type in self.pipe_inputs:
+                        if init_path is not None and not init_path.exists():
+                            init_path = None
+                        return await self.stream_and_dl(slice_parameters, track_dir, init_path, track_type)
                     return await self.task_and_dl(slice_parameters, track_dir, file_ext, track_type)
 
+    async def _split_segment_base(self, track: MediaTrack, init_path: Path, urls: Sequence[str]) -> List[str]:
+        """依 init 內的 sidx 把 SegmentBase 開放結尾的 media 範圍切成子片段，
+        相鄰的子片段合併成不超過 range_request_mb 的請求；讀不到 sidx 時原樣回傳"""
+        media_url, media_range = split_byte_range(urls[0])
+        if media_range is None or media_range[1] is not None or not init_path.exists():
+            return list(urls)
+        start, end = track.index_range
+        data: bytes = await asyncio.to_thread(init_path.read_bytes)
+        ranges = parse_sidx(data[start:None if end is None else end + 1], start)
+        if not ranges or ranges[0][0] < media_range[0]:
+            logger.warning(f"Cannot read sidx of {track.id}, media stays one open-ended range")
+            return list(urls)
+        # sidx 與第一個子片段之間的 box 也屬於 media
+        ranges[0] = (media_range[0], ranges[0][1])
+        # 最後一個子片段之後可能還有 mfra 等 box，以 HEAD 取得檔案大小補上有界的尾段
+        remaining: Optional[int] = await self._probe_size(urls[0])
+        if remaining is not None and media_range[0] + remaining - 1 > ranges[-1][1]:
+            ranges.append((ranges[-1][1] + 1, media_range[0] + remaining - 1))
+        max_bytes: int = CFG['Download']['range_request_mb'] * 1024 * 1024
+        split: List[str] = coalesce_ranges(((media_url, r) for r in ranges), max_bytes)
+        logger.debug(f"{track.id} sidx: {len(ranges)} subsegments in {len(split)} requests")
+        return split + list(urls[1:])
+
     async def task_and_dl(self, slice_parameters: List[str], track_dir: Path, file_ext: str, track_type: str) -> bool:
         total = len(slice_parameters)
         success_count = 0
-        semaphore = asyncio.Semaphore(50)
+        manifest: SegmentManifest = await SegmentManifest.open(track_dir / "manifest.json", slice_parameters)
         async def bounded_download(i, url):
-            async with semaphore:
-                seg_path = track_dir / f"seg_{track_type}_{i}{file_ext}"
-                return await self._download_file(url, seg_path)
+            # 並行數由 get_limiter 依主機自動調整
+            seg_path = track_dir / f"seg_{track_type}_{i}{file_ext}"
+            result = await self._download_file(url, seg_path, manifest=manifest, index=i, flow=track_type)
+            await manifest.flush()
+            return result
 
         tasks = [bounded_download(i, url) for i, url in enumerate(slice_parameters)]
 
@@ -186,15 +399,197 @@ class MediaDownloader:
                 success_count += int(result)
                 progress_bar.update(i)
         except asyncio.CancelledError:
-            await self.session.close()
+            manifest.save()
             return False
         
         progress_bar.finish()
+        await manifest.flush(force=True)
 
         logger.info(
             f"{Color.fg('plum')}{track_type} Split download complete: Success "
             f"{Color.fg('light_yellow')}{success_count}{Color.reset()}/{Color.fg('gray')}{total}{Color.reset()}"
         )
+        self._log_concurrency(slice_parameters[0])
+        return success_count == total
+
+    def _log_concurrency(self, url: str) -> None:
+        limiter: AdaptiveLimiter = get_limiter(url)
+        logger.info(
+            f"{Color.fg('light_gray')}Concurrency{Color.reset()} {Color.fg('light_gray')}{limiter.host}{Color.reset()}: "
+            f"{Color.fg('light_yellow')}{limiter.current}{Color.reset()}/{Color.fg('gray')}{limiter.target}{Color.reset()} "
+            f"{Color.fg('light_gray')}(in flight / target){Color.reset()}"
+        )
+
+    async def stream_and_dl(
+        self, slice_parameters: List[str], track_dir: Path, init_path: Optional[Path], track_type: str
+    ) -> bool:
+        """邊下載邊依序寫入最終軌道檔，省去片段檔與之後的整檔合併"""
+        total: int = len(slice_parameters)
+        pipe_input: Optional[Path] = self.pipe_inputs.get(track_type)
+        output_file: Path = pipe_input or self.base_dir / f"{track_type}.{container}"
+        manifest: SegmentManifest = await SegmentManifest.open(track_dir / "manifest.json", slice_parameters)
+
+        # stream 模式下 manifest 的 done 代表「已寫入軌道檔」，只有連續完成的前綴可以續傳
+        resume_index: int = 0
+        resume_bytes: int = init_path.stat().st_size if init_path is not None else 0
+        for entry in manifest.entries if pipe_input is None else ():
+            if not entry.done:
+                break
+            resume_index += 1
+            resume_bytes += entry.size
+
+        self.direct_tracks.add(track_type)
+        writer = OrderedTrackWriter(
+            output_file,
+            track_dir,
+            max_buffer_bytes=CFG['Download']['stream_buffer_mb'] * 1024 * 1024,
+            on_commit=manifest.mark_done,
+        )
+        start_index: int = await writer.open(init_path, resume_index, resume_bytes)
+        for entry in manifest.entries[start_index:]:
+            manifest.mark_pending(entry.index)
+        if start_index:
+            logger.info(
+                f"{Color.fg('light_gray')}Continue writing{Color.reset()} {Color.fg('cyan')}{output_file.name}{Color.reset()} "
+                f"{Color.fg('light_gray')}from segment{Color.reset()} {Color.fg('light_yellow')}{start_index}{Color.reset()}"
+            )
+
+        tasks: Dict[int, "asyncio.Task[bool]"] = {}
+        # 已交給 writer 的片段；它們可能正在依序寫入，不能被取消
+        submitted: Set[int] = set()
+
+        async def bounded_download(i: int, url: str) -> bool:
+            if writer.broken:
+                return False
+            data: Optional[bytes] = await self._fetch_segment(url, flow=track_type)
+            if data is None:
+                # 軌道檔無法越過這個片段，之後的片段下載了也只會被丟棄，取消還在下載的，下次從這裡續傳
+                later: List["asyncio.Task[bool]"] = [
+                    task for j, task in tasks.items() if j > i and j not in submitted and not task.done()
+                ]
+                for task in later:
+                    task.cancel()
+                if later:
+                    logger.warning(
+                        f"{Color.fg('light_gray')}{track_type} segment {i} failed, "
+                        f"cancelled {len(later)} later segments{Color.reset()}"
+                    )
+                return False
+            submitted.add(i)
+            await writer.submit(i, data)
+            await manifest.flush()
+            return True
+
+        for i, url in enumerate(slice_parameters):
+            if i >= start_index:
+                tasks[i] = asyncio.create_task(bounded_download(i, url))
+
+        progress_bar = ProgressBar(total, prefix=track_type)
+        try:
+            for i, coro in enumerate(asyncio.as_completed(tasks.values()), start_index + 1):
+                try:
+                    await coro
+                except asyncio.CancelledError:
+                    # 被失敗的片段取消的是子任務；只有這個協程本身被取消時才往外拋
+                    if asyncio.current_task().cancelling():
+                        raise
+                progress_bar.update(i)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            await writer.close()
+            manifest.save()
+            return False
+        await writer.close()
+
+        progress_bar.finish()
+        await manifest.flush(force=True)
+
+        logger.info(
+            f"{Color.fg('plum')}{track_type} Stream download complete: Written "
+            f"{Color.fg('light_yellow')}{writer.next_index}{Color.reset()}/{Color.fg('gray')}{total}{Color.reset()} "
+            f"{Color.fg('light_gray')}into{Color.reset()} {Color.fg('light_gray')}{output_file}{Color.reset()}"
+        )
+        self._log_concurrency(slice_parameters[0])
+        return writer.next_index == total
+
+    async def prealloc_and_dl(
+        self, slice_parameters: List[str], track_dir: Path, init_path: Optional[Path], file_ext: str, track_type: str
+    ) -> bool:
+        """依片段大小預先配置軌道檔，每個片段下載完直接寫到自己的位移，不需要合併"""
+        total: int = len(slice_parameters)
+        output_file: Path = self.base_dir / f"{track_type}.{container}"
+        manifest: SegmentManifest = await SegmentManifest.open(track_dir / "manifest.json", slice_parameters)
+
+        async def probe(entry) -> None:
+            size: Optional[int] = await self._probe_size(entry.url)
+            if size:
+                manifest.mark_size(entry.index, size)
+
+        await asyncio.gather(*(probe(e) for e in manifest.entries if not e.size))
+        if not PreallocatedTrackFile.supported() or any(not e.size for e in manifest.entries):
+            logger.warning(
+                f"{Color.fg('light_gray')}Segment sizes unavailable for{Color.reset()} {Color.fg('cyan')}{track_type}{Color.reset()}"
+                f"{Color.fg('light_gray')}, falling back to files mode{Color.reset()}"
+            )
+            await manifest.flush(force=True)
+            return await self.task_and_dl(slice_parameters, track_dir, file_ext, track_type)
+
+        self.direct_tracks.add(track_type)
+        init_size: int = init_path.stat().st_size if init_path is not None else 0
+        offsets: List[int] = []
+        position: int = init_size
+        for entry in manifest.entries:
+            offsets.append(position)
+            position += entry.size
+
+        track_file = PreallocatedTrackFile(output_file, position)
+        if not await asyncio.to_thread(track_file.open):
+            # 軌道檔是新配置的，之前標記完成的片段都要重新寫入
+            for entry in manifest.entries:
+                manifest.mark_pending(entry.index)
+        if init_path is not None:
+            await track_file.copy_from(init_path, 0)
+
+        async def bounded_download(i: int, url: str) -> bool:
+            entry = manifest.entries[i]
+            if entry.done:
+                return True
+            data: Optional[bytes] = await self._fetch_segment(url, flow=track_type)
+            if data is None:
+                return False
+            if len(data) != entry.size:
+                logger.warning(f"{track_type} segment {i} size changed: {len(data)} != {entry.size}")
+                manifest.mark_size(i, 0)
+                return False
+            await track_file.write_at(offsets[i], data)
+            manifest.mark_done(i, len(data), zlib.crc32(data))
+            await manifest.flush()
+            return True
+
+        tasks = [bounded_download(i, url) for i, url in enumerate(slice_parameters)]
+
+        success_count: int = 0
+        progress_bar = ProgressBar(total, prefix=track_type)
+        try:
+            for i, coro in enumerate(asyncio.as_completed(tasks), 1):
+                success_count += int(await coro)
+                progress_bar.update(i)
+        except asyncio.CancelledError:
+            await track_file.close()
+            manifest.save()
+            return False
+        await track_file.close()
+
+        progress_bar.finish()
+        await manifest.flush(force=True)
+
+        logger.info(
+            f"{Color.fg('plum')}{track_type} Preallocated download complete: Success "
+            f"{Color.fg('light_yellow')}{success_count}{Color.reset()}/{Color.fg('gray')}{total}{Color.reset()} "
+            f"{Color.fg('light_gray')}into{Color.reset()} {Color.fg('light_gray')}{output_file}{Color.reset()}"
+        )
+        self._log_concurrency(slice_parameters[0])
         return success_count == total
 
     async def _merge_track(self, track_type: str, merge_type: str) -> bool:
@@ -255,31 +650,128 @@ class MediaDownloader:
             merge_type = 'hls'
         else:
             merge_type = 'mpd'
+        self.media_content = mpd_content
         try:
             if paramstore.get('nodl') is True:
                 logger.info(f"{Color.fg('light_gray')}Skip downloading{Color.reset()} {Color.fg('light_gray')}{merge_type}")
                 return True, merge_type
             
+            if getattr(mpd_content, 'live', False):
+                return await self.record_live(mpd_content), merge_type
+
+            if paramstore.get('skip_merge') is True:
+                # --skip-merge 需要保留片段檔，只能使用 files 模式
+                self.merge_mode = 'files'
+            if self.merge_mode == 'pipe':
+                if self._can_pipe(mpd_content):
+                    return await self.pipe_and_mux(mpd_content, merge_type), merge_type
+                # 不符合條件時退回 stream 模式，仍然省去片段檔
+                self.merge_mode = 'stream'
+
             tasks: List["asyncio.Task[bool]"] = []
+            track_types: List[str] = []
             if mpd_content.audio_track:
                 tasks.append(self.download_track(mpd_content.audio_track, "audio", merge_type))
+                track_types.append("audio")
             if mpd_content.video_track:
                 tasks.append(self.download_track(mpd_content.video_track, "video", merge_type))
+                track_types.append("video")
 
-            download_results: List[bool] = await asyncio.gather(*tasks)
+            download_results: Dict[str, bool] = dict(zip(track_types, await asyncio.gather(*tasks)))
             if paramstore.get('skip_merge') is not True:
                 merge_results: List[bool] = []
-                if mpd_content.video_track:
-                    merge_results.append(await self._merge_track("video", merge_type))
-                if mpd_content.audio_track:
-                    merge_results.append(await self._merge_track("audio", merge_type))
+                for track_type in ("video", "audio"):
+                    if track_type not in download_results:
+                        continue
+                    if track_type in self.direct_tracks:
+                        # 片段已直接寫入軌道檔，不需要再合併
+                        merge_results.append(download_results[track_type] is True)
+                    else:
+                        merge_results.append(await self._merge_track(track_type, merge_type))
                 return all(merge_results), merge_type
             else:
                 logger.info(f"{Color.fg('light_gray')}Skip merge because --skip-merge is {Color.fg('cyan')}True{Color.reset()}")
                 return False, merge_type
         finally:
-            if self.session:
-                await self.session.close()
+            self.session = None
+
+    async def record_live(self, hls_content: Any) -> bool:
+        """直播尚未結束：輪詢 media playlist 持續錄製，影音軌直接寫成軌道檔後交給一般的混流流程"""
+        recorders: List[LiveTrackRecorder] = [
+            LiveTrackRecorder(self, link, track_type)
+            for track_type, link in (("audio", hls_content.audio_link), ("video", hls_content.video_link))
+            if link
+        ]
+        logger.info(
+            f"{Color.fg('light_gray')}Live stream still on air, recording{Color.reset()} "
+            f"{Color.fg('light_yellow')}{len(recorders)}{Color.reset()} {Color.fg('light_gray')}tracks until it ends{Color.reset()}"
+        )
+        self.direct_tracks.update(recorder.track_type for recorder in recorders)
+        results: List[bool] = await asyncio.gather(*(recorder.record() for recorder in recorders))
+        return bool(results) and all(results)
+
+    def _can_pipe(self, mpd_content: MPDContent | HLS_Paser) -> bool:
+        """pipe 模式需要：呼叫端指定輸出檔（無 DRM）、支援 FIFO 的系統、ffmpeg 混流且影音軌都存在"""
+        return (
+            self.pipe_output is not None
+            and hasattr(os, 'mkfifo')
+            and str(CFG['Container']['mux']).upper() == 'FFMPEG'
+            and paramstore.get('skip_mux') is not True
+            and bool(mpd_content.video_track)
+            and bool(mpd_content.audio_track)
+            # 沒有 sidx 的 SegmentBase 軌道必須退回 files 模式，無法寫進 FIFO
+            and not any(
+                _is_segment_base(track) and (track.index_range is None or len(track.segment_urls) != 1)
+                for track in (mpd_content.video_track, mpd_content.audio_track)
+            )
+        )
+
+    async def pipe_and_mux(self, mpd_content: MPDContent | HLS_Paser, merge_type: str) -> bool:
+        """影音軌片段依序寫入 FIFO，ffmpeg 同時讀取並混流成最終檔案，不產生中間的軌道檔"""
+        self.piped = True
+        self.pipe_inputs = {track_type: self.base_dir / f"{track_type}.pipe" for track_type in ("video", "audio")}
+        for fifo in self.pipe_inputs.values():
+            fifo.unlink(missing_ok=True)
+            os.mkfifo(fifo)
+        logger.info(
+            f"{Color.fg('light_gray')}Piping segments into FFmpeg{Color.reset()} "
+            f"{Color.fg('light_gray')}->{Color.reset()} {Color.fg('light_gray')}{self.pipe_output}{Color.reset()}"
+        )
+
+        muxer: FFmpegMuxer = FFmpegMuxer(self.base_dir, None)
+        mux_task: asyncio.Task = asyncio.create_task(
+            muxer.mux_from_pipes(self.pipe_inputs["video"], self.pipe_inputs["audio"], self.pipe_output)
+        )
+        track_tasks: Dict[str, asyncio.Task] = {
+            "video": asyncio.create_task(self.download_track(mpd_content.video_track, "video", merge_type)),
+            "audio": asyncio.create_task(self.download_track(mpd_content.audio_track, "audio", merge_type)),
+        }
+        pending: Set[asyncio.Task] = {mux_task, *track_tasks.values()}
+        try:
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=0.2)
+                for track_type, task in track_tasks.items():
+                    if task.done():
+                        # 軌道已結束（或提前失敗沒開啟 FIFO）：讓 ffmpeg 讀到 EOF
+                        _release_fifo(self.pipe_inputs[track_type], os.O_WRONLY)
+                    elif mux_task.done():
+                        # ffmpeg 已結束：放開卡在 open() 的寫入端，之後的寫入會得到 BrokenPipeError
+                        _release_fifo(self.pipe_inputs[track_type], os.O_RDONLY)
+            download_ok: bool = all(task.result() is True for task in track_tasks.values())
+            mux_ok: bool = mux_task.result()
+        finally:
+            for task in (mux_task, *track_tasks.values()):
+                task.cancel()
+            for fifo in self.pipe_inputs.values():
+                _release_fifo(fifo, os.O_RDONLY)
+                fifo.unlink(missing_ok=True)
+            self.pipe_inputs = {}
+
+        if not (download_ok and mux_ok):
+            logger.warning(f"{Color.fg('light_gray')}Pipe mux incomplete, removing{Color.reset()} {self.pipe_output}")
+            self.pipe_output.unlink(missing_ok=True)
+            return False
+        return True
 
     async def force_remove_with_retry(self, path: Path) -> bool:
         max_retries: int = 20
@@ -295,6 +787,25 @@ class MediaDownloader:
         logger.error(f"Failed to remove after {max_retries} attempts: {path}")
         return False
 
+
+def _is_segment_base(track: Any) -> bool:
+    source = getattr(track, 'source', None)
+    return source is not None and source.kind == 'base'
+
+
+def _open_ended(url: str) -> bool:
+    byte_range = split_byte_range(url)[1]
+    return byte_range is not None and byte_range[1] is None
+
+
+def _release_fifo(fifo: Path, flags: int) -> None:
+    """以非阻塞方式開啟再關閉 FIFO，喚醒另一端卡在 open() 的行程或執行緒"""
+    try:
+        os.close(os.open(fifo, flags | os.O_NONBLOCK))
+    except OSError:
+        pass
+
+
 async def run_dl(
     mpd_uri: str,
     decryption_key: Optional[str],
@@ -311,7 +822,11 @@ async def run_dl(
     except AttributeError:
         hls_bool = False
 
-    if hls_bool is True:
+    playback_dict: Dict[str, Any] = json_data[1] if isinstance(json_data, tuple) else {}
+    # 直播中只有 HLS 可以持續輪詢錄製，動態 MPD 不支援
+    on_air: bool = playback_dict.get("media", {}).get("live", {}).get("status") in ON_AIR_STATUSES
+
+    if hls_bool is True or (on_air and raw_hls and not decryption_key):
         source_type = "hls"
     elif decryption_key:
         source_type = "mpd"
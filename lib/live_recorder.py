@@ -0,0 +1,170 @@
+import asyncio
+from typing import TYPE_CHECKING, List, Optional, Set
+
+from lib.__init__ import container, use_proxy
+from lib.load_yaml_config import CFG
+from lib.merge import OrderedTrackWriter
+from lib.mux.parse_m3u8 import MediaSegment, Playlist, parse_playlist
+from lib.path import Path
+from static.color import Color
+from unit.handle.handle_log import setup_logging
+from unit.http.request_berriz_api import GetRequest
+
+if TYPE_CHECKING:
+    from lib.download import MediaDownloader
+
+
+logger = setup_logging('live_recorder', 'coral')
+
+
+# 沒有 EXT-X-TARGETDURATION 時的輪詢間隔（秒）
+DEFAULT_TARGET_DURATION: float = 6.0
+
+
+class LiveTrackRecorder:
+    """輪詢直播中的 media playlist，以 media sequence 去重，新片段下載後依序附加到軌道檔，
+    直到出現 EXT-X-ENDLIST 或超過 live_end_timeout 沒有新片段"""
+
+    def __init__(self, downloader: "MediaDownloader", playlist_url: str, track_type: str) -> None:
+        self.downloader: "MediaDownloader" = downloader
+        self.playlist_url: str = playlist_url
+        self.track_type: str = track_type
+        self.track_dir: Path = downloader.base_dir / track_type
+        self.output_file: Path = downloader.base_dir / f"{track_type}.{container}"
+        self.end_timeout: int = CFG['Download']['live_end_timeout']
+        self.GetRequest = GetRequest()
+        # 下一個尚未排入下載的 media sequence
+        self.next_sequence: Optional[int] = None
+        self.discontinuity_sequence: int = 0
+        self.queued: int = 0
+        self.missing: int = 0
+        self.dropped: int = 0
+
+    async def _poll(self) -> Optional[Playlist]:
+        try:
+            resp = await self.GetRequest.get_request(self.playlist_url, use_proxy)
+        except Exception as e:
+            logger.warning(f"{Color.fg('light_gray')}Live playlist request failed{Color.reset()}: {e}")
+            return None
+        if resp is None or not getattr(resp, 'text', None):
+            return None
+        return parse_playlist(resp.text, self.playlist_url)
+
+    def _new_segments(self, playlist: Playlist) -> List[MediaSegment]:
+        """回傳還沒排入下載的片段；上次輪詢後已滑出視窗的片段只能記錄為遺失"""
+        if self.next_sequence is None:
+            self.next_sequence = playlist.media_sequence
+            self.discontinuity_sequence = playlist.discontinuity_sequence
+        # 整個視窗都在已排入的片段之前，或 discontinuity sequence 倒退：編碼器重啟後序號重新起算
+        if (playlist.media_sequence < self.next_sequence - len(playlist.segments)
+                or playlist.discontinuity_sequence < self.discontinuity_sequence):
+            logger.warning(
+                f"{Color.fg('gold')}{self.track_type}{Color.reset()} {Color.fg('light_gray')}"
+                f"media sequence went back from {self.next_sequence} to {playlist.media_sequence}, "
+                f"following the new live window{Color.reset()}"
+            )
+            self.next_sequence = playlist.media_sequence
+        self.discontinuity_sequence = playlist.discontinuity_sequence
+        if playlist.media_sequence > self.next_sequence:
+            gap: int = playlist.media_sequence - self.next_sequence
+            self.dropped += gap
+            logger.warning(
+                f"{Color.fg('gold')}{self.track_type}{Color.reset()} {Color.fg('light_gray')}"
+                f"{gap} segments left the live window before they were fetched{Color.reset()}"
+            )
+            self.next_sequence = playlist.media_sequence
+        start: int = self.next_sequence - playlist.media_sequence
+        new: List[MediaSegment] = playlist.segments[start:]
+        self.next_sequence += len(new)
+        return new
+
+    async def _download_init(self, playlist: Playlist) -> Optional[Path]:
+        inits: List[str] = playlist.init_urls()
+        if not inits:
+            return None
+        init_path: Path = self.track_dir / f"init_{self.track_type}_.bin"
+        if not await self.downloader._download_file(inits[0], init_path, flow=self.track_type):
+            raise ConnectionError(f"{self.track_type} initialization segment download failed")
+        return init_path
+
+    async def record(self) -> bool:
+        self.track_dir.mkdirp()
+        playlist: Optional[Playlist] = await self._poll()
+        if playlist is None or playlist.is_master:
+            logger.error(f"Cannot read live playlist: {self.playlist_url}")
+            return False
+        try:
+            init_path: Optional[Path] = await self._download_init(playlist)
+        except ConnectionError as e:
+            logger.error(e)
+            return False
+
+        writer = OrderedTrackWriter(
+            self.output_file,
+            self.track_dir,
+            max_buffer_bytes=CFG['Download']['stream_buffer_mb'] * 1024 * 1024,
+        )
+        await writer.open(init_path)
+        tasks: Set["asyncio.Task[None]"] = set()
+
+        async def fetch(index: int, segment: MediaSegment) -> None:
+            data: Optional[bytes] = await self.downloader._fetch_segment(segment.uri, flow=self.track_type)
+            if data is None:
+                # 直播無法重抓，留下空缺讓後面的片段繼續寫入
+                self.missing += 1
+                data = b''
+            await writer.submit(index, data)
+
+        logger.info(
+            f"{Color.fg('light_gray')}Recording live{Color.reset()} {Color.bg('cyan')}{self.track_type}{Color.reset()} "
+            f"{Color.fg('light_gray')}->{Color.reset()} {Color.fg('light_gray')}{self.output_file}{Color.reset()}"
+        )
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        last_new: float = loop.time()
+        target: float = playlist.target_duration or DEFAULT_TARGET_DURATION
+        try:
+            while True:
+                new: List[MediaSegment] = []
+                if playlist is not None:
+                    new = self._new_segments(playlist)
+                    target = playlist.target_duration or target
+                for segment in new:
+                    task: "asyncio.Task[None]" = asyncio.create_task(fetch(self.queued, segment))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    self.queued += 1
+                if new:
+                    last_new = loop.time()
+                    logger.debug(f"{self.track_type} live: {len(new)} new segments, {self.queued} total")
+                if playlist is not None and playlist.endlist:
+                    logger.info(f"{Color.fg('light_gray')}{self.track_type} live stream ended{Color.reset()}")
+                    break
+                if loop.time() - last_new > self.end_timeout:
+                    logger.warning(
+                        f"{Color.fg('gold')}{self.track_type}{Color.reset()} {Color.fg('light_gray')}"
+                        f"no new segment for {self.end_timeout}s, treating the live as ended{Color.reset()}"
+                    )
+                    break
+                # 播放清單沒有變化時以一半的目標長度重新輪詢（RFC 8216 6.3.4）
+                await asyncio.sleep(target if new else target / 2)
+                playlist = await self._poll()
+            if tasks:
+                await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await writer.close()
+            raise
+        await writer.close()
+
+        logger.info(
+            f"{Color.fg('plum')}{self.track_type} Live recording complete: Written "
+            f"{Color.fg('light_yellow')}{self.queued - self.missing}{Color.reset()}/{Color.fg('gray')}{self.queued}{Color.reset()} "
+            f"{Color.fg('light_gray')}segments into{Color.reset()} {Color.fg('light_gray')}{self.output_file}{Color.reset()}"
+        )
+        if self.missing or self.dropped:
+            logger.warning(
+                f"{Color.fg('gold')}{self.track_type}{Color.reset()} {Color.fg('light_gray')}recording has gaps: "
+                f"{self.missing} failed, {self.dropped} missed{Color.reset()}"
+            )
+        return self.queued > self.missing
@@ -181,6 +181,10 @@ class ConfigLoader:
             can_form_packa = "packager" in decryption_engine
             if has_all_chars and (can_form_shaka or can_form_packa):
                 cont["decryption-engine"] = "SHAKA_PACKAGER"
+        mux_workers = cont.get("mux_workers")
+        if not isinstance(mux_workers, int) or isinstance(mux_workers, bool) or mux_workers <= 0:
+            ConfigLoader.print_warning('Container.mux_workers', mux_workers, '2')
+            cont["mux_workers"] = 2
 
         # 6. HLS or MPEG-DASH 區段
         hls_sec = config.get("HLS or MPEG-DASH", {})
@@ -302,6 +306,84 @@ class ConfigLoader:
             ConfigLoader.print_warning('Proxy.use_proxy_list', proxy.get("use_proxy_list"), 'False')
             proxy["use_proxy_list"] = False
 
+        # 13. Download
+        dl = config.get("Download", {})
+        if not isinstance(dl, dict):
+            raise TypeError("Download must be a dict")
+        merge_mode = dl.get("merge_mode")
+        if not isinstance(merge_mode, str) or merge_mode.strip().lower() not in ("files", "stream", "prealloc", "pipe"):
+            ConfigLoader.print_warning('Download.merge_mode', merge_mode, 'files')
+            dl["merge_mode"] = "files"
+        else:
+            dl["merge_mode"] = merge_mode.strip().lower()
+        if not isinstance(dl.get("stream_buffer_mb"), int) or dl.get("stream_buffer_mb") <= 0:
+            ConfigLoader.print_warning('Download.stream_buffer_mb', dl.get("stream_buffer_mb"), '256')
+            dl["stream_buffer_mb"] = 256
+        range_mb = dl.get("range_request_mb")
+        if not isinstance(range_mb, int) or isinstance(range_mb, bool) or range_mb < 0:
+            ConfigLoader.print_warning('Download.range_request_mb', range_mb, '16')
+            dl["range_request_mb"] = 16
+        for key, default in (
+            ("initial_concurrency", 50), ("min_concurrency", 2), ("max_concurrency", 128),
+            ("pool_limit", 256), ("keepalive_timeout", 60), ("dns_cache_ttl", 600),
+        ):
+            value = dl.get(key)
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                ConfigLoader.print_warning(f'Download.{key}', value, str(default))
+                dl[key] = default
+        if dl["min_concurrency"] > dl["max_concurrency"]:
+            ConfigLoader.print_warning('Download.min_concurrency', dl["min_concurrency"], str(dl["max_concurrency"]))
+            dl["min_concurrency"] = dl["max_concurrency"]
+        for key in ("max_rate_mb", "per_media_rate_mb"):
+            value = dl.get(key)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                ConfigLoader.print_warning(f'Download.{key}', value, '0')
+                dl[key] = 0
+        verify = dl.get("verify_segments")
+        if verify is False:
+            # YAML 1.1 解析器會把 off 讀成 False
+            verify = "off"
+        if not isinstance(verify, str) or verify.strip().lower() not in ("off", "length", "structure"):
+            ConfigLoader.print_warning('Download.verify_segments', verify, 'length')
+            dl["verify_segments"] = "length"
+        else:
+            dl["verify_segments"] = verify.strip().lower()
+        if not isinstance(dl.get("live_record"), bool):
+            ConfigLoader.print_warning('Download.live_record', dl.get("live_record"), 'true')
+            dl["live_record"] = True
+        live_end_timeout = dl.get("live_end_timeout")
+        if not isinstance(live_end_timeout, int) or isinstance(live_end_timeout, bool) or live_end_timeout <= 0:
+            ConfigLoader.print_warning('Download.live_end_timeout', live_end_timeout, '60')
+            dl["live_end_timeout"] = 60
+        pipeline = dl.get("pipeline")
+        if not isinstance(pipeline, dict):
+            ConfigLoader.print_warning('Download.pipeline', pipeline, '{fetch: 2, download: 2, mux: 1, finalize: 2}')
+            pipeline = {}
+        for key, default in (("fetch", 2), ("download", 2), ("mux", 1), ("finalize", 2)):
+            value = pipeline.get(key, default)
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                ConfigLoader.print_warning(f'Download.pipeline.{key}', value, str(default))
+                value = default
+            pipeline[key] = value
+        dl["pipeline"] = pipeline
+        config["Download"] = dl
+
+        # 14. Index
+        index = config.get("Index", {})
+        if not isinstance(index, dict):
+            ConfigLoader.print_warning('Index', index, '{enable: true, full_sync_hours: 24}')
+            index = {}
+        if not isinstance(index.get("enable", True), bool):
+            ConfigLoader.print_warning('Index.enable', index.get("enable"), 'true')
+            index["enable"] = True
+        index.setdefault("enable", True)
+        full_sync_hours = index.get("full_sync_hours", 24)
+        if not isinstance(full_sync_hours, (int, float)) or isinstance(full_sync_hours, bool) or full_sync_hours < 0:
+            ConfigLoader.print_warning('Index.full_sync_hours', full_sync_hours, '24')
+            full_sync_hours = 24
+        index["full_sync_hours"] = full_sync_hours
+        config["Index"] = index
+
     def print_warning(invaild_message: str, invaild_value: str,correct_message: str) -> None:
         logger.warning(
             f"Unsupported value {Color.bg('ruby')}{invaild_message}{Color.reset()}"
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import orjson
+
+from lib.path import Path
+from static.color import Color
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('manifest', 'wheat')
+
+
+def crc32_file(path: Path, chunk_size: int = 4 * 1024 * 1024) -> int:
+    """計算既有檔案的 CRC32，用於續傳時延續校驗值"""
+    crc: int = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            crc = zlib.crc32(data, crc)
+    return crc
+
+
+def same_resource(url_a: str, url_b: str) -> bool:
+    """CDN 簽名參數每次都不同，只比對 path 判斷是否為同一個片段；
+    同一個檔案的不同位元組範圍（fragment）視為不同片段"""
+    a, b = urlsplit(url_a), urlsplit(url_b)
+    return a.path == b.path and a.fragment == b.fragment
+
+
+@dataclass
+class SegmentEntry:
+    index: int
+    url: str
+    size: int = 0
+    done: bool = False
+    checksum: str = ''
+
+
+class SegmentManifest:
+    """每條軌道一份的片段清單，記錄片段 URL、預期大小、完成狀態與 CRC32"""
+
+    flush_interval: float = 2.0
+
+    def __init__(self, path: Path, entries: List[SegmentEntry]) -> None:
+        self.path: Path = path
+        self.entries: List[SegmentEntry] = entries
+        self._dirty: bool = False
+        self._last_flush: float = time.monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, path: Path, urls: Sequence[str]) -> "SegmentManifest":
+        """載入既有清單並與本次的 URL 列表對齊，不存在則建立新的清單"""
+        previous: Dict[int, Dict[str, Any]] = {}
+        if path.exists():
+            try:
+                raw: bytes = await asyncio.to_thread(path.read_bytes)
+                previous = {item['index']: item for item in orjson.loads(raw).get('segments', [])}
+            except (orjson.JSONDecodeError, KeyError, TypeError, OSError) as e:
+                logger.warning(f"{Color.fg('light_gray')}Ignore broken manifest {path}: {e}{Color.reset()}")
+                previous = {}
+
+        entries: List[SegmentEntry] = []
+        reused: int = 0
+        for i, url in enumerate(urls):
+            old: Optional[Dict[str, Any]] = previous.get(i)
+            if old is not None and same_resource(old.get('url', ''), url):
+                entries.append(SegmentEntry(i, url, old.get('size', 0), old.get('done', False), old.get('checksum', '')))
+                reused += int(old.get('done', False))
+            else:
+                entries.append(SegmentEntry(i, url))
+        manifest = cls(path, entries)
+        if reused:
+            logger.info(
+                f"{Color.fg('light_gray')}Resume from manifest{Color.reset()} "
+                f"{Color.fg('light_yellow')}{reused}{Color.reset()}/{Color.fg('gray')}{len(entries)}{Color.reset()} "
+                f"{Color.fg('light_gray')}segments already complete{Color.reset()}"
+            )
+        await manifest.flush(force=True)
+        return manifest
+
+    def is_complete(self, index: int, save_path: Path) -> bool:
+        """片段已標記完成且檔案大小與紀錄一致"""
+        entry: SegmentEntry = self.entries[index]
+        if not entry.done:
+            return False
+        try:
+            return save_path.stat().st_size == entry.size
+        except FileNotFoundError:
+            return False
+
+    def mark_size(self, index: int, size: int) -> None:
+        entry: SegmentEntry = self.entries[index]
+        if entry.size != size:
+            entry.size = size
+            self._dirty = True
+
+    def mark_done(self, index: int, size: int, checksum: int) -> None:
+        entry: SegmentEntry = self.entries[index]
+        entry.size = size
+        entry.done = True
+        entry.checksum = f"{checksum:08x}"
+        self._dirty = True
+
+    def mark_pending(self, index: int) -> None:
+        entry: SegmentEntry = self.entries[index]
+        if entry.done:
+            entry.done = False
+            entry.checksum = ''
+            self._dirty = True
+
+    def _serialize(self) -> bytes:
+        return orjson.dumps({'segments': [asdict(e) for e in self.entries]})
+
+    def save(self) -> None:
+        """同步寫入（取消流程中使用），先寫暫存檔再原子替換"""
+        self._dirty = False
+        tmp_path: Path = self.path.with_suffix(self.path.suffix + '.part')
+        with open(tmp_path, 'wb') as f:
+            f.write(self._serialize())
+        os.replace(tmp_path, self.path)
+        self._last_flush = time.monotonic()
+
+    async def flush(self, force: bool = False) -> None:
+        """有變更時才寫入；非強制時最多每 flush_interval 秒寫一次"""
+        if not force and (not self._dirty or time.monotonic() - self._last_flush < self.flush_interval):
+            return
+        async with self._lock:
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError as e:
+                logger.warning(f"Failed to write manifest {self.path}: {e}")
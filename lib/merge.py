@@ -1,8 +1,9 @@
 import asyncio
-import shutil
-from typing import List
+import os
+import stat
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-import aiofiles
 from rich.progress import (
     Progress,
     SpinnerColumn,
@@ -12,6 +13,7 @@ from rich.progress import (
 )
 
 from static.color import Color
+from lib.manifest import crc32_file
 from lib.path import Path
 from unit.handle.handle_log import setup_logging
 
@@ -20,6 +22,8 @@ logger = setup_logging('merge', 'blush')
 
 
 class MERGE:
+    COPY_BLOCK: int = 64 * 1024 * 1024
+
     @staticmethod
     async def binary_merge(
         output_file: Path,
@@ -28,17 +32,23 @@ class MERGE:
         track_type: str,
         merge_type: str
     ) -> bool:
-        temp_dir: Path = output_file.parent / f"temp_merging_{track_type}"
-        temp_dir.mkdirp()
         try:
-            if merge_type == 'mpd' and init_files:
-                async with aiofiles.open(init_files[0], 'rb') as src:
-                    async with aiofiles.open(output_file, 'wb') as dst:
-                        content = await src.read()
-                        await dst.write(content)
-                logger.info(f"{track_type} init file copied")
+            # DASH 的初始化片段與 fMP4 HLS 的 EXT-X-MAP 都要放在軌道檔最前面
+            head: List[Path] = [init_files[0]] if init_files else []
+            sources: List[Path] = head + list(segments)
+            sizes: List[int] = [p.stat().st_size for p in sources]
+            # 預先算好每個片段在輸出檔中的位置，各工作執行緒直接寫到自己的區段
+            offsets: List[int] = []
+            position: int = 0
+            for size in sizes:
+                offsets.append(position)
+                position += size
+            total_bytes: int = position
 
-            total_bytes = sum(p.stat().st_size for p in segments)
+            with open(output_file, 'wb') as f:
+                f.truncate(total_bytes)
+            if head:
+                logger.info(f"{track_type} init file copied")
 
             progress = Progress(
                 SpinnerColumn(),
@@ -53,43 +63,22 @@ class MERGE:
                     f"[cyan]{track_type}[/] merging",
                     total=total_bytes
                 )
-                chunk_size = 30
-                chunks: List[List[Path]] = [
-                    segments[i:i + chunk_size]
-                    for i in range(0, len(segments), chunk_size)
-                ]
-                temp_files: List[Path] = [
-                    temp_dir / f"chunk_{idx}.tmp"
-                    for idx in range(len(chunks))
-                ]
-                tasks = [
-                    MERGE.process_chunk_async(chunk, temp_file, progress, task_id)
-                    for chunk, temp_file in zip(chunks, temp_files)
-                ]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+                workers: int = max(1, min(4, os.cpu_count() or 1, len(sources)))
+                jobs: List[List[Tuple[Path, int, int]]] = [[] for _ in range(workers)]
+                for idx, job in enumerate(zip(sources, offsets, sizes)):
+                    jobs[idx * workers // len(sources)].append(job)
+                advance: Callable[[int], None] = lambda n: progress.update(task_id, advance=n)
+                results = await asyncio.gather(
+                    *(asyncio.to_thread(MERGE._copy_range_worker, output_file, job, advance) for job in jobs),
+                    return_exceptions=True,
+                )
 
                 # 檢查是否有任務失敗
                 for idx, result in enumerate(results):
                     if isinstance(result, Exception):
-                        logger.error(f"{track_type} chunk {idx} failed: {result}")
-                        shutil.rmtree(temp_dir, ignore_errors=True)
+                        logger.error(f"{track_type} merge worker {idx} failed: {result}")
                         return False
 
-            # 合併所有 chunk 到 output_file
-            mode: str = "wb" if merge_type == 'hls' else "ab"
-            async with aiofiles.open(output_file, mode=mode) as outfile:
-                for temp_file in temp_files:
-                    if not temp_file.exists():
-                        continue
-                    async with aiofiles.open(temp_file, mode="rb") as infile:
-                        buffer_size: int = 32 * 1024 * 1024
-                        while True:
-                            data = await infile.read(buffer_size)
-                            if not data:
-                                break
-                            await outfile.write(data)
-
-            shutil.rmtree(temp_dir, ignore_errors=True)
             logger.info(
                 f"{Color.fg('light_gray')}{track_type} "
                 f"{Color.fg('sienna')}Merger completed: "
@@ -99,29 +88,254 @@ class MERGE:
 
         except Exception as e:
             logger.error(f"{track_type} Merger failed: {str(e)}")
-            shutil.rmtree(temp_dir, ignore_errors=True)
             return False
 
     @staticmethod
-    async def process_chunk_async(
-        segments: List[Path],
-        temp_file: Path,
-        progress: Progress,
-        task_id # 傳遞 Progress 物件和 Task ID 以便更新
-    ) -> bool:
-        CHUNK_READ_SIZE = 2 * 1024 * 1024 
-        try:
-            async with aiofiles.open(temp_file, "wb") as outfile:
-                for seg in segments:
-                    async with aiofiles.open(seg, "rb") as infile:
-                        while True:
-                            content = await infile.read(CHUNK_READ_SIZE)
-                            if not content:
-                                break
-                            await outfile.write(content)
-                            progress.update(task_id, advance=len(content))
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to process chunk {temp_file}: {e}")
-            raise
\ No newline at end of file
+    def _copy_range_worker(
+        output_file: Path,
+        jobs: List[Tuple[Path, int, int]],
+        advance: Callable[[int], None],
+    ) -> None:
+        """在工作執行緒中把片段依預算好的位移寫入輸出檔，優先使用核心內複製"""
+        with open(output_file, 'r+b') as dst:
+            dst_fd: int = dst.fileno()
+            for src_path, offset, size in jobs:
+                with open(src_path, 'rb') as src:
+                    MERGE._copy_into_offset(src.fileno(), dst, dst_fd, offset, size, advance)
+
+    @staticmethod
+    def _copy_into_offset(
+        src_fd: int,
+        dst,
+        dst_fd: int,
+        offset: int,
+        size: int,
+        advance: Callable[[int], None],
+    ) -> None:
+        copied: int = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < size:
+                    n: int = os.copy_file_range(
+                        src_fd, dst_fd, min(MERGE.COPY_BLOCK, size - copied), copied, offset + copied
+                    )
+                    if n == 0:
+                        break
+                    copied += n
+                    advance(n)
+            except OSError:
+                # 跨檔案系統或核心不支援時改用下面的方式繼續複製
+                pass
+        if copied < size and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(dst_fd, offset + copied, os.SEEK_SET)
+                while copied < size:
+                    n = os.sendfile(dst_fd, src_fd, copied, min(MERGE.COPY_BLOCK, size - copied))
+                    if n == 0:
+                        break
+                    copied += n
+                    advance(n)
+            except OSError:
+                pass
+        if copied < size:
+            dst.seek(offset + copied)
+            os.lseek(src_fd, copied, os.SEEK_SET)
+            while copied < size:
+                data: bytes = os.read(src_fd, min(8 * 1024 * 1024, size - copied))
+                if not data:
+                    break
+                dst.write(data)
+                copied += len(data)
+                advance(len(data))
+            dst.flush()
+        if copied != size:
+            raise IOError(f"short copy at offset {offset}: {copied}/{size} bytes")
+
+
+class OrderedTrackWriter:
+    """依序把片段附加到軌道檔，提前完成的片段先暫存，等前面的片段到齊再寫入"""
+
+    def __init__(
+        self,
+        output_file: Path,
+        spill_dir: Path,
+        max_buffer_bytes: int = 256 * 1024 * 1024,
+        on_commit: Optional[Callable[[int, int, int], None]] = None,
+    ) -> None:
+        self.output_file: Path = output_file
+        self.spill_dir: Path = spill_dir
+        self.max_buffer_bytes: int = max_buffer_bytes
+        self.on_commit: Optional[Callable[[int, int, int], None]] = on_commit
+        self.next_index: int = 0
+        self.written_bytes: int = 0
+        self._pending: Dict[int, Union[bytes, Path]] = {}
+        self._buffered: int = 0
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._drain_task: Optional[asyncio.Task] = None
+        self._file = None
+        # 輸出為 FIFO 且讀取端（ffmpeg）已結束時為 True，之後的片段直接丟棄
+        self.broken: bool = False
+
+    async def open(self, init_file: Optional[Path] = None, resume_index: int = 0, resume_bytes: int = 0) -> int:
+        """開啟軌道檔並回傳下一個要寫入的片段索引；可續傳時截斷到已提交的位置"""
+        if resume_index and self.output_file.exists() and self.output_file.stat().st_size >= resume_bytes:
+            self._file = await asyncio.to_thread(open, self.output_file, 'r+b')
+            await asyncio.to_thread(self._file.truncate, resume_bytes)
+            self._file.seek(resume_bytes)
+            self.next_index = resume_index
+            self.written_bytes = resume_bytes
+            return self.next_index
+        self._file = await asyncio.to_thread(open, self.output_file, 'wb')
+        if init_file is not None:
+            await asyncio.to_thread(self._copy_into, init_file)
+        return self.next_index
+
+    def _copy_into(self, src: Path) -> int:
+        with open(src, 'rb') as infile:
+            copied: int = 0
+            while True:
+                data = infile.read(8 * 1024 * 1024)
+                if not data:
+                    break
+                self._file.write(data)
+                copied += len(data)
+        self.written_bytes += copied
+        return copied
+
+    def _write_bytes(self, data: bytes) -> None:
+        self._file.write(data)
+        self.written_bytes += len(data)
+
+    async def _spill(self, index: int, data: bytes) -> Path:
+        spill_path: Path = self.spill_dir / f"spill_{index}.part"
+        await asyncio.to_thread(spill_path.write_bytes, data)
+        return spill_path
+
+    async def submit(self, index: int, data: bytes) -> None:
+        """交付一個已下載完成的片段；輪到它時立即寫入，否則暫存在記憶體或溢寫到磁碟"""
+        if self.broken:
+            return
+        if index != self.next_index and self._buffered + len(data) > self.max_buffer_bytes:
+            self._pending[index] = await self._spill(index, data)
+        else:
+            self._pending[index] = data
+            self._buffered += len(data)
+        if self._lock.locked():
+            # 另一個提交者正在依序寫入，會順便處理這個片段
+            return
+        # 依序寫入在獨立任務中進行，提交者被取消時已取出的片段仍會寫完並記錄，暫存的片段也不會被遺留
+        self._drain_task = asyncio.create_task(self._drain())
+        await asyncio.shield(self._drain_task)
+
+    async def _drain(self) -> None:
+        async with self._lock:
+            while self.next_index in self._pending and not self.broken:
+                item: Union[bytes, Path] = self._pending.pop(self.next_index)
+                try:
+                    if isinstance(item, bytes):
+                        self._buffered -= len(item)
+                        await asyncio.to_thread(self._write_bytes, item)
+                        size: int = len(item)
+                        crc: int = zlib.crc32(item)
+                    else:
+                        size = await asyncio.to_thread(self._copy_into, item)
+                        crc = await asyncio.to_thread(crc32_file, item)
+                        item.unlink(missing_ok=True)
+                except BrokenPipeError:
+                    if isinstance(item, Path):
+                        item.unlink(missing_ok=True)
+                    self._mark_broken()
+                    break
+                if self.on_commit:
+                    self.on_commit(self.next_index, size, crc)
+                self.next_index += 1
+
+    def _mark_broken(self) -> None:
+        self.broken = True
+        logger.warning(
+            f"{Color.fg('light_gray')}{self.output_file.name} reader closed at segment {self.next_index}, "
+            f"dropping the remaining segments{Color.reset()}"
+        )
+        for item in self._pending.values():
+            if isinstance(item, Path):
+                item.unlink(missing_ok=True)
+        self._pending.clear()
+        self._buffered = 0
+
+    async def close(self) -> None:
+        """關閉軌道檔並清除未能依序寫入的暫存片段"""
+        async with self._lock:
+            if self._file is not None:
+                try:
+                    await asyncio.to_thread(self._file.flush)
+                    if stat.S_ISREG(os.fstat(self._file.fileno()).st_mode):
+                        await asyncio.to_thread(os.fsync, self._file.fileno())
+                    await asyncio.to_thread(self._file.close)
+                except BrokenPipeError:
+                    # close 失敗時底層 fd 仍會被關閉
+                    self.broken = True
+                    try:
+                        self._file.close()
+                    except BrokenPipeError:
+                        pass
+                self._file = None
+            for item in self._pending.values():
+                if isinstance(item, Path):
+                    item.unlink(missing_ok=True)
+            if self._pending:
+                logger.warning(
+                    f"{Color.fg('light_gray')}{self.output_file.name} stopped at segment "
+                    f"{self.next_index}, {len(self._pending)} segments could not be written in order{Color.reset()}"
+                )
+            self._pending.clear()
+            self._buffered = 0
+
+
+class PreallocatedTrackFile:
+    """預先配置好大小的軌道檔，各片段依自己的位移直接寫入"""
+
+    def __init__(self, output_file: Path, total_size: int) -> None:
+        self.output_file: Path = output_file
+        self.total_size: int = total_size
+        self.fd: Optional[int] = None
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(os, 'pwrite')
+
+    def open(self) -> bool:
+        """開啟軌道檔；檔案已存在且大小相符時回傳 True 表示可沿用先前寫入的片段"""
+        reusable: bool = self.output_file.exists() and self.output_file.stat().st_size == self.total_size
+        self.fd = os.open(self.output_file, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+        if not reusable:
+            os.ftruncate(self.fd, 0)
+            if hasattr(os, 'posix_fallocate') and self.total_size:
+                try:
+                    os.posix_fallocate(self.fd, 0, self.total_size)
+                except OSError:
+                    # 檔案系統不支援時退回稀疏檔
+                    os.ftruncate(self.fd, self.total_size)
+            else:
+                os.ftruncate(self.fd, self.total_size)
+        return reusable
+
+    def _write_at(self, offset: int, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            n: int = os.pwrite(self.fd, view, offset)
+            view = view[n:]
+            offset += n
+
+    async def write_at(self, offset: int, data: bytes) -> None:
+        await asyncio.to_thread(self._write_at, offset, data)
+
+    async def copy_from(self, src: Path, offset: int) -> int:
+        data: bytes = await asyncio.to_thread(src.read_bytes)
+        await self.write_at(offset, data)
+        return len(data)
+
+    async def close(self) -> None:
+        if self.fd is not None:
+            fd, self.fd = self.fd, None
+            await asyncio.to_thread(os.fsync, fd)
+            os.close(fd)
@@ -1,11 +1,12 @@
 import asyncio
-import subprocess
 import os
 from pathlib import Path
 from typing import List, Optional, Any, Union
 
 from lib.__init__ import container
 from lib.load_yaml_config import CFG, ConfigLoader
+from lib.mux.process import run_tool
+from lib.processbar import ProgressBar
 from static.color import Color
 from static.route import Route
 from static.parameter import paramstore
@@ -94,17 +95,12 @@ class FFmpegMuxer:
             # 建立完整的命令
             command: List[str] = [str(mp4decrypt_path)] + key_args + [str(self.input_path), str(self.output_path)]
             
-            subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-            )
+            returncode, output = await run_tool(command, 'mp4decrypt')
+            if returncode != 0:
+                logger.error(f"Decryption failed for {self.input_path}: {output}")
+                return False
             return True
             
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Decryption failed for {self.input_path}: {e.stderr or e.stdout}")
-            return False
         except Exception as e:
             logger.error(f"Unexpected error decrypting {self.input_path}: {str(e)}")
             return False
@@ -137,22 +133,17 @@ class FFmpegMuxer:
         ] + key_args
 
         try:
-            result = subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-            logger.debug(f"Packager output: {result.stdout}")
+            returncode, output = await run_tool(command, 'packager')
+            if returncode != 0:
+                logger.error(f"Packager failed: {output}")
+                return False
+            logger.debug(f"Packager output: {output}")
 
             # 成功後.m4v 改回指定副檔名
             final_output_path = packager_output_path.with_suffix(f".{container}")
             packager_output_path.rename(final_output_path)
             return True
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Packager failed: {e.stderr}")
-            return False
         except Exception as e:
             logger.exception(f"Unexpected error running packager: {e}")
             return False
@@ -227,57 +218,50 @@ class FFmpegMuxer:
         except AttributeError:
             ConfigLoader.print_warning('MUX', mux_tool, 'ffmpeg')
             mux_tool = 'FFMPEG'
-        MKVTOOLNIX_path: Path = Route().mkvmerge_path
-        if not MKVTOOLNIX_path.exists():
-            logger.error(f"shaka-packager.exe not found at: {MKVTOOLNIX_path}")
-            return False
         match mux_tool:
             case 'FFMPEG':
                 cmd: List[str] = await self.build_ffmpeg_command(video_file_str, audio_file_str, temp_file_path)
-                
-                try:
-                    logger.info(F"{Color.fg('light_gray')}Start using FFmpeg to mux video and audio...{Color.reset()}")
-                    result: subprocess.CompletedProcess = subprocess.run(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        universal_newlines=True,
-                    )
-
-                    if result.returncode != 0:
-                        logger.error(f"FFmpeg multiplexing failed:\n{result.stderr}")
-                        return False
-                    logger.info(f"{Color.fg('gray')}Mixed flow completed: {temp_file_path}{Color.reset()}")
-                    return True
-                except Exception as e:
-                    logger.error(f"FFmpeg mixing error: {str(e)}")
-                    return False
+                logger.info(F"{Color.fg('light_gray')}Start using FFmpeg to mux video and audio...{Color.reset()}")
+                return await self._run_mux(cmd, 'FFmpeg', temp_file_path)
             case 'MKVTOOLNIX':
+                MKVTOOLNIX_path: Path = Route().mkvmerge_path
+                if not MKVTOOLNIX_path.exists():
+                    logger.error(f"mkvmerge.exe not found at: {MKVTOOLNIX_path}")
+                    return False
                 cmd = [
                     MKVTOOLNIX_path,
                     "-o", str(temp_file_path),
                     str(Path(video_file_str)),
                     str(Path(audio_file_str)),
                 ]
-                try:
-                    logger.info(f"{Color.fg('light_gray')}Start using mkvmerge to mux video and audio...{Color.reset()}")
-                    result: subprocess.CompletedProcess = subprocess.run(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        universal_newlines=True,
-                    )
-                    if result.returncode != 0:
-                        logger.error(f"mkvmerge multiplexing failed:\n{result.stderr}")
-                        return False
-                    logger.info(f"{Color.fg('gray')}Mixed flow completed: {temp_file_path}{Color.reset()}")
-                    return True
-                except Exception as e:
-                    logger.error(f"mkvmerge mixing error: {str(e)}")
-                    return False
+                logger.info(f"{Color.fg('light_gray')}Start using mkvmerge to mux video and audio...{Color.reset()}")
+                return await self._run_mux(cmd, 'mkvmerge', temp_file_path)
             case _:
                 logger.error(f"Unsupported mux tool: {mux_tool}")
                 return False
+
+    async def mux_from_pipes(self, video_pipe: Path, audio_pipe: Path, output_path: Path) -> bool:
+        """從下載端依序寫入的 FIFO 讀取影音軌並混流，只有最終檔案會寫入磁碟"""
+        cmd: List[str] = await self.build_ffmpeg_command(str(video_pipe), str(audio_pipe), output_path)
+        logger.info(F"{Color.fg('light_gray')}Start using FFmpeg to mux video and audio from pipes...{Color.reset()}")
+        return await self._run_mux(cmd, 'FFmpeg', output_path)
+
+    async def _run_mux(self, cmd: List[Any], tool_name: str, temp_file_path: Path) -> bool:
+        """非同步執行混流工具，輸出進度條；取消時子行程會一併終止"""
+        progress_bar = ProgressBar(100, prefix='mux')
+        try:
+            returncode, output = await run_tool(
+                cmd, tool_name, lambda fraction: progress_bar.update(int(fraction * 100))
+            )
+        except OSError as e:
+            logger.error(f"{tool_name} mixing error: {str(e)}")
+            return False
+        if returncode != 0:
+            logger.error(f"{tool_name} multiplexing failed:\n{output}")
+            return False
+        progress_bar.finish()
+        logger.info(f"{Color.fg('gray')}Mixed flow completed: {temp_file_path}{Color.reset()}")
+        return True
         
     async def build_ffmpeg_command(
         self,
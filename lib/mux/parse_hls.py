@@ -1,9 +1,7 @@
 import asyncio
 import re
-from pprint import pprint
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
-from urllib.parse import urljoin
 
 from InquirerPy import inquirer
 from rich.console import Console
@@ -11,6 +9,8 @@ from rich.table import Table
 from rich import box
 
 from lib.__init__ import use_proxy, CFG
+from lib.byte_range import coalesce_ranges
+from lib.mux.parse_m3u8 import Key, Playlist, RESOLUTION_PATTERN, parse_playlist
 from static.parameter import paramstore
 from static.color import Color
 from unit.handle.handle_log import setup_logging
@@ -20,7 +20,7 @@ from unit.http.request_berriz_api import GetRequest
 logger = setup_logging('parse_hls', 'periwinkle')
 
 
-REGEX_HLS_PATTERN: str = r'#.*|.*\.(?:ts|mp4|m4a|m4v|aac)'
+PLAYLIST_SUFFIX_PATTERN: re.Pattern[str] = re.compile(r'/\d+/playlist\.m3u8$')
 
 
 @dataclass
@@ -31,6 +31,11 @@ class HLSContent:
     audio_link: str
     video_link: str
     best_info: str
+    # fMP4 的 EXT-X-MAP，與 DASH 的 init 一樣先下載並放在軌道最前面
+    video_init: Optional[str] = None
+    audio_init: Optional[str] = None
+    # media playlist 沒有 EXT-X-ENDLIST：直播仍在進行，需要持續輪詢錄製
+    live: bool = False
 
 
 class HLS_Paser:
@@ -44,6 +49,9 @@ class HLS_Paser:
         self.audio_encryption_key_uri: Optional[str] = None
         self.audio_encryption_key: Optional[bytes] = None
         self._logged_key_iv: bool = False
+        # 解析後的 media playlist，片段的長度、位元組範圍與金鑰都在這裡
+        self.video_playlist: Optional[Playlist] = None
+        self.audio_playlist: Optional[Playlist] = None
         self.GetRequest = GetRequest()
 
     def make_obj(self, highest_video: Any, highest_audio: Any, base_url: Optional[str], best_info:str) -> HLSContent:
@@ -54,72 +62,69 @@ class HLS_Paser:
                 base_url=base_url,
                 audio_link=self.audio_link,
                 video_link=self.m3u8_highest,
-                best_info=best_info
+                best_info=best_info,
+                video_init=self._init_url(self.video_playlist),
+                audio_init=self._init_url(self.audio_playlist),
+                live=CFG['Download']['live_record'] and any(
+                    self._is_live(p) for p in (self.video_playlist, self.audio_playlist)
+                ),
             )
         except AttributeError:
             pass
 
     async def _parse_media_m3u8(self, m3u8_content_str: str) -> HLSContent:
         """Main method to parse M3U8 playlist and orchestrate processing"""
-        # Master Playlist 分支
-        lines: List[str] = self._preprocess_content(m3u8_content_str)
+        # Master Playlist 分支；rebuild_master_playlist 已把 URI 補成完整 URL
+        master: Playlist = parse_playlist(m3u8_content_str)
         v_resolution_choice: str = CFG['HLS or MPEG-DASH']['Video_Resolution_Choice']
         a_resolution_choice: str = CFG['HLS or MPEG-DASH']['Audio_Resolution_Choice']
+        best_info: Optional[str] = None
         try:
-            if self._check_master_playlist(lines):
-                best_info = await self._process_master_playlist(lines, m3u8_content_str, v_resolution_choice, a_resolution_choice)
+            if master.is_master:
+                best_info = await self._process_master_playlist(master, v_resolution_choice, a_resolution_choice)
         except ValueError as e:
             logger.error(f"Error parsing master playlist: {e}")
             return None
-            
-        # 定義共用 helper：取回並過濾出 ts 與 tag
-        async def _fetch_and_filter(url: str) -> List[str]:
+
+        # 定義共用 helper：取回並一次解析 media playlist
+        async def _fetch_playlist(url: str) -> Playlist:
             resp = await self.GetRequest.get_request(url, use_proxy)
-            return [line.strip() for line in re.findall(REGEX_HLS_PATTERN, resp.text) if line.strip()]
-        tasks: Dict[str, "asyncio.Task[List[str]]"] = {}
+            return parse_playlist(resp.text, url)
+        tasks: Dict[str, "asyncio.Task[Playlist]"] = {}
         async with asyncio.TaskGroup() as tg:
             if self.m3u8_highest:
-                tasks["video"] = tg.create_task(_fetch_and_filter(self.m3u8_highest), name="video")
+                tasks["video"] = tg.create_task(_fetch_playlist(self.m3u8_highest), name="video")
             if self.audio_link:
-                tasks["audio"] = tg.create_task(_fetch_and_filter(self.audio_link), name="audio")
-
-        video_list: Optional[List[str]] = tasks.get("video").result() if "video" in tasks else None
-        audio_list: Optional[List[str]] = tasks.get("audio").result() if "audio" in tasks else None
-        video_segments: tuple[str] = []
-        audio_segments: tuple[str] = []
-        
-        if video_list:
-            video_segments = self._process_media_playlist(video_list, self.m3u8_highest or "")
+                tasks["audio"] = tg.create_task(_fetch_playlist(self.audio_link), name="audio")
+
+        self.video_playlist = tasks.get("video").result() if "video" in tasks else None
+        self.audio_playlist = tasks.get("audio").result() if "audio" in tasks else None
+        video_segments: Tuple[str, ...] = ()
+        audio_segments: Tuple[str, ...] = ()
+
+        if self.video_playlist:
+            video_segments = self._process_media_playlist(self.video_playlist)
         # 不可使用elif，避免條件只符合一個就退出判斷
-        if audio_list:
-            audio_segments = self._process_media_playlist(audio_list, self.audio_link or "")
+        if self.audio_playlist:
+            audio_segments = self._process_media_playlist(self.audio_playlist)
         # 組出 base_url 並回傳最終物件
         base_url: Optional[str] = (
-            re.sub(r'/\d+/playlist\.m3u8$', '', self.m3u8_highest)
+            PLAYLIST_SUFFIX_PATTERN.sub('', self.m3u8_highest)
             if self.m3u8_highest else None
         )
         return self.make_obj(
-            tuple(video_segments),
-            tuple(audio_segments),
+            video_segments,
+            audio_segments,
             base_url,
             best_info
         )
-    
-    def _preprocess_content(self, content: str) -> List[str]:
-        """Split and clean M3U8 content into a list of non-empty lines"""
-        return [line.strip() for line in content.splitlines() if line.strip()]
-
-    def _check_master_playlist(self, lines: List[str]) -> bool:
-        """Determine if the playlist is a master playlist."""
-        return any(line.startswith("#EXT-X-STREAM-INF:") for line in lines)
-    
-    async def _select_video_track(
-        self, lines: List[str], m3u8_str: str, v_resolution_choice: str) -> Optional[str]:
+
+    async def _select_video_track(self, master: Playlist, v_resolution_choice: str) -> Optional[str]:
         """Select video track based on user choice or input"""
         if v_resolution_choice.lower() == "none":
             return None
-        
-        resolution_list: List[Tuple[int, int]] = self.extract_sorted_resolutions(lines)
+
+        resolution_list: List[Tuple[int, int]] = self.extract_sorted_resolutions(master)
         if v_resolution_choice.lower() in {"ask", "as"}:
             choices = [f"{w}x{h}" for w, h in resolution_list]
             answer = await inquirer.select(
@@ -136,40 +141,31 @@ class HLS_Paser:
             selected_resolution = filtered[0]
         else:
             raise ValueError(f"Invalid resolution choice: {v_resolution_choice}")
-        
+
         # Find the corresponding playlist link
-        for i, line in enumerate(lines):
-            if line.startswith("#EXT-X-STREAM-INF:"):
-                resolutions = self.extract_all_resolutions(line)
-                if selected_resolution in resolutions:
-                    if i + 1 < len(lines) and not lines[i + 1].startswith("#"):
-                        best_link = urljoin(m3u8_str, lines[i + 1])
-                        self.m3u8_highest = best_link
-                        return line
-        
+        for variant in master.variants:
+            if variant.resolution == selected_resolution:
+                self.m3u8_highest = variant.uri
+                return variant.info
+
         raise ValueError(f"Resolution {selected_resolution} not found in playlist")
 
-    async def _select_audio_track(self, lines: List[str], m3u8_str: str, choice: str) -> Optional[str]:
+    async def _select_audio_track(self, master: Playlist, choice: str) -> Optional[str]:
         """選擇 HLS 音訊 URI，支援 ask 或 bitrate 匹配，找不到則 fallback 第一軌"""
 
-        # 抽出所有 EXT-X-MEDIA 音訊軌道
-        audio_tracks = []
-        for line in lines:
-            if line.startswith("#EXT-X-MEDIA:") and "TYPE=AUDIO" in line:
-                uri_match = re.search(r'URI="([^"]+)"', line)
-                name_match = re.search(r'NAME="([^"]+)"', line)
-                bandwidth = self._extract_bandwidth_kbps(line)
-                if uri_match:
-                    uri = urljoin(m3u8_str, uri_match.group(1))
-                    name = name_match.group(1) if name_match else uri
-                    audio_tracks.append((bandwidth, name, uri))
+        # 所有帶 URI 的 EXT-X-MEDIA 音訊軌道
+        audio_tracks = [
+            (rendition.bandwidth // 1000, rendition.name or rendition.uri, rendition.uri)
+            for rendition in master.renditions
+            if rendition.type == "AUDIO" and rendition.uri
+        ]
 
         if not audio_tracks:
             return None
-        
+
         if choice == "none":
             return []
-        
+
         if choice.lower() in {"ask", "as"}:
             choices = [f"{name} ({bw}) - {link}" for bw, name, link in audio_tracks]
             answer = await inquirer.select(
@@ -187,119 +183,88 @@ class HLS_Paser:
 
         raise ValueError(f"Invalid audio choice: {choice}")
 
-    def _extract_bandwidth_kbps(self, line: str) -> int:
-        """從 EXT-X-MEDIA 標籤中抽出 BANDWIDTH（以 kbps 回傳）"""
-        bw_match = re.search(r'BANDWIDTH=(\d+)', line)
-        if bw_match:
-            return int(bw_match.group(1)) // 1000
-        return 0
-
     async def _process_master_playlist(
-        self, lines: List[str], m3u8_str: str, v_resolution_choice: str, a_resolution_choice: str) -> str:
+        self, master: Playlist, v_resolution_choice: str, a_resolution_choice: str) -> str:
         """Select and parse a specific resolution sub-playlist from a master playlist"""
         # Select audio track
         if a_resolution_choice != "none": 
-            paramstore._store["hls_audio"] = True
-            audio_line = await self._select_audio_track(lines, m3u8_str, a_resolution_choice)
+            paramstore["hls_audio"] = True
+            audio_line = await self._select_audio_track(master, a_resolution_choice)
             self.audio_link = audio_line
         else:
-            paramstore._store["hls_audio"] = False
+            paramstore["hls_audio"] = False
         # Select video track
         if v_resolution_choice != "none": 
-            paramstore._store["hls_video"] = True
-            video_line = await self._select_video_track(lines, m3u8_str, v_resolution_choice)
+            paramstore["hls_video"] = True
+            video_line = await self._select_video_track(master, v_resolution_choice)
             return video_line # EXT-X--STREAM-INFO # Video_link at funcation not here
         else:
-            paramstore._store["hls_video"] = False
+            paramstore["hls_video"] = False
 
-    def extract_sorted_resolutions(self, lines: List[str]) -> List[Tuple[int, int]]:
+    def extract_sorted_resolutions(self, master: Playlist) -> List[Tuple[int, int]]:
         """Extract all resolution pairs (width, height) from the playlist, sorted by height ascending. Duplicates preserved."""
-        resolutions: List[Tuple[int, int]] = []
-        for line in lines:
-            if line.startswith("#EXT-X-STREAM-INF:"):
-                matches = re.findall(r"RESOLUTION=(\d+)x(\d+)", line)
-                for w, h in matches:
-                    resolutions.append((int(w), int(h)))
+        resolutions: List[Tuple[int, int]] = [v.resolution for v in master.variants if v.resolution]
         return sorted(resolutions, key=lambda r: r[1])
 
-    def _process_media_playlist(
-        self, lines: List[str], m3u8_url: str
-    ) -> List[str]:
-        """Extract segments, audio track, and metadata from a media playlist."""
-        ts_segments: List[str] = []
-        durations: List[float] = []
-
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line.startswith("#EXT-X-KEY:"):
-                self._handle_encryption(line, m3u8_url)
-            elif line.startswith("#EXTINF:"):
-                current_duration: float = self._extract_segment_duration(line)
-                durations.append(current_duration)
-            elif not line.startswith("#") and re.search(r"\.(ts|aac|mp4|m4a|m4v)\b", line):
-                segment_url: str = self._process_segment(line, m3u8_url)
-                ts_segments.append(segment_url)
-        if not durations:
-            return []
-        
-        return self._finalize_results(ts_segments)
-    
-    def _extract_segment_duration(self, line: str) -> float:
-        """Extract segment duration from an EXTINF line."""
-        duration_match = re.search(r"^#EXTINF:([\d.]+)", line)
-        return float(duration_match.group(1)) if duration_match else 0.0
-    
-    def _process_segment(self, line: str, m3u8_url: str) -> str:
-        """Process a segment line to extract URL and sequence number."""
-        segment_url: str = urljoin(m3u8_url, line)
-        return segment_url
-    
+    def _process_media_playlist(self, playlist: Playlist) -> Tuple[str, ...]:
+        """Extract segment URLs from a parsed media playlist and report its encryption keys.
+        Adjacent EXT-X-BYTERANGE segments of one file are merged into larger ranged requests."""
+        for key in playlist.keys:
+            self._handle_encryption(key)
+        if not playlist.segments:
+            return ()
+        # 加密片段各自有 IV，不能合併
+        max_bytes: int = 0 if playlist.keys else CFG['Download']['range_request_mb'] * 1024 * 1024
+        urls = coalesce_ranges(((seg.uri, seg.byte_range) for seg in playlist.segments), max_bytes)
+        if len(urls) < len(playlist.segments):
+            logger.info(
+                f"{Color.fg('light_gray')}Byte-range segments{Color.reset()} {Color.fg('light_yellow')}{len(playlist.segments)}{Color.reset()} "
+                f"{Color.fg('light_gray')}->{Color.reset()} {Color.fg('light_yellow')}{len(urls)}{Color.reset()} "
+                f"{Color.fg('light_gray')}requests{Color.reset()}"
+            )
+        return tuple(urls)
+
+    def _init_url(self, playlist: Optional[Playlist]) -> Optional[str]:
+        """取第一個 EXT-X-MAP；中途換初始化片段時只能沿用第一個"""
+        if playlist is None:
+            return None
+        inits = playlist.init_urls()
+        if len(inits) > 1:
+            logger.warning(f"{len(inits)} EXT-X-MAP entries in {playlist.url}, using the first one")
+        return inits[0] if inits else None
+
+    @staticmethod
+    def _is_live(playlist: Optional[Playlist]) -> bool:
+        return playlist is not None and not playlist.endlist and playlist.playlist_type != 'VOD'
+
     def extract_all_resolutions(self, text: str) -> List[Tuple[int, int]]:
         """Extract all resolution pairs (width, height) from the input text, preserving duplicates and order."""
-        matches = re.findall(r"RESOLUTION=(\d+)x(\d+)", text)
-        return [(int(w), int(h)) for w, h in matches]
-    
-    def extract_all_audio_tracks(self, lines: List[str], m3u8_str: str) -> List[str]:
+        return [(int(w), int(h)) for w, h in RESOLUTION_PATTERN.findall(text)]
+
+    def extract_all_audio_tracks(self, master: Playlist) -> List[str]:
         """Extract all audio track URIs from the playlist, preserving order."""
-        audio_links = []
-        for line in lines:
-            if line.startswith("#EXT-X-MEDIA:") and "TYPE=AUDIO" in line:
-                m = re.search(r'URI="([^"]+)"', line)
-                if m:
-                    audio_links.append(urljoin(m3u8_str, m.group(1)))
-        return audio_links
-
-    def _finalize_results(
-        self,
-        ts_segments: List[str],
-    ) -> List[str]:
-        """Sort segments and compute average duration."""
-        # Original code sorts by sequence index tuple; here segments are strings, so keep as-is
-        return ts_segments
-
-    def _handle_encryption(self, line: str, m3u8_url: str) -> None:
-        """Process encryption key information from an EXT-X-KEY line."""
-        if "METHOD=AES-128" in line:
-            prefix: str = "video" if "URI" in line else "audio"
+        return [r.uri for r in master.renditions if r.type == "AUDIO" and r.uri]
+
+    def _handle_encryption(self, key: Key) -> None:
+        """Process encryption key information from an EXT-X-KEY tag."""
+        prefix: str = "video" if key.uri else "audio"
+        if key.method == "AES-128":
             setattr(self, f"{prefix}_is_encrypted", True)
-            uri_match = re.search(r'URI="([^"]+)"', line)
-            if uri_match:
-                key_uri: str = urljoin(m3u8_url, uri_match.group(1))
-                setattr(self, f"{prefix}_encryption_key_uri", key_uri)
+            if key.uri:
+                setattr(self, f"{prefix}_encryption_key_uri", key.uri)
                 logger.info(
                     f"{Color.fg('ruby')}{prefix}{Color.reset()} {Color.fg('light_gray')}encryption key URI: {Color.reset()} "
-                    f"{Color.fg('bright_cyan')}{key_uri}{Color.reset()}"
+                    f"{Color.fg('bright_cyan')}{key.uri}{Color.reset()}"
                 )
-        elif "METHOD=SAMPLE-AES" in line:
-            key_format: Optional[str] = re.search(r'KEYFORMAT="([^"]+)"', line).group(1) if re.search(r'KEYFORMAT="([^"]+)"', line) else None
-            if key_format == 'com.apple.streamingkeydelivery':
+        elif key.method.startswith("SAMPLE-AES"):
+            if key.key_format == 'com.apple.streamingkeydelivery':
                 logger.info(
                     f"{Color.fg('light_gray')}encryption support:{Color.reset()} "
                     f"{Color.fg('bright_cyan')}FairPlay{Color.reset()}"
                 )
         else:
-            logger.warning(f"Unsupported {prefix} encryption method: {line}")
-            
+            logger.warning(f"Unsupported {prefix} encryption method: {key.method}")
+
     def rich_table_print(self, obj: HLSContent):
         """Print rich table of HLS content"""
         try:
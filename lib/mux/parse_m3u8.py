@@ -1,10 +1,210 @@
 import os
 import re
 import urllib.parse
-from typing import List, Any, Pattern, Union
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Any, Optional, Pattern, Tuple, Union
+
+from lib.byte_range import ByteRange, with_byte_range
 
 
 URI_PATTERN: Pattern[str] = re.compile(r'URI="([^"]+)"')
+# 屬性列表：KEY=VALUE 或 KEY="帶逗號的值"
+ATTRIBUTE_PATTERN: Pattern[str] = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+RESOLUTION_PATTERN: Pattern[str] = re.compile(r'(\d+)x(\d+)')
+
+
+@dataclass
+class Key:
+    method: str
+    uri: Optional[str]
+    iv: Optional[str]
+    key_format: Optional[str]
+
+
+@dataclass
+class MediaSegment:
+    uri: str
+    duration: float
+    # (起點, 終點) 皆含，來自 EXT-X-BYTERANGE
+    byte_range: Optional[ByteRange] = None
+    key: Optional[Key] = None
+    discontinuity: bool = False
+    # EXT-X-MAP 的初始化片段（fMP4），可能帶位元組範圍
+    init: Optional[str] = None
+
+
+@dataclass
+class Variant:
+    uri: str
+    bandwidth: int
+    resolution: Optional[Tuple[int, int]]
+    codecs: str
+    audio_group: Optional[str]
+    # 原始的 #EXT-X-STREAM-INF 行，顯示與 VideoInfo 使用
+    info: str
+
+
+@dataclass
+class Rendition:
+    type: str
+    group_id: str
+    name: str
+    uri: Optional[str]
+    bandwidth: int
+    language: Optional[str]
+
+
+@dataclass
+class Playlist:
+    """master 與 media playlist 共用的結構：master 只有 variants / renditions，media 只有 segments"""
+    url: str
+    variants: List[Variant] = field(default_factory=list)
+    renditions: List[Rendition] = field(default_factory=list)
+    segments: List[MediaSegment] = field(default_factory=list)
+    keys: List[Key] = field(default_factory=list)
+    target_duration: Optional[float] = None
+    media_sequence: int = 0
+    discontinuity_sequence: int = 0
+    playlist_type: Optional[str] = None
+    endlist: bool = False
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.variants)
+
+    @property
+    def duration(self) -> float:
+        return sum(seg.duration for seg in self.segments)
+
+    def segment_urls(self) -> Tuple[str, ...]:
+        return tuple(seg.uri for seg in self.segments)
+
+    def init_urls(self) -> List[str]:
+        """依出現順序列出不重複的 EXT-X-MAP"""
+        return list(dict.fromkeys(seg.init for seg in self.segments if seg.init))
+
+
+def parse_attributes(value: str) -> Dict[str, str]:
+    """解析 EXT-X-STREAM-INF / EXT-X-MEDIA / EXT-X-KEY 的屬性列表，去掉引號"""
+    return {k: v[1:-1] if v[:1] == '"' else v for k, v in ATTRIBUTE_PATTERN.findall(value)}
+
+
+def _resolver(url: str) -> Callable[[str], str]:
+    """回傳把相對 URI 補成完整 URL 的函式；片段大多只是檔名，直接接在目錄後面，
+    其餘情況（絕對路徑、..、query）才交給 urljoin"""
+    if not url:
+        return lambda ref: ref
+    base_dir: str = urllib.parse.urljoin(url, '.')
+
+    def resolve(ref: str) -> str:
+        if '://' in ref:
+            return ref
+        if ref[0] in '/.?#' or ':' in ref or '/.' in ref:
+            return urllib.parse.urljoin(url, ref)
+        return base_dir + ref
+
+    return resolve
+
+
+def _int(value: Optional[str], default: int = 0) -> int:
+    return int(value) if value and value.isdigit() else default
+
+
+def parse_playlist(text: str, url: str = '') -> Playlist:
+    """單次走訪 master 或 media playlist，依標籤建立 Playlist；url 為 playlist 本身的位置，
+    所有 URI 都會轉成完整 URL"""
+    playlist = Playlist(url=url)
+    resolve: Callable[[str], str] = _resolver(url)
+    duration: Optional[float] = None
+    byte_range: Optional[str] = None
+    key: Optional[Key] = None
+    discontinuity: bool = False
+    init: Optional[str] = None
+    stream_inf: Optional[str] = None
+    # 省略 @offset 的 BYTERANGE 從上一段的結尾接續
+    next_offset: int = 0
+
+    for raw in text.splitlines():
+        line: str = raw.strip()
+        if not line:
+            continue
+        if line[0] != '#':
+            uri: str = resolve(line)
+            if stream_inf is not None:
+                attrs: Dict[str, str] = parse_attributes(stream_inf.partition(':')[2])
+                resolution = RESOLUTION_PATTERN.fullmatch(attrs.get('RESOLUTION', ''))
+                playlist.variants.append(Variant(
+                    uri=uri,
+                    bandwidth=_int(attrs.get('BANDWIDTH')),
+                    resolution=(int(resolution.group(1)), int(resolution.group(2))) if resolution else None,
+                    codecs=attrs.get('CODECS', ''),
+                    audio_group=attrs.get('AUDIO'),
+                    info=stream_inf,
+                ))
+                stream_inf = None
+            elif duration is not None:
+                seg_range: Optional[ByteRange] = None
+                if byte_range is not None:
+                    length, _, offset = byte_range.partition('@')
+                    start: int = int(offset) if offset else next_offset
+                    seg_range = (start, start + int(length) - 1)
+                    next_offset = start + int(length)
+                    byte_range = None
+                playlist.segments.append(MediaSegment(uri, duration, seg_range, key, discontinuity, init))
+                duration = None
+                discontinuity = False
+            continue
+
+        tag, _, value = line.partition(':')
+        match tag:
+            case '#EXTINF':
+                duration = float(value.partition(',')[0] or 0)
+            case '#EXT-X-BYTERANGE':
+                byte_range = value
+            case '#EXT-X-KEY':
+                attrs = parse_attributes(value)
+                method: str = attrs.get('METHOD', 'NONE')
+                if method == 'NONE':
+                    key = None
+                else:
+                    key = Key(
+                        method=method,
+                        uri=resolve(attrs['URI']) if attrs.get('URI') else None,
+                        iv=attrs.get('IV'),
+                        key_format=attrs.get('KEYFORMAT'),
+                    )
+                    playlist.keys.append(key)
+            case '#EXT-X-MAP':
+                attrs = parse_attributes(value)
+                init = resolve(attrs['URI']) if attrs.get('URI') else None
+                if init and attrs.get('BYTERANGE'):
+                    length, _, offset = attrs['BYTERANGE'].partition('@')
+                    init = with_byte_range(init, int(offset or 0), int(offset or 0) + int(length) - 1)
+            case '#EXT-X-DISCONTINUITY':
+                discontinuity = True
+            case '#EXT-X-STREAM-INF':
+                stream_inf = line
+            case '#EXT-X-MEDIA':
+                attrs = parse_attributes(value)
+                playlist.renditions.append(Rendition(
+                    type=attrs.get('TYPE', ''),
+                    group_id=attrs.get('GROUP-ID', ''),
+                    name=attrs.get('NAME', ''),
+                    uri=resolve(attrs['URI']) if attrs.get('URI') else None,
+                    bandwidth=_int(attrs.get('BANDWIDTH')),
+                    language=attrs.get('LANGUAGE'),
+                ))
+            case '#EXT-X-TARGETDURATION':
+                playlist.target_duration = float(value or 0)
+            case '#EXT-X-MEDIA-SEQUENCE':
+                playlist.media_sequence = _int(value)
+            case '#EXT-X-DISCONTINUITY-SEQUENCE':
+                playlist.discontinuity_sequence = _int(value)
+            case '#EXT-X-PLAYLIST-TYPE':
+                playlist.playlist_type = value
+            case '#EXT-X-ENDLIST':
+                playlist.endlist = True
+    return playlist
 
 
 async def rebuild_master_playlist(m3u8: Any, m3u8_uri: str) -> str:
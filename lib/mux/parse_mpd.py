@@ -1,14 +1,23 @@
+import math
 import re
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence as SequenceABC
+from dataclasses import dataclass, field, replace
+from io import BytesIO
+from itertools import accumulate, chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from urllib.parse import urljoin
-import xml.etree.ElementTree as ET
 
+import numpy as np
+from lxml import etree
+from lxml.etree import _Element
 from rich import box
 from rich.console import Console
 from rich.table import Table
 from InquirerPy import inquirer
 
+from lib.byte_range import ByteRange, parse_range, with_byte_range
 from static.parameter import paramstore
 from unit.handle.handle_log import setup_logging
 
@@ -16,6 +25,65 @@ from unit.handle.handle_log import setup_logging
 logger = setup_logging('parse_mpd', 'periwinkle')
 
 
+MPD_NS: str = "urn:mpeg:dash:schema:mpd:2011"
+_REPRESENTATION_TAGS: Tuple[str, str] = (f"{{{MPD_NS}}}Representation", "Representation")
+# $Number$、$Time$ 以及 $Number%05d$ 這類帶補零寬度的寫法
+_TEMPLATE_VAR = re.compile(r"\$(Number|Time)(?:%0(\d+)d)?\$")
+_ISO_DURATION = re.compile(
+    r"P(?:(\d+(?:\.\d+)?)D)?(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?"
+)
+# 片段定址方式：第一階段記下種類與元素，選定軌道後才展開
+_ADDRESSING: Tuple[Tuple[str, str], ...] = (
+    ("template", "SegmentTemplate"),
+    ("list", "SegmentList"),
+    ("base", "SegmentBase"),
+)
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析 ISO 8601 時間長度（PT1H2M3.5S、P1DT2H），回傳秒數"""
+    if not value:
+        return None
+    match = _ISO_DURATION.fullmatch(value.strip())
+    if match is None:
+        return None
+    days, hours, minutes, seconds = (float(g) if g else 0.0 for g in match.groups())
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+def parse_sidx(data: bytes, offset: int) -> List[ByteRange]:
+    """解析 SegmentBase indexRange 指向的 sidx box，回傳每個子片段在檔案中的位元組範圍；
+    offset 是 data 在檔案中的起點，格式不符或參照到下一層 sidx 時回傳空列表"""
+    if len(data) < 32 or data[4:8] != b"sidx":
+        return []
+    size: int = int.from_bytes(data[0:4], "big")
+    if size < 32 or size > len(data):
+        return []
+    # version 0 的 earliest_presentation_time / first_offset 是 32 位元，version 1 是 64 位元
+    if data[8] == 0:
+        first_offset: int = int.from_bytes(data[24:28], "big")
+        pos: int = 28
+    else:
+        first_offset = int.from_bytes(data[28:36], "big")
+        pos = 36
+    count: int = int.from_bytes(data[pos + 2:pos + 4], "big")
+    pos += 4
+    if pos + count * 12 > size:
+        return []
+    # 子片段從 sidx box 結尾加上 first_offset 開始連續排列
+    start: int = offset + size + first_offset
+    ranges: List[ByteRange] = []
+    for _ in range(count):
+        reference: int = int.from_bytes(data[pos:pos + 4], "big")
+        if reference >> 31:
+            return []
+        length: int = reference & 0x7FFFFFFF
+        ranges.append((start, start + length - 1))
+        start += length
+        pos += 12
+    return ranges
+
+
 @dataclass
 class Segment:
     t: int
@@ -23,19 +91,184 @@ class Segment:
     r: int
 
 
+def _int64_array(values: np.ndarray) -> array:
+    packed: array = array('q')
+    packed.frombytes(np.ascontiguousarray(values, dtype=np.int64).tobytes())
+    return packed
+
+
+class _CompactSequence(SequenceABC):
+    """唯讀序列共用的比較方式"""
+
+    __slots__ = ()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SequenceABC):
+            return NotImplemented
+        # 先比長度，和空 list 比較時不必產生任何元素
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+
+class SegmentTimeline(_CompactSequence):
+    """每個片段的起始時間與長度，以兩個 array('q') 儲存；索引時才產生 Segment(t, d, r=0)"""
+
+    __slots__ = ('starts', 'durations')
+
+    def __init__(self, starts: array, durations: array) -> None:
+        self.starts: array = starts
+        self.durations: array = durations
+
+    @classmethod
+    def from_runs(cls, runs: List[Segment]) -> "SegmentTimeline":
+        starts, durations = MPDParser._expand_timeline(runs)
+        return cls(_int64_array(starts), _int64_array(durations))
+
+    @classmethod
+    def concat(cls, parts: List[Tuple["SegmentTimeline", Optional[int]]], timescale: int) -> "SegmentTimeline":
+        """把多個 Period 的時間軸接成一條：換算到同一個 timescale，起始時間接續前一段的結尾"""
+        starts: array = array('q')
+        durations: array = array('q')
+        offset: int = 0
+        for timeline, scale in parts:
+            if not len(timeline):
+                continue
+            s = np.frombuffer(timeline.starts, dtype=np.int64)
+            d = np.frombuffer(timeline.durations, dtype=np.int64)
+            if scale and scale != timescale:
+                s = s * timescale // scale
+                d = d * timescale // scale
+            s = s - s[0] + offset
+            offset = int(s[-1] + d[-1])
+            starts.extend(_int64_array(s))
+            durations.extend(_int64_array(d))
+        return cls(starts, durations)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Segment, "SegmentTimeline"]:
+        if isinstance(index, slice):
+            return SegmentTimeline(self.starts[index], self.durations[index])
+        return Segment(t=self.starts[index], d=self.durations[index], r=0)
+
+    def __iter__(self) -> Iterator[Segment]:
+        for t, d in zip(self.starts, self.durations):
+            yield Segment(t=t, d=d, r=0)
+
+    def __repr__(self) -> str:
+        return f"SegmentTimeline({len(self)} segments)"
+
+
+class SegmentURLs(_CompactSequence):
+    """依索引即時組出片段 URL 的唯讀序列：只保存共用的前綴、後綴與每個片段的 $Time$ / $Number$ 值"""
+
+    __slots__ = ('prefix', 'suffix', 'values', 'width')
+
+    def __init__(self, prefix: str, suffix: Optional[str], values: Sequence[int], width: int = 0) -> None:
+        self.prefix: str = prefix
+        # suffix 為 None 表示模板沒有 $Time$ / $Number$，每個片段都是同一個 URL
+        self.suffix: Optional[str] = suffix
+        # $Time$ 是起始時間的 array('q')，$Number$ 是 range(startNumber, ...)
+        self.values: Sequence[int] = values
+        # $Number%05d$ 的補零寬度
+        self.width: int = width
+
+    def _url(self, value: Union[int, str]) -> str:
+        if self.suffix is None:
+            return self.prefix
+        return f"{self.prefix}{str(value).zfill(self.width)}{self.suffix}"
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self._url(v) for v in self.values[index]]
+        return self._url(self.values[index])
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._url, self.values)
+
+    def __repr__(self) -> str:
+        return f"SegmentURLs({len(self)} urls, {self._url('$')!r})"
+
+
+class ChainedSequence(_CompactSequence):
+    """多個 Period 的片段 URL 依序接成一個序列，不複製各段內容"""
+
+    __slots__ = ('parts', '_ends')
+
+    def __init__(self, parts: List[Sequence[str]]) -> None:
+        self.parts: List[Sequence[str]] = parts
+        self._ends: List[int] = list(accumulate(len(part) for part in parts))
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ChainedSequence index out of range")
+        part: int = bisect_right(self._ends, index)
+        start: int = self._ends[part - 1] if part else 0
+        return self.parts[part][index - start]
+
+    def __iter__(self) -> Iterator[str]:
+        return chain.from_iterable(self.parts)
+
+    def __repr__(self) -> str:
+        return f"ChainedSequence({len(self)} urls in {len(self.parts)} parts)"
+
+
+@dataclass
+class SegmentSource:
+    """Representation 的片段定址方式；elements 由內而外是 Representation、AdaptationSet、
+    Period 層的同名元素，屬性與子元素依序繼承"""
+    kind: str
+    elements: List[_Element]
+    base_url: str
+    period_duration: Optional[float]
+
+    def get(self, attr: str) -> Optional[str]:
+        return next((e.get(attr) for e in self.elements if e.get(attr) is not None), None)
+
+    def child(self, tag: str, namespaces: Dict[str, str]) -> Optional[_Element]:
+        for element in self.elements:
+            found: Optional[_Element] = element.find(f"./{tag}", namespaces)
+            if found is not None:
+                return found
+        return None
+
+    def children(self, tag: str, namespaces: Dict[str, str]) -> List[_Element]:
+        for element in self.elements:
+            found: List[_Element] = element.findall(f"./{tag}", namespaces)
+            if found:
+                return found
+        return []
+
+
 @dataclass
 class MediaTrack:
     id: str
     bandwidth: int
     codecs: str
-    segments: List[Segment]
+    segments: Sequence[Segment]
     init_url: str
-    segment_urls: List[str]
+    segment_urls: Sequence[str]
     mime_type: str
     width: Optional[int] = None
     height: Optional[int] = None
     timescale: Optional[int] = None
     audio_sampling_rate: Optional[int] = None
+    # SegmentBase 的 sidx 位置（包含在 init 的範圍內），下載 init 後用來切分 media
+    index_range: Optional[ByteRange] = None
+    # 片段 URL 延後到選定軌道後才展開
+    source: Optional[SegmentSource] = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -48,28 +281,41 @@ class MPDContent:
 
 class MPDParser:
     mpd_url: str
-    root: ET.Element
+    root: _Element
     namespaces: Dict[str, str]
 
     def __init__(self, raw_mpd_text: Any, mpd_url: str):
         self.mpd_url: str = mpd_url
-        self.root: ET.Element = self._parse_xml(raw_mpd_text)
         self.namespaces: Dict[str, str] = {
-            "": "urn:mpeg:dash:schema:mpd:2011",
+            "": MPD_NS,
             "cenc": "urn:mpeg:cenc:2013",
             "mspr": "urn:microsoft:playready",
         }
+        # iterparse 時依文件順序記下的 (Period, AdaptationSet, Representation)
+        self._representations: List[Tuple[_Element, _Element, _Element]] = []
+        self.root: _Element = self._parse_xml(raw_mpd_text)
 
-    def _parse_xml(self, obj: object) -> ET.Element:
-        """解析 XML 文本為 ElementTree Element"""
+    def _parse_xml(self, obj: object) -> _Element:
+        """以 lxml iterparse 解析 XML 文本，同時收集所有 Representation 的位置"""
         if hasattr(obj, 'text'):
             xml_text = getattr(obj, 'text')
             if not isinstance(xml_text, str):
                 raise TypeError(f"Expected text attribute to be str, got {type(xml_text)}")
-            return ET.fromstring(xml_text)
+            context = etree.iterparse(
+                BytesIO(xml_text.encode('utf-8')),
+                events=("end",),
+                tag=_REPRESENTATION_TAGS,
+                remove_comments=True,
+                huge_tree=True,
+            )
+            for _, rep in context:
+                adapt_set: Optional[_Element] = rep.getparent()
+                if adapt_set is not None and adapt_set.getparent() is not None:
+                    self._representations.append((adapt_set.getparent(), adapt_set, rep))
+            return context.root
         raise TypeError(f"Object must have 'text' attribute, got {type(obj)}")
 
-    def _get_required_attr(self, element: ET.Element, attr: str, elem_name: str = "Element") -> str:
+    def _get_required_attr(self, element: _Element, attr: str, elem_name: str = "Element") -> str:
         """獲取必需屬性，若缺失則拋出描述性錯誤"""
         value = element.get(attr)
         if value is None:
@@ -77,7 +323,7 @@ class MPDParser:
         return value
 
     def _get_int_attr(
-        self, element: ET.Element, attr: str, default: Optional[int] = None
+        self, element: _Element, attr: str, default: Optional[int] = None
     ) -> Optional[int]:
         """安全獲取整數屬性"""
         value = element.get(attr)
@@ -88,6 +334,15 @@ class MPDParser:
         except ValueError:
             raise ValueError(f"Invalid integer value '{value}' for attribute '{attr}'")
 
+    def _get_inherited_int(
+        self, source: SegmentSource, attr: str, default: Optional[int] = None
+    ) -> Optional[int]:
+        """從最內層開始找第一個帶有該屬性的定址元素"""
+        owner = next((e for e in source.elements if e.get(attr) is not None), None)
+        if owner is None:
+            return default
+        return self._get_int_attr(owner, attr, default)
+
     def _parse_drm_info(self) -> Dict[str, Any]:
         """從 MPD 解析 DRM/ContentProtection 資訊"""
         drm_info: Dict[str, Any] = {}
@@ -124,58 +379,191 @@ class MPDParser:
                 drm_info["widevine_pssh"] = pssh_value
         return drm_info
 
-    def _parse_segment_timeline(self, seg_template: ET.Element) -> List[Segment]:
+    def _parse_segment_timeline(self, seg_timeline: Optional[_Element]) -> List[Segment]:
         """解析 SegmentTimeline 為 Segment 列表"""
-        seg_timeline = seg_template.find("./SegmentTimeline", self.namespaces)
         if seg_timeline is None:
             return []
 
         segments = []
+        next_t: int = 0
         for s_elem in seg_timeline.findall("./S", self.namespaces):
             try:
-                t = self._get_int_attr(s_elem, "t", default=0)
+                # 省略 t 時接續上一段的結尾
+                t = self._get_int_attr(s_elem, "t", default=next_t)
                 d = self._get_int_attr(s_elem, "d")
                 r = self._get_int_attr(s_elem, "r", default=0)
 
                 if d is None:
                     raise ValueError("Segment 'S' element missing required 'd' attribute")
 
+                if r < 0:
+                    # r="-1"：重複到下一個 S 的 t，先記下，等下一段出現再補算
+                    r = -1
+                if segments and segments[-1].r < 0:
+                    prev = segments[-1]
+                    prev.r = max(0, (t - prev.t) // prev.d - 1)
                 segments.append(Segment(t=t, d=d, r=r))
+                next_t = t + d * (max(r, 0) + 1)
             except ValueError as e:
                 logger.warning(f"Warning: Skipping invalid segment: {e}")
                 continue
+        if segments and segments[-1].r < 0:
+            logger.warning("Warning: open-ended S@r=-1 at the end of SegmentTimeline, treating as a single segment")
+            segments[-1].r = 0
         return segments
 
-    def _generate_segment_urls(
-        self, rep_id: str, media_template: str, segments: List[Segment], base_url: str
-    ) -> List[str]:
-        """生成所有片段的 URL 列表"""
-        segment_urls: List[str] = []
-        for seg in segments:
-            current_time: int = seg.t
-            for _ in range(seg.r + 1):
-                url: str = media_template.replace("$RepresentationID$", rep_id).replace(
-                    "$Time$", str(current_time)
-                )
-                segment_urls.append(urljoin(base_url, url))
-                current_time += seg.d
-        return segment_urls
+    @staticmethod
+    def _expand_timeline(segments: List[Segment]) -> Tuple[np.ndarray, np.ndarray]:
+        """把 (t, d, r) 區段一次展開成每個片段的起始時間與長度"""
+        if not segments:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        t = np.fromiter((seg.t for seg in segments), dtype=np.int64, count=len(segments))
+        d = np.fromiter((seg.d for seg in segments), dtype=np.int64, count=len(segments))
+        counts = np.fromiter((seg.r + 1 for seg in segments), dtype=np.int64, count=len(segments))
+        # 每個片段在所屬區段中的序號 = 全域序號 - 區段第一個片段的全域序號
+        run_first = np.repeat(np.cumsum(counts) - counts, counts)
+        index_in_run = np.arange(int(counts.sum()), dtype=np.int64) - run_first
+        durations = np.repeat(d, counts)
+        return np.repeat(t, counts) + index_in_run * durations, durations
+
+    def _timeline_for(self, source: SegmentSource, timescale: int, count: Optional[int] = None) -> SegmentTimeline:
+        """有 SegmentTimeline 時照表展開，否則以固定的 @duration 推算片段數"""
+        seg_timeline: Optional[_Element] = source.child("SegmentTimeline", self.namespaces)
+        if seg_timeline is not None:
+            return SegmentTimeline.from_runs(self._parse_segment_timeline(seg_timeline))
+        duration = self._get_inherited_int(source, "duration")
+        if not duration:
+            raise ValueError("segment addressing needs a SegmentTimeline or 'duration'")
+        if count is None:
+            if not source.period_duration:
+                raise ValueError("cannot count segments without the Period duration")
+            count = math.ceil(round(source.period_duration * timescale / duration, 6))
+        return SegmentTimeline.from_runs([Segment(t=0, d=duration, r=count - 1)] if count > 0 else [])
+
+    @staticmethod
+    def _fill_identifiers(template: str, track: MediaTrack) -> str:
+        return template.replace("$RepresentationID$", track.id).replace("$Bandwidth$", str(track.bandwidth))
+
+    @staticmethod
+    def _range_url(base_url: str, element: _Element, url_attr: str, range_attr: str) -> str:
+        """SegmentList / SegmentBase 的 URL 加上位元組範圍；沒有 URL 屬性時就是 BaseURL 本身"""
+        url: str = urljoin(base_url, element.get(url_attr) or "")
+        spec: Optional[str] = element.get(range_attr)
+        return with_byte_range(url, *parse_range(spec)) if spec else url
+
+    def _expand_template(self, track: MediaTrack, source: SegmentSource) -> None:
+        """SegmentTemplate：模板只做一次 urljoin 並在 $Time$ / $Number$ 處切開，URL 在取用時才組出"""
+        track.init_url = urljoin(source.base_url, self._fill_identifiers(source.get("initialization"), track))
+        track.segments = self._timeline_for(source, track.timescale or 1)
+        joined: str = urljoin(source.base_url, self._fill_identifiers(source.get("media"), track))
+        match = _TEMPLATE_VAR.search(joined)
+        if match is None:
+            track.segment_urls = SegmentURLs(joined, None, track.segments.starts)
+            return
+        values: Sequence[int] = track.segments.starts
+        if match.group(1) == "Number":
+            start_number: int = self._get_inherited_int(source, "startNumber", default=1)
+            values = range(start_number, start_number + len(track.segments))
+        track.segment_urls = SegmentURLs(joined[:match.start()], joined[match.end():], values, int(match.group(2) or 0))
+
+    def _expand_list(self, track: MediaTrack, source: SegmentSource) -> None:
+        """SegmentList：逐一列出的片段，可能帶 mediaRange"""
+        init: Optional[_Element] = source.child("Initialization", self.namespaces)
+        track.init_url = self._range_url(source.base_url, init, "sourceURL", "range") if init is not None else ""
+        urls: List[str] = [
+            self._range_url(source.base_url, seg, "media", "mediaRange")
+            for seg in source.children("SegmentURL", self.namespaces)
+        ]
+        if source.child("SegmentTimeline", self.namespaces) is not None or source.get("duration"):
+            track.segments = self._timeline_for(source, track.timescale or 1, count=len(urls))
+        else:
+            # 沒有時間資訊，只保留片段數
+            track.segments = SegmentTimeline.from_runs([Segment(t=0, d=0, r=len(urls) - 1)] if urls else [])
+        track.segment_urls = urls
+
+    def _expand_base(self, track: MediaTrack, source: SegmentSource) -> None:
+        """SegmentBase：整條軌道是單一檔案，init（含 sidx）一個 Range 請求，其後的 media 先記成
+        一個開放結尾的範圍，下載 init 後再依 sidx 切成多個有界的請求"""
+        init: Optional[_Element] = source.child("Initialization", self.namespaces)
+        specs: List[Optional[str]] = [init.get("range") if init is not None else None, source.get("indexRange")]
+        ends: List[Optional[int]] = [parse_range(spec)[1] for spec in specs if spec]
+        if not ends or None in ends:
+            raise ValueError("SegmentBase needs Initialization@range or indexRange")
+        header_end: int = max(ends)
+        index_range: Optional[str] = source.get("indexRange")
+        track.index_range = parse_range(index_range) if index_range else None
+        track.init_url = with_byte_range(source.base_url, 0, header_end)
+        track.segment_urls = [with_byte_range(source.base_url, header_end + 1)]
+        duration: int = round(source.period_duration * track.timescale) if source.period_duration and track.timescale else 0
+        track.segments = SegmentTimeline.from_runs([Segment(t=0, d=duration, r=0)])
+
+    def expand_segment_urls(self, track: Optional[MediaTrack]) -> Optional[MediaTrack]:
+        """第二階段：只替實際選定的軌道解析片段定址並建立片段 URL 序列"""
+        if track is None or track.source is None or track.segment_urls:
+            return track
+        if track.source.kind == "base":
+            self._expand_base(track, track.source)
+        elif track.source.kind == "list":
+            self._expand_list(track, track.source)
+        else:
+            self._expand_template(track, track.source)
+        return track
+
+    def _resolve_base_url(self, base_url: str, *elements: _Element) -> str:
+        """依序套用 MPD、Period、AdaptationSet、Representation 的 BaseURL"""
+        for element in elements:
+            text: Optional[str] = element.findtext("./BaseURL", None, self.namespaces)
+            if text and text.strip():
+                base_url = urljoin(base_url, text.strip())
+        return base_url
+
+    def _period_durations(self, periods: List[_Element]) -> List[Optional[float]]:
+        """每個 Period 的秒數：Period@duration，或下一個 Period@start / MPD 總長扣掉本身的 start"""
+        total: Optional[float] = _parse_duration(self.root.get("mediaPresentationDuration"))
+        durations: List[Optional[float]] = []
+        start: Optional[float] = 0.0
+        for i, period in enumerate(periods):
+            own_start: Optional[float] = _parse_duration(period.get("start"))
+            if own_start is not None:
+                start = own_start
+            duration: Optional[float] = _parse_duration(period.get("duration"))
+            if duration is None and start is not None:
+                end: Optional[float] = _parse_duration(periods[i + 1].get("start")) if i + 1 < len(periods) else total
+                if end is not None:
+                    duration = end - start
+            durations.append(duration)
+            start = start + duration if start is not None and duration is not None else None
+        return durations
+
+    def _segment_source(
+        self, rep: _Element, adapt_set: _Element, period: _Element, base_url: str, period_duration: Optional[float]
+    ) -> Optional[SegmentSource]:
+        """找出最內層宣告的定址方式，並收集外層同名元素供屬性繼承"""
+        levels: Tuple[_Element, ...] = (rep, adapt_set, period)
+        for depth, holder in enumerate(levels):
+            for kind, tag in _ADDRESSING:
+                if holder.find(f"./{tag}", self.namespaces) is None:
+                    continue
+                elements: List[_Element] = [
+                    found for level in levels[depth:]
+                    if (found := level.find(f"./{tag}", self.namespaces)) is not None
+                ]
+                return SegmentSource(kind, elements, base_url, period_duration)
+        return None
 
     def _parse_representation(
         self,
-        rep: ET.Element,
-        adapt_set: ET.Element,
+        rep: _Element,
+        adapt_set: _Element,
+        period: _Element,
         base_url: str,
-    ) -> Optional[MediaTrack]:
-        """解析單個 Representation 為 MediaTrack"""
-        seg_template: Optional[ET.Element] = rep.find(
-            "./SegmentTemplate", self.namespaces
-        ) or adapt_set.find("./SegmentTemplate", self.namespaces)
-
-        if seg_template is None:
-            return None
-
-        segments: List[Segment] = self._parse_segment_timeline(seg_template)
+        period_duration: Optional[float],
+    ) -> MediaTrack:
+        """第一階段：只讀取 Representation 的屬性建立 MediaTrack，片段定址留到選定後再展開"""
+        rep_base_url: str = self._resolve_base_url(base_url, period, adapt_set, rep)
+        source: Optional[SegmentSource] = self._segment_source(rep, adapt_set, period, rep_base_url, period_duration)
+        if source is None:
+            raise ValueError("no SegmentTemplate, SegmentList or SegmentBase")
 
         # 安全屬性提取
         rep_id = self._get_required_attr(rep, "id", "Representation")
@@ -186,28 +574,17 @@ class MPDParser:
         codecs = self._get_required_attr(rep, "codecs", f"Representation {rep_id}")
 
         # 模板 URL
-        init_template = seg_template.get("initialization")
-        if not init_template:
-            raise ValueError(f"SegmentTemplate missing 'initialization' attribute")
-
-        media_template = seg_template.get("media")
-        if not media_template:
-            raise ValueError(f"SegmentTemplate missing 'media' attribute")
-
-        init_url: str = urljoin(
-            base_url,
-            init_template.replace("$RepresentationID$", rep_id),
-        )
-
-        segment_urls: List[str] = self._generate_segment_urls(
-            rep_id, media_template, segments, base_url
-        )
+        if source.kind == "template":
+            if not source.get("initialization"):
+                raise ValueError(f"SegmentTemplate missing 'initialization' attribute")
+            if not source.get("media"):
+                raise ValueError(f"SegmentTemplate missing 'media' attribute")
 
         # 可選屬性處理
         width = self._get_int_attr(rep, "width")
         height = self._get_int_attr(rep, "height")
         audio_sampling_rate = self._get_int_attr(rep, "audioSamplingRate")
-        timescale = self._get_int_attr(seg_template, "timescale", default=1)
+        timescale = self._get_inherited_int(source, "timescale", default=1)
 
         mime_type = adapt_set.get("mimeType", "")
 
@@ -215,71 +592,151 @@ class MPDParser:
             id=rep_id,
             bandwidth=bandwidth,
             codecs=codecs,
-            segments=segments,
-            init_url=init_url,
-            segment_urls=segment_urls,
+            segments=[],
+            init_url="",
+            segment_urls=[],
             mime_type=mime_type,
             width=width,
             height=height,
             timescale=timescale,
             audio_sampling_rate=audio_sampling_rate,
+            source=source,
+        )
+
+    @staticmethod
+    def _match_track(selected: MediaTrack, candidates: List[MediaTrack]) -> Optional[MediaTrack]:
+        """在之後的 Period 找對應的軌道：同 id 優先，否則取畫質與位元率最接近的"""
+        if not candidates:
+            return None
+        same_id = next((t for t in candidates if t.id == selected.id), None)
+        if same_id is not None:
+            return same_id
+        return min(
+            candidates,
+            key=lambda t: (abs((t.height or 0) - (selected.height or 0)), abs(t.bandwidth - selected.bandwidth)),
+        )
+
+    @staticmethod
+    def _init_mismatch(first: MediaTrack, part: MediaTrack) -> Optional[str]:
+        """接在後面的 Period 只會寫入第一個 Period 的初始化片段（moov），兩者必須一致；不一致時回傳原因"""
+        if part.init_url != first.init_url:
+            return f"initialization {part.init_url} != {first.init_url}"
+        if part.timescale != first.timescale:
+            return f"timescale {part.timescale} != {first.timescale}"
+        if part.codecs != first.codecs:
+            return f"codecs {part.codecs} != {first.codecs}"
+        if (part.width, part.height) != (first.width, first.height):
+            return f"resolution {part.width}x{part.height} != {first.width}x{first.height}"
+        return None
+
+    def _concat_periods(self, parts: List[Optional[MediaTrack]]) -> Optional[MediaTrack]:
+        """展開各 Period 選到的軌道並接成一條，沿用第一個 Period 的初始化片段；
+        parts 已由 _init_mismatch 確認可以共用同一個初始化片段"""
+        first: Optional[MediaTrack] = self.expand_segment_urls(parts[0])
+        if first is None or len(parts) == 1:
+            return first
+        for part in parts[1:]:
+            self.expand_segment_urls(part)
+        return replace(
+            first,
+            segments=SegmentTimeline.concat([(part.segments, part.timescale) for part in parts], first.timescale or 1),
+            segment_urls=ChainedSequence([part.segment_urls for part in parts]),
         )
 
     async def get_selected_mpd_content(self, v_resolution_choice: str, a_resolution_choice: str) -> MPDContent:
-        """根據使用者選擇的解析度與音訊軌道 提取 MPD 中對應內容"""
+        """根據使用者選擇的解析度與音訊軌道 提取 MPD 中對應內容；多個 Period 依序接成一條軌道"""
         base_url: str = self.mpd_url.rsplit("/", 1)[0] + "/"
 
-        period = self.root.find("./Period", self.namespaces)
-        if period is None:
+        periods: List[_Element] = self.root.findall("./Period", self.namespaces)
+        if not periods:
             raise ValueError("MPD contains no Period elements")
+        root_base_url: str = self._resolve_base_url(base_url, self.root)
+        period_durations: Dict[_Element, Optional[float]] = dict(zip(periods, self._period_durations(periods)))
 
-        video_reps: List[MediaTrack] = []
-        audio_reps: List[MediaTrack] = []
-
-        for adapt_set in period.findall("./AdaptationSet", self.namespaces):
+        # 每個 Period 的 (影像軌, 音訊軌)
+        period_tracks: Dict[_Element, Tuple[List[MediaTrack], List[MediaTrack]]] = {p: ([], []) for p in periods}
+        for rep_period, adapt_set, rep_element in self._representations:
+            if rep_period not in period_tracks:
+                continue
+            video_list, audio_list = period_tracks[rep_period]
             mime_type = adapt_set.get("mimeType", "")
+            try:
+                track = self._parse_representation(
+                    rep_element, adapt_set, rep_period, root_base_url, period_durations[rep_period]
+                )
+                if mime_type.startswith("video"):
+                    video_list.append(track)
+                elif mime_type.startswith("audio"):
+                    audio_list.append(track)
+            except (ValueError, TypeError) as e:
+                rep_id = rep_element.get("id", "unknown")
+                logger.warning(f"Warning: Failed to parse Representation {rep_id}: {e}")
+                continue
 
-            for rep_element in adapt_set.findall("./Representation", self.namespaces):
-                try:
-                    track = self._parse_representation(rep_element, adapt_set, base_url)
-                    if track is None:
-                        continue
-
-                    if mime_type.startswith("video"):
-                        video_reps.append(track)
-                    elif mime_type.startswith("audio"):
-                        audio_reps.append(track)
-                except (ValueError, TypeError) as e:
-                    rep_id = rep_element.get("id", "unknown")
-                    logger.warning(f"Warning: Failed to parse Representation {rep_id}: {e}")
-                    continue
+        video_reps, audio_reps = period_tracks[periods[0]]
 
         # 分離的選擇邏輯
         selected_video = MediaTrack(id='', bandwidth=0, codecs='', segments=[], init_url='', segment_urls=[], mime_type='', width=0, height=0, timescale=0, audio_sampling_rate=0)
         selected_audio = MediaTrack(id='', bandwidth=0, codecs='', segments=[], init_url='', segment_urls=[], mime_type='', width=0, height=0, timescale=0, audio_sampling_rate=0)
-        
+
         if a_resolution_choice != "none":
-            paramstore._store["mpd_audio"] = True
+            paramstore["mpd_audio"] = True
             selected_audio = await self._select_audio_track(audio_reps, a_resolution_choice)
         else:
-            paramstore._store["mpd_audio"] = False
-            
+            paramstore["mpd_audio"] = False
+
         if v_resolution_choice != "none":
-            paramstore._store["mpd_video"] = True
+            paramstore["mpd_video"] = True
             selected_video = await self._select_video_track(video_reps, v_resolution_choice)
         else:
-            paramstore._store["mpd_video"] = False
-            
+            paramstore["mpd_video"] = False
+
+        # 之後的 Period 依第一個 Period 的選擇找對應軌道，缺任一條軌道或無法共用初始化片段的 Period
+        # 整段略過，避免影音錯位
+        video_parts: List[Optional[MediaTrack]] = [selected_video]
+        audio_parts: List[Optional[MediaTrack]] = [selected_audio]
+        want_video: bool = selected_video is not None and selected_video.source is not None
+        want_audio: bool = selected_audio is not None and selected_audio.source is not None
+        if len(periods) > 1:
+            self.expand_segment_urls(selected_video if want_video else None)
+            self.expand_segment_urls(selected_audio if want_audio else None)
+        for index, period in enumerate(periods[1:], 2):
+            video_list, audio_list = period_tracks[period]
+            video = self._match_track(selected_video, video_list) if want_video else None
+            audio = self._match_track(selected_audio, audio_list) if want_audio else None
+            if (want_video and video is None) or (want_audio and audio is None):
+                logger.warning(f"Warning: Period {period.get('id', index)} has no matching track, skipped")
+                continue
+            problems: List[str] = [
+                f"{kind} {reason}"
+                for kind, first, part in (("video", selected_video, video), ("audio", selected_audio, audio))
+                if part is not None and (reason := self._init_mismatch(first, self.expand_segment_urls(part)))
+            ]
+            if problems:
+                logger.error(
+                    f"Error: Period {period.get('id', index)} cannot reuse the first Period's initialization "
+                    f"segment ({'; '.join(problems)}), skipped"
+                )
+                continue
+            if want_video:
+                video_parts.append(video)
+            if want_audio:
+                audio_parts.append(audio)
+        if len(periods) > 1:
+            logger.info(f"Joining {max(len(video_parts), len(audio_parts))} of {len(periods)} Periods")
+
         drm_info = self._parse_drm_info()
-        
+
         return MPDContent(
-            video_track=selected_video,
-            audio_track=selected_audio,
+            video_track=self._concat_periods(video_parts),
+            audio_track=self._concat_periods(audio_parts),
             base_url=base_url,
             drm_info=drm_info,
         )
 
 
+
+
     async def _select_audio_track(self, audio_reps: List[MediaTrack], a_resolution_choice: str) -> Optional[MediaTrack]:
         """選擇音訊軌道"""
         audio_rates = [(t.bandwidth, t.audio_sampling_rate, t.id) for t in audio_reps if t.audio_sampling_rate]
@@ -0,0 +1,112 @@
+import asyncio
+import re
+import weakref
+from collections import deque
+from typing import Callable, Deque, Optional, Sequence, Tuple
+
+from lib.load_yaml_config import CFG
+from static.color import Color
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('mux_process', 'lavender')
+
+
+_LINE_SPLIT = re.compile(rb'[\r\n]')
+_FFMPEG_DURATION = re.compile(rb'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_FFMPEG_TIME = re.compile(rb'time=\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+# mkvmerge: "Progress: 42%"，mp4decrypt / packager 沒有進度輸出
+_PERCENT = re.compile(rb'Progress:\s*(\d+)%')
+
+
+def _seconds(match: "re.Match[bytes]") -> float:
+    h, m, s = match.groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+class ToolProgress:
+    """從 ffmpeg / mkvmerge 的輸出行解析進度（0.0 ~ 1.0）"""
+
+    def __init__(self) -> None:
+        self.duration: Optional[float] = None
+
+    def parse(self, line: bytes) -> Optional[float]:
+        if (match := _PERCENT.search(line)) is not None:
+            return min(1.0, int(match.group(1)) / 100)
+        if (match := _FFMPEG_TIME.search(line)) is not None:
+            if self.duration:
+                return min(1.0, _seconds(match) / self.duration)
+            return None
+        if self.duration is None and (match := _FFMPEG_DURATION.search(line)) is not None:
+            # 只取第一個輸入的長度，影音軌長度相同
+            self.duration = _seconds(match) or None
+        return None
+
+
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_slots() -> asyncio.Semaphore:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    slots: Optional[asyncio.Semaphore] = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(CFG['Container']['mux_workers'])
+    return slots
+
+
+async def _kill(proc: asyncio.subprocess.Process, name: str) -> None:
+    if proc.returncode is not None:
+        return
+    logger.warning(f"{Color.fg('gold')}Cancelled, stopping {name} (pid {proc.pid}){Color.reset()}")
+    proc.terminate()
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=5)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def run_tool(
+    cmd: Sequence[str],
+    name: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> Tuple[int, str]:
+    """以非同步子行程執行外部工具（ffmpeg、mkvmerge、mp4decrypt、packager），
+    同時執行的數量受 Container.mux_workers 限制；回傳 (returncode, 最後幾行輸出)。
+    呼叫端被取消時會終止子行程"""
+    async with _get_slots():
+        proc: asyncio.subprocess.Process = await asyncio.create_subprocess_exec(
+            *(str(part) for part in cmd),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        tail: Deque[str] = deque(maxlen=40)
+        progress = ToolProgress()
+
+        def handle(line: bytes) -> None:
+            if not line.strip():
+                return
+            fraction: Optional[float] = progress.parse(line)
+            if fraction is None:
+                tail.append(line.decode('utf-8', errors='replace'))
+            elif on_progress is not None:
+                on_progress(fraction)
+
+        async def pump(stream: asyncio.StreamReader) -> None:
+            # ffmpeg 以 \r 覆寫同一行進度，因此 \r 與 \n 都視為換行
+            pending: bytes = b''
+            while chunk := await stream.read(64 * 1024):
+                *lines, pending = _LINE_SPLIT.split(pending + chunk)
+                for line in lines:
+                    handle(line)
+            handle(pending)
+
+        try:
+            await asyncio.gather(pump(proc.stdout), pump(proc.stderr))
+            returncode: int = await proc.wait()
+        except asyncio.CancelledError:
+            await asyncio.shield(_kill(proc, name))
+            raise
+        logger.debug(f"{Color.fg('light_gray')}{name} exited with {returncode}{Color.reset()}")
+        return returncode, '\n'.join(tail)
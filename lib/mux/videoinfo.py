@@ -1,13 +1,64 @@
 import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
 import ffmpeg
 
+
+_PROBE_CACHE_SIZE = 256
+# (path, size, mtime_ns) -> ffprobe 結果，檔案內容改變時 size / mtime 不同自然失效
+_probe_cache: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+
+_HLS_ATTR = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+# RFC 6381 codecs 前綴 -> ffprobe 的 codec_name
+_CODEC_NAMES = {
+    "avc1": "h264", "avc3": "h264",
+    "hvc1": "hevc", "hev1": "hevc",
+    "av01": "av1",
+    "vp09": "vp9", "vp9": "vp9",
+    "mp4a": "aac",
+    "opus": "opus",
+    "ac-3": "ac3",
+    "ec-3": "eac3",
+    "flac": "flac",
+}
+
+
+def probe(path: str) -> Dict[str, Any]:
+    """ffmpeg.probe 加上快取，同一個檔案在未改動前只會啟動一次 ffprobe"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    data = _probe_cache.get(key)
+    if data is None:
+        data = ffmpeg.probe(path)
+        _probe_cache[key] = data
+        if len(_probe_cache) > _PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    else:
+        _probe_cache.move_to_end(key)
+    return data
+
+
+def _codec_name(codec: str) -> Optional[str]:
+    return _CODEC_NAMES.get(codec.strip().lower().split(".")[0])
+
+
+def _stream_from_codecs(codecs: str, codec_type: str) -> Optional[Dict[str, Any]]:
+    kind = {"video": ("h264", "hevc", "av1", "vp9"), "audio": ("aac", "opus", "ac3", "eac3", "flac")}[codec_type]
+    for codec in codecs.split(","):
+        name = _codec_name(codec)
+        if name in kind:
+            return {"codec_type": codec_type, "codec_name": name}
+    return None
+
+
 class VideoInfo:
-    def __init__(self, path: str):
+    def __init__(self, path: str, probe_data: Optional[Dict[str, Any]] = None):
         if not os.path.exists(path):
             raise FileNotFoundError(f"File not found: {path}")
         self.path = path
-        self._probe_data = ffmpeg.probe(self.path)
+        self._probe_data = probe_data if probe_data is not None else probe(self.path)
 
         self._format = self._probe_data["format"]
         self._vstreams = self._probe_data["streams"]
@@ -15,6 +66,55 @@ class VideoInfo:
         self._size_bytes = int(self._format.get("size", 0))
         self._duration_sec = float(self._format.get("duration", 0.0))
 
+    @classmethod
+    def from_content(cls, path: str, content: Any) -> Optional["VideoInfo"]:
+        """用已解析的 MPD（MediaTrack）或 HLS（best_info）軌道資訊建立，不需要執行 ffprobe；
+        資訊不足以判斷編碼或畫質時回傳 None，由呼叫端改用 probe"""
+        if content is None or not os.path.exists(path):
+            return None
+        streams = []
+        duration = 0.0
+        if content.__class__.__name__ == "MPDContent":
+            video, audio = content.video_track, content.audio_track
+            if video is not None:
+                stream = _stream_from_codecs(video.codecs or "", "video")
+                if stream is None or not video.height:
+                    return None
+                stream.update(width=video.width, height=video.height)
+                streams.append(stream)
+            if audio is not None:
+                stream = _stream_from_codecs(audio.codecs or "", "audio")
+                if stream is None:
+                    return None
+                streams.append(stream)
+            track = video or audio
+            if track is not None and track.timescale:
+                duration = sum(seg.d * (seg.r + 1) for seg in track.segments) / track.timescale
+        elif content.__class__.__name__ == "HLSContent":
+            attrs = {k: v.strip('"') for k, v in _HLS_ATTR.findall(str(content.best_info or "").split(":", 1)[-1])}
+            codecs = attrs.get("CODECS", "")
+            resolution = re.fullmatch(r"(\d+)x(\d+)", attrs.get("RESOLUTION", ""))
+            video_stream = _stream_from_codecs(codecs, "video")
+            if content.video_track:
+                if video_stream is None or resolution is None:
+                    return None
+                video_stream.update(width=int(resolution.group(1)), height=int(resolution.group(2)))
+                streams.append(video_stream)
+            if content.audio_track:
+                audio_stream = _stream_from_codecs(codecs, "audio")
+                if audio_stream is None:
+                    return None
+                streams.append(audio_stream)
+        else:
+            return None
+        if not streams:
+            return None
+        probe_data = {
+            "format": {"size": os.path.getsize(path), "duration": duration},
+            "streams": streams,
+        }
+        return cls(path, probe_data)
+
     @property
     def size(self) -> str:
         size_gb = self._size_bytes / (1024**3)
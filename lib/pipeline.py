@@ -0,0 +1,86 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+from lib.load_yaml_config import CFG
+from static.color import Color
+from static.parameter import paramstore
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('pipeline', 'sienna')
+
+
+STAGES = ('fetch', 'download', 'mux', 'finalize')
+
+
+class _Ticket:
+    """單一媒體在管線中的位置，記錄目前持有哪一個階段的名額"""
+
+    def __init__(self, pipeline: "Pipeline", name: str) -> None:
+        self.pipeline: Pipeline = pipeline
+        self.name: str = name
+        self.stage: Optional[str] = None
+
+    async def advance(self, stage: str) -> None:
+        if stage == self.stage:
+            return
+        self.release()
+        await self.pipeline.semaphores[stage].acquire()
+        self.stage = stage
+        logger.debug(f"{Color.fg('light_gray')}{self.name} -> {stage}{Color.reset()}")
+
+    def release(self) -> None:
+        if self.stage is not None:
+            self.pipeline.semaphores[self.stage].release()
+            self.stage = None
+
+
+_ticket: ContextVar[Optional[_Ticket]] = ContextVar('pipeline_ticket', default=None)
+
+
+async def advance(stage: str) -> None:
+    """進入下一個階段；不在管線中執行時（例如單一媒體）不做任何事"""
+    ticket: Optional[_Ticket] = _ticket.get()
+    if ticket is not None:
+        await ticket.advance(stage)
+
+
+class Pipeline:
+    """跨媒體的分階段排程：抓取資訊、下載片段、合併混流、收尾各自限制並行數，
+    讓第 N+1 個媒體在第 N 個媒體混流時就開始下載"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None) -> None:
+        limits = dict(limits or CFG['Download']['pipeline'])
+        resolution = CFG['HLS or MPEG-DASH']
+        if 'ask' in (str(resolution['Video_Resolution_Choice']).lower(), str(resolution['Audio_Resolution_Choice']).lower()):
+            # 需要互動選擇畫質時，一次只讓一個媒體進入抓取階段
+            limits['fetch'] = 1
+        self.semaphores: Dict[str, asyncio.Semaphore] = {
+            stage: asyncio.Semaphore(max(1, limits.get(stage, 1))) for stage in STAGES
+        }
+
+    async def _run_one(self, name: str, job: Awaitable[Any]) -> Any:
+        ticket = _Ticket(self, name)
+        token = _ticket.set(ticket)
+        # mpd_audio / mpd_video 等旗標改為每個媒體各自一份
+        scope_token = paramstore.begin_item_scope()
+        try:
+            await ticket.advance('fetch')
+            return await job
+        finally:
+            ticket.release()
+            paramstore.end_item_scope(scope_token)
+            _ticket.reset(token)
+
+    async def run(self, jobs: Iterable[tuple]) -> List[Any]:
+        """jobs 為 (名稱, coroutine) 組合，全部排入管線並等待完成"""
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self._run_one(name, job), name=f"pipeline-{name}")
+            for name, job in jobs
+        ]
+        results: List[Any] = await asyncio.gather(*tasks, return_exceptions=True)
+        for task, result in zip(tasks, results):
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                logger.error(f"{task.get_name()} failed: {result!r}")
+        return results
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+from lib.load_yaml_config import CFG
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('ratelimit', 'wheat')
+
+
+MiB: int = 1024 * 1024
+
+
+class TokenBucket:
+    """以 bytes/s 補充的權杖桶，允許單次取用超過桶內餘額（以負債方式延後下一次）"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate: float = rate
+        self.burst: float = burst
+        self.tokens: float = burst
+        self._stamp: float = time.monotonic()
+
+    def _refill(self) -> None:
+        now: float = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def delay(self) -> float:
+        """還要等多久才能再取用；餘額非負時立即可取"""
+        self._refill()
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def take(self, nbytes: int) -> None:
+        self._refill()
+        self.tokens -= nbytes
+
+    async def consume(self, nbytes: int) -> None:
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+        self.take(nbytes)
+
+
+class FairRateLimiter:
+    """全域權杖桶加上依位元組計算的公平佇列：每個 flow（某媒體的某條軌道、圖片）
+    輪流取得頻寬，音軌與縮圖不會被 50 個影片片段請求餓死"""
+
+    def __init__(self, rate: float, per_media_rate: float) -> None:
+        self.bucket: Optional[TokenBucket] = TokenBucket(rate, rate) if rate > 0 else None
+        self.per_media_rate: float = per_media_rate
+        self.media_buckets: Dict[str, TokenBucket] = {}
+        self._flows: Dict[Tuple[Optional[str], str], float] = {}
+        self._heap: List[Tuple[float, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._vclock: float = 0.0
+        self._pump: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.bucket is not None or self.per_media_rate > 0
+
+    async def consume(self, nbytes: int, flow: str, media_id: Optional[str] = None) -> None:
+        if media_id is not None and self.per_media_rate > 0:
+            bucket: Optional[TokenBucket] = self.media_buckets.get(media_id)
+            if bucket is None:
+                bucket = self.media_buckets[media_id] = TokenBucket(self.per_media_rate, self.per_media_rate)
+            await bucket.consume(nbytes)
+        if self.bucket is None:
+            return
+
+        key: Tuple[Optional[str], str] = (media_id, flow)
+        # 虛擬完成時間：閒置的 flow 從目前時鐘起算，忙碌的 flow 接在自己上一筆之後
+        tag: float = max(self._vclock, self._flows.get(key, 0.0)) + nbytes
+        self._flows[key] = tag
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (tag, next(self._seq), nbytes, waiter))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await waiter
+
+    async def _run_pump(self) -> None:
+        assert self.bucket is not None
+        while self._heap:
+            tag, _, nbytes, waiter = self._heap[0]
+            if waiter.cancelled():
+                heapq.heappop(self._heap)
+                continue
+            wait: float = self.bucket.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._heap)
+            self.bucket.take(nbytes)
+            self._vclock = tag
+            waiter.set_result(None)
+        # 清掉已閒置的 flow，避免長時間執行時字典持續成長
+        self._flows = {k: v for k, v in self._flows.items() if v > self._vclock}
+
+
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, FairRateLimiter]" = weakref.WeakKeyDictionary()
+
+
+def _get_limiter() -> FairRateLimiter:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    limiter: Optional[FairRateLimiter] = _limiters.get(loop)
+    if limiter is None:
+        cfg = CFG['Download']
+        limiter = FairRateLimiter(cfg['max_rate_mb'] * MiB, cfg['per_media_rate_mb'] * MiB)
+        _limiters[loop] = limiter
+        if limiter.enabled:
+            logger.info(
+                f"Bandwidth cap: total {cfg['max_rate_mb'] or 'unlimited'} MiB/s, "
+                f"per media {cfg['per_media_rate_mb'] or 'unlimited'} MiB/s"
+            )
+    return limiter
+
+
+async def throttle(nbytes: int, flow: str, media_id: Optional[str] = None) -> None:
+    """所有 aiohttp 下載在讀取每個 chunk 後呼叫；未設定上限時直接返回"""
+    limiter: FairRateLimiter = _get_limiter()
+    if limiter.enabled:
+        await limiter.consume(nbytes, flow, media_id)
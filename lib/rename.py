@@ -40,14 +40,18 @@ class SUCCESS:
 
     async def when_success(self, success: bool, decryption_key: Optional[Union[bytes, str]], merge_type: str) -> str | bool:
         """處理下載成功後的邏輯：下載縮圖、混流、重新命名與清理檔案"""
-        if success:
+        if success and not self.downloader.piped:
             logger.info(f"{Color.fg('light_gray')}Video file: {self.base_dir / f'video.{container}'}{Color.reset()}")
             logger.info(f"{Color.fg('light_gray')}Audio file: {self.base_dir / f'audio.{container}'}{Color.reset()}")
         await self.dl_thumbnail()
-        # Mux video and audio with FFmpeg
-        muxer: FFmpegMuxer = FFmpegMuxer(self.base_dir, decryption_key)
         video_file_name = ''
-        mux_bool_status = await muxer.mux_main(merge_type, self.path)
+        if self.downloader.piped:
+            # pipe 模式下 ffmpeg 已在下載時直接混流到 self.path
+            mux_bool_status: bool = success is True
+        else:
+            # Mux video and audio with FFmpeg
+            muxer: FFmpegMuxer = FFmpegMuxer(self.base_dir, decryption_key)
+            mux_bool_status = await muxer.mux_main(merge_type, self.path)
         if paramstore.get('skip_mux') is not True and paramstore.get('skip_merge') is not True:
             if mux_bool_status is True and not paramstore.get('nodl') is True:
                 video_file_name = await SUCCESS.re_name(self)
@@ -81,6 +85,10 @@ class SUCCESS:
     async def clean_file(self, had_drm: Optional[Union[bytes, str]], merge_type: str) -> None:
         """清理下載過程中的暫存檔案、加密檔案和暫存目錄"""
         base_dir: Path = self.base_dir
+        if self.downloader.piped:
+            # pipe 模式沒有 video / audio 軌道檔，只剩片段資料夾
+            await self.remove_track_dirs()
+            return
         if os.path.exists(base_dir / f"audio.{container}"):
             file_paths: List[Path] = []
             # Files to delete
@@ -115,15 +123,19 @@ class SUCCESS:
                 except Exception as e:
                     logger.error(f"Error removing file {fp}: {e}")
 
-            for subfolder in ["audio", "video"]:
-                dir_path: Path = base_dir / subfolder
-                try:
-                    await asyncio.to_thread(shutil.rmtree, dir_path)
-                    logger.info(f"{Color.fg('light_gray')}Force-removed directory: {dir_path}{Color.reset()}")
-                except FileNotFoundError:
-                    logger.warning(f"Directory not found, skipping: {dir_path}")
-                except Exception as e:
-                    logger.error(f"Error force-removing directory {dir_path}: {e}")
+            await self.remove_track_dirs()
+
+    async def remove_track_dirs(self) -> None:
+        """刪除 audio / video 片段資料夾"""
+        for subfolder in ["audio", "video"]:
+            dir_path: Path = self.base_dir / subfolder
+            try:
+                await asyncio.to_thread(shutil.rmtree, dir_path)
+                logger.info(f"{Color.fg('light_gray')}Force-removed directory: {dir_path}{Color.reset()}")
+            except FileNotFoundError:
+                logger.warning(f"Directory not found, skipping: {dir_path}")
+            except Exception as e:
+                logger.error(f"Error force-removing directory {dir_path}: {e}")
 
     async def re_name(self) -> str:
         """根據影片元數據和命名規則重新命名最終的 MP4 檔案"""
@@ -173,16 +185,16 @@ class SUCCESS:
 
     async def extract_video_info(self) -> Tuple[str, str, str]:
         """異步提取最終 MP4 檔案的編解碼器、畫質標籤和音頻編解碼器"""
-        vv: VideoInfo = VideoInfo(self.path)
-        
-        # 使用 TaskGroup 並將 FFmpeg 探針的同步操作包裝成異步
-        async with asyncio.TaskGroup() as tg:
-            codec_task: asyncio.Task[str] = tg.create_task(asyncio.to_thread(lambda: vv.codec))
-            quality_task: asyncio.Task[str] = tg.create_task(asyncio.to_thread(lambda: vv.quality_label))
-            audio_task: asyncio.Task[str] = tg.create_task(asyncio.to_thread(lambda: vv.audio_codec))
-        video_codec: str = codec_task.result()
-        video_quality_label: str = quality_task.result()
-        video_audio_codec: str = audio_task.result()
+        vv: Optional[VideoInfo] = None
+        if paramstore.get('no_video_audio') is not True:
+            # 影音軌都已混流時，直接使用 MPD / HLS 解析到的編碼與解析度，不必再執行 ffprobe
+            vv = VideoInfo.from_content(self.path, self.downloader.media_content)
+        if vv is None:
+            # ffprobe 是外部行程，放到執行緒避免阻塞事件迴圈；結果依 (路徑, 大小, 修改時間) 快取
+            vv = await asyncio.to_thread(VideoInfo, self.path)
+        video_codec: str = vv.codec
+        video_quality_label: str = vv.quality_label
+        video_audio_codec: str = vv.audio_codec
         if video_audio_codec == 'unknown':
             if paramstore.get('no_video_audio') is True:
                 video_audio_codec = '{audio}'
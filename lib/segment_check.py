@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+TS_PACKET: int = 188
+TS_SYNC: int = 0x47
+_BOX_TYPE_CHARS: frozenset = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 \xa9')
+
+
+class Mp4BoxWalker:
+    """逐 chunk 走訪最上層的 MP4 box（moof / mdat ...），只解析 header，不保留內容"""
+
+    def __init__(self) -> None:
+        self.boxes: int = 0
+        self.error: Optional[str] = None
+        self._header: bytearray = bytearray()
+        self._skip: int = 0
+        self._to_end: bool = False
+
+    def feed(self, chunk: bytes) -> None:
+        view = memoryview(chunk)
+        i: int = 0
+        end: int = len(view)
+        while i < end and self.error is None and not self._to_end:
+            if self._skip:
+                n: int = min(self._skip, end - i)
+                self._skip -= n
+                i += n
+                continue
+            need: int = 16 if len(self._header) >= 8 and self._header[:4] == b'\x00\x00\x00\x01' else 8
+            take: int = min(need - len(self._header), end - i)
+            self._header += view[i:i + take]
+            i += take
+            if len(self._header) < need:
+                continue
+            box_type: bytes = bytes(self._header[4:8])
+            if not all(c in _BOX_TYPE_CHARS for c in box_type):
+                self.error = f"invalid box type {box_type!r} after {self.boxes} boxes"
+                return
+            size: int = int.from_bytes(self._header[:4], 'big')
+            if size == 1:
+                if need == 8:
+                    # 64-bit largesize，還要再讀 8 bytes
+                    continue
+                size = int.from_bytes(self._header[8:16], 'big')
+            elif size == 0:
+                # 最後一個 box 延伸到檔案結尾
+                self._to_end = True
+            if not self._to_end and size < need:
+                self.error = f"box {box_type.decode('latin-1')} has invalid size {size}"
+                return
+            self._skip = 0 if self._to_end else size - need
+            self._header.clear()
+            self.boxes += 1
+
+    def finish(self) -> Optional[str]:
+        if self.error:
+            return self.error
+        if self._header or self._skip:
+            return f"truncated box ({self._skip} bytes missing after {self.boxes} boxes)"
+        if not self.boxes:
+            return "no MP4 boxes"
+        return None
+
+
+class TsSyncChecker:
+    """檢查每個 188 bytes 的 TS 封包都以 0x47 開頭"""
+
+    def __init__(self) -> None:
+        self.position: int = 0
+        self.error: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> None:
+        if self.error is not None:
+            return
+        start: int = (-self.position) % TS_PACKET
+        sync: bytes = chunk[start::TS_PACKET]
+        if sync.count(TS_SYNC) != len(sync):
+            bad: int = next(i for i, b in enumerate(sync) if b != TS_SYNC)
+            self.error = f"lost TS sync at byte {self.position + start + bad * TS_PACKET}"
+        self.position += len(chunk)
+
+    def finish(self) -> Optional[str]:
+        if self.error:
+            return self.error
+        if self.position % TS_PACKET:
+            return f"truncated TS packet ({self.position % TS_PACKET} of {TS_PACKET} bytes)"
+        return None
+
+
+@dataclass
+class SegmentProblem:
+    """片段檢查失敗的原因；truncated 表示只是提早斷線、位元組不足，已下載的部分可以續傳"""
+    message: str
+    truncated: bool = False
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class SegmentValidator:
+    """在下載串流過程中即時檢查片段：位元組數對照 Content-Length，
+    structure=True 時依第一個 byte 判斷 TS 或 MP4 並檢查封包 / box 結構"""
+
+    def __init__(self, expected_length: Optional[int], structure: bool = False) -> None:
+        self.expected_length: Optional[int] = expected_length
+        self.structure: bool = structure
+        self.received: int = 0
+        self._checker = None
+
+    def feed(self, chunk: bytes) -> None:
+        if self.structure and chunk:
+            if self._checker is None:
+                self._checker = TsSyncChecker() if chunk[0] == TS_SYNC else Mp4BoxWalker()
+            self._checker.feed(chunk)
+        self.received += len(chunk)
+
+    def finish(self) -> Optional[SegmentProblem]:
+        """回傳檢查失敗的原因，片段完整時回傳 None"""
+        if self.expected_length is not None and self.received != self.expected_length:
+            return SegmentProblem(
+                f"received {self.received} of {self.expected_length} bytes",
+                truncated=self.received < self.expected_length,
+            )
+        if self._checker is not None:
+            error: Optional[str] = self._checker.finish()
+            return SegmentProblem(error) if error is not None else None
+        return None
@@ -0,0 +1,56 @@
+import asyncio
+import weakref
+from typing import Optional
+
+import aiohttp
+
+from lib.load_yaml_config import CFG
+from static.color import Color
+from unit.__init__ import USERAGENT
+from unit.handle.handle_log import setup_logging
+
+
+logger = setup_logging('session_pool', 'mint')
+
+
+# 每個事件迴圈一份，asyncio.run 重新執行時不會拿到已關閉迴圈上的 session
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def _build_session() -> aiohttp.ClientSession:
+    cfg = CFG['Download']
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+        limit=cfg['pool_limit'],
+        limit_per_host=cfg['max_concurrency'],
+        keepalive_timeout=cfg['keepalive_timeout'],
+        ttl_dns_cache=cfg['dns_cache_ttl'],
+        use_dns_cache=True,
+        enable_cleanup_closed=True,
+    )
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=600, connect=10, sock_connect=10, sock_read=30)
+    return aiohttp.ClientSession(
+        connector=connector, timeout=timeout, headers={
+            "user-Agent": USERAGENT,
+            "accept": "*/*",
+            "accept-Encoding": "identity",
+            }
+    )
+
+
+async def get_cdn_session() -> aiohttp.ClientSession:
+    """取得整個程式共用的 CDN session，TLS 連線與 DNS 快取在多個媒體之間重複使用"""
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    session: Optional[aiohttp.ClientSession] = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _build_session()
+        _sessions[loop] = session
+    return session
+
+
+async def close_cdn_sessions() -> None:
+    """程式結束前關閉目前事件迴圈上的共用 session"""
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    session: Optional[aiohttp.ClientSession] = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
+        logger.debug(f"{Color.fg('light_gray')}CDN session pool closed{Color.reset()}")
@@ -8,6 +8,7 @@ import orjson
 
 from lib.__init__ import dl_folder_name, OutputFormatter, get_artis_list, FilenameSanitizer, move_contents_to_parent, printer_video_folder_path_info
 from lib.load_yaml_config import CFG
+from lib.pipeline import advance as pipeline_advance
 from lib.rename import SUCCESS
 from lib.save_json_data import save_json_data
 from lib.path import Path
@@ -42,9 +43,13 @@ class Video_folder:
     async def video_folder_handle(self, custom_community_name: str, community_name: str) -> Path:
         """根據 community_name 和媒體資訊建立下載資料夾路徑"""
         base_dir: Path = Path(dl_folder_name) / custom_community_name / "Videos"
-        temp_folder_name: str = f"temp_{self.time_str}_{self.media_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-        temp_name: str = self.FilenameSanitizer(temp_folder_name)
-        temp_dir: Path = base_dir / temp_name / encode(f"temp_{self.time_str}_{self.media_id}")
+        temp_dir: Optional[Path] = self.find_resumable_dir(base_dir)
+        if temp_dir is None:
+            temp_folder_name: str = f"temp_{self.time_str}_{self.media_id}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+            temp_name: str = self.FilenameSanitizer(temp_folder_name)
+            temp_dir = base_dir / temp_name / encode(f"temp_{self.time_str}_{self.media_id}")
+        else:
+            logger.info(f"{Color.fg('light_gray')}Resume unfinished download in{Color.reset()} {Color.fg('denim')}{temp_dir.parent}{Color.reset()}")
         temp_dir.mkdirp()
         self.base_dir = base_dir
         self.output_dir = str(temp_dir.resolve())
@@ -70,6 +75,18 @@ class Video_folder:
         self.folder_name: str = folder_name
         return temp_dir
 
+    def find_resumable_dir(self, base_dir: Path) -> Optional[Path]:
+        """尋找同一 media_id 上次中斷留下的暫存資料夾，讓片段可以續傳"""
+        if not base_dir.is_dir():
+            return None
+        prefix: str = self.FilenameSanitizer(f"temp_{self.time_str}_{self.media_id}_")
+        candidates: List[Path] = [p for p in base_dir.iterdir() if p.is_dir() and p.name.startswith(prefix)]
+        for candidate in sorted(candidates, key=lambda p: p.stat().st_mtime, reverse=True):
+            temp_dir: Path = candidate / encode(f"temp_{self.time_str}_{self.media_id}")
+            if temp_dir.is_dir():
+                return temp_dir
+        return None
+
     def get_unique_folder_name(self, base_name: str, full_path: Path) -> Path:
         """確保資料夾名稱唯一性，避免衝突"""
         base_name = self.FilenameSanitizer(base_name)
@@ -208,14 +225,20 @@ async def start_download_queue(
         # 延遲匯入 MediaDownloader
         from lib.download import MediaDownloader
         downloader: Any = MediaDownloader(media_id, output_dir)
+        s: SUCCESS = SUCCESS(downloader, json_data, community_name, custom_community_name)
+        if decryption_key is None:
+            # 沒有 DRM 時 pipe 模式可以在下載時直接混流到最終暫存檔
+            downloader.pipe_output = s.path
         
         success: bool
         merge_type: str
+        await pipeline_advance('download')
         success, merge_type = await downloader.download_content(mpd_content)
         
         # 處理成功後的混流、重命名和清理
-        s: SUCCESS = SUCCESS(downloader, json_data, community_name, custom_community_name)
+        await pipeline_advance('mux')
         video_file_name, mux_bool_status = await s.when_success(success, decryption_key, merge_type)
+        await pipeline_advance('finalize')
         await video_folder_obj.re_name_folder(video_file_name, mux_bool_status)
     else:
         logger.error("Failed to create output directory.")
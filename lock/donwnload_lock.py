@@ -1,11 +1,10 @@
 import atexit
 import os
 import queue
+import sqlite3
 import threading
 from pathlib import Path
-from typing import Set
-
-import joblib
+from typing import Iterable, List, Optional, Set
 
 from static.route import Route
 from unit.handle.handle_log import setup_logging
@@ -20,69 +19,124 @@ class PKLErrorHandler:
         logger.error(f"[PKL ERROR] {error.__class__.__name__}: {error}")
 
 
+DB_FILE: Path = Route().download_ids_db
+# 舊版 joblib 壓縮的 set，第一次啟動時匯入資料庫
 BIN_FILE: Path = Route().download_info_bin
 
+# 背景執行緒一次交易最多寫入的 ID 數
+BATCH_SIZE: int = 1000
+# 讀取時映射到記憶體的資料庫大小上限
+MMAP_SIZE: int = 256 * 1024 * 1024
+# 單一查詢的參數上限（SQLite 3.32 以前為 999）
+MAX_VARIABLES: int = 900
 
-class UUIDSetStore:
-    def __init__(self) -> None:
-        lock_dir: str = os.path.join(os.getcwd(), "lock")
-        os.makedirs(lock_dir, exist_ok=True)
 
-        self.filename: str = os.path.join(lock_dir, BIN_FILE)
-        self.data: Set[str] = set()
+class UUIDSetStore:
+    """
+    Downloaded IDs kept in a SQLite database in WAL mode, so several
+    processes can share it. add() only queues the ID; a background thread
+    inserts queued IDs in batches and writes nothing while idle. Lookups
+    use the primary-key index over a memory-mapped connection and also see
+    IDs added by other processes.
+    """
+
+    def __init__(self, filename: Path = DB_FILE) -> None:
+        self.filename: str = str(filename)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+        # 已排入佇列但尚未寫入資料庫的 ID，exists() 也要看得到
+        self.pending: Set[str] = set()
         self.lock: threading.Lock = threading.Lock()
 
-        self.task_queue: queue.Queue[str] = queue.Queue()
+        # None 是停止訊號
+        self.task_queue: queue.Queue[Optional[str]] = queue.Queue()
         self.stop_event: threading.Event = threading.Event()
-        self.flush_interval: int = 2
-        self.worker_thread: threading.Thread = threading.Thread(target=self._worker, daemon=True)
 
-        self._load()
+        self.conn: sqlite3.Connection = self._connect(check_same_thread=False)
+        self._init_db()
+        self._migrate()
+
+        self.worker_thread: threading.Thread = threading.Thread(target=self._worker, daemon=True)
         self.worker_thread.start()
         atexit.register(self.stop)
 
-    def _load(self) -> None:
-        """Load the joblib file; use an empty set if it doesn't exist."""
-        if os.path.exists(self.filename):
-            try:
-                loaded = joblib.load(self.filename)
-                # Validate that the loaded object is a set
-                if isinstance(loaded, set):
-                    self.data = loaded
-                else:
-                    self.data = set()
-            except Exception as e:
-                print(f"[UUIDSetStore] Load failed: {e}")
-                self.data = set()
-        else:
-            self.data = set()
-
-    def _save(self) -> None:
-        """Synchronously save the current set to the joblib file."""
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn: sqlite3.Connection = sqlite3.connect(self.filename, timeout=30, check_same_thread=check_same_thread)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        return conn
+
+    def _init_db(self) -> None:
+        with self.lock, self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS downloaded (id TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def _insert(self, conn: sqlite3.Connection, ids: Iterable[str]) -> None:
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO downloaded (id) VALUES (?)', ((x,) for x in ids))
+
+    def _migrate(self) -> None:
+        """Import the old joblib file once, then rename it so it is never loaded again."""
+        if not os.path.exists(BIN_FILE):
+            return
         try:
-            with self.lock:
-                joblib.dump(self.data, self.filename, compress=3)
+            # 只有遷移時需要 joblib
+            import joblib
+            loaded = joblib.load(BIN_FILE)
         except Exception as e:
-            print(f"[UUIDSetStore] Save failed: {e}")
+            logger.error(f"Cannot read {BIN_FILE}: {e}")
+            return
+        ids: List[str] = [str(x) for x in loaded] if isinstance(loaded, set) else []
+        try:
+            with self.lock:
+                self._insert(self.conn, ids)
+        except sqlite3.Error as e:
+            logger.error(f"Migrating {BIN_FILE} failed: {e}")
+            return
+        try:
+            os.replace(BIN_FILE, f"{BIN_FILE}.migrated")
+        except OSError:
+            # 另一個程序同時完成了遷移
+            pass
+        logger.info(f"Migrated {len(ids)} downloaded IDs from {BIN_FILE} to {self.filename}")
+        self.compact()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[str]) -> None:
+        try:
+            self._insert(conn, batch)
+        except sqlite3.Error as e:
+            # 保留在 pending，本次執行期間仍視為已下載
+            logger.error(f"[UUIDSetStore] Save failed: {e}")
+            return
+        with self.lock:
+            self.pending.difference_update(batch)
 
     def _worker(self) -> None:
         """
-        Background thread that periodically flushes queued UUIDs into
-        the in-memory set and writes it out to disk.
+        Background thread that blocks until IDs are queued, then inserts
+        everything currently in the queue in one transaction.
         """
-        while not self.stop_event.is_set() or not self.task_queue.empty():
-            try:
-                # Wait for up to flush_interval seconds for a new UUID
-                uuid_str: str = self.task_queue.get(timeout=self.flush_interval)
-                with self.lock:
-                    self.data.add(uuid_str)
-                self.task_queue.task_done()
-            except queue.Empty:
-                # No new items arrived; still trigger a save
-                pass
-
-            # Periodic save
-            self._save()
+        conn: sqlite3.Connection = self._connect()
+        try:
+            stopping: bool = False
+            while not stopping:
+                item: Optional[str] = self.task_queue.get()
+                batch: List[str] = []
+                while True:
+                    if item is None:
+                        stopping = True
+                    else:
+                        batch.append(item)
+                    if stopping or len(batch) >= BATCH_SIZE:
+                        break
+                    try:
+                        item = self.task_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(conn, batch)
+        finally:
+            conn.close()
 
     def add(self, uuid_str: str) -> None:
         """
@@ -92,6 +146,8 @@ class UUIDSetStore:
         try:
             if not isinstance(uuid_str, str):
                 raise ValueError("UUID must be a string")
+            with self.lock:
+                self.pending.add(uuid_str)
             self.task_queue.put(uuid_str)
         except Exception as e:
             logger.error(e)
@@ -102,17 +158,56 @@ class UUIDSetStore:
         Returns True if found, False otherwise.
         """
         with self.lock:
-            return uuid_str in self.data
+            if uuid_str in self.pending:
+                return True
+            try:
+                row = self.conn.execute('SELECT 1 FROM downloaded WHERE id = ?', (uuid_str,)).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"[UUIDSetStore] Lookup failed: {e}")
+                return False
+        return row is not None
+
+    def exists_many(self, uuids: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of the given UUID strings that are already in
+        the store, looked up with one IN query per chunk.
+        """
+        wanted: List[str] = list(dict.fromkeys(uuids))
+        with self.lock:
+            found: Set[str] = {x for x in wanted if x in self.pending}
+            rest: List[str] = [x for x in wanted if x not in found]
+            try:
+                for i in range(0, len(rest), MAX_VARIABLES):
+                    chunk: List[str] = rest[i:i + MAX_VARIABLES]
+                    rows = self.conn.execute(
+                        f'SELECT id FROM downloaded WHERE id IN ({",".join("?" * len(chunk))})', chunk
+                    )
+                    found.update(row[0] for row in rows)
+            except sqlite3.Error as e:
+                logger.error(f"[UUIDSetStore] Lookup failed: {e}")
+        return found
+
+    def compact(self) -> None:
+        """Fold the WAL back into the database and rebuild it to drop free pages."""
+        try:
+            with self.lock:
+                self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self.conn.execute('VACUUM')
+        except sqlite3.Error as e:
+            # 其他程序正在讀寫時無法 VACUUM，下次再做
+            logger.warning(f"[UUIDSetStore] Compaction skipped: {e}")
 
     def stop(self) -> None:
         """
-        Signal the background thread to finish processing and save
-        remaining data to disk before exiting.
+        Signal the background thread to write the remaining queued IDs
+        and close the database before exiting.
         """
         try:
             if not self.stop_event.is_set():
                 self.stop_event.set()
+                self.task_queue.put(None)
                 self.worker_thread.join()
-                self._save()
+                with self.lock:
+                    self.conn.close()
         except KeyboardInterrupt:
             pass
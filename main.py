@@ -9,6 +9,7 @@ import rich.traceback
 from lib.account.berriz_create_community import BerrizCreateCommunity
 from unit.community.community import custom_dict
 from lib.click_types import *
+from lib.session_pool import close_cdn_sessions
 from static.help import print_help
 from static.color import Color
 from unit.handle.handle_log import setup_logging
@@ -31,16 +32,19 @@ else:
 
 
 async def main():
-    if not community():
-        community_id, communityname = await BerrizCreateCommunity(await cm(group()), group()).community_id_name()
-        custom_name: Optional[str] = await custom_dict(communityname)
-        logger.info(
-            f"{Color.fg('spring_green')}Community:"
-            f"{Color.reset()}［{Color.fg('turquoise')}{custom_name}{Color.reset()}］"
-        )
-        await Handle_Choice(community_id, communityname, time_a, time_b).handle_choice()
-    else:
-        await get_community_print()
+    try:
+        if not community():
+            community_id, communityname = await BerrizCreateCommunity(await cm(group()), group()).community_id_name()
+            custom_name: Optional[str] = await custom_dict(communityname)
+            logger.info(
+                f"{Color.fg('spring_green')}Community:"
+                f"{Color.reset()}［{Color.fg('turquoise')}{custom_name}{Color.reset()}］"
+            )
+            await Handle_Choice(community_id, communityname, time_a, time_b).handle_choice()
+        else:
+            await get_community_print()
+    finally:
+        await close_cdn_sessions()
         
 if __name__ == '__main__':
     if show_help():
@@ -1,7 +1,11 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import orjson
 
 
+# 仍在直播中的 liveStatus，結束後會變成 END 或 REPLAY
+ON_AIR_STATUSES: Tuple[str, ...] = ('LIVE', 'ON_AIR', 'ONAIR')
+
+
 class PlaybackInfo:
     def __init__(self, playback_context: Dict[str, Any]):
         if isinstance(playback_context, dict):
@@ -147,7 +151,8 @@ class LivePlaybackInfo:
         live: Dict[str, Any] = media.get("live", {})
         self.live_status: Optional[str] = live.get("liveStatus")
 
-        replay: Dict[str, Any] = live.get("replay", {})
+        # 直播中還沒有 replay，播放資訊放在 playback
+        replay: Dict[str, Any] = live.get("replay") or live.get("playback") or {}
         self.duration: Optional[int] = replay.get("duration")
         self.orientation: Optional[str] = replay.get("orientation")
         self.is_drm: Optional[bool] = replay.get("isDrm")
@@ -219,6 +224,10 @@ class LivePlaybackInfo:
         # Optional rating assessment
         self.video_rating_assessment: Optional[Dict[str, Any]] = data.get("videoRatingAssessment")
 
+    @property
+    def on_air(self) -> bool:
+        return self.live_status in ON_AIR_STATUSES
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert all data to dictionary"""
         if self.code != "0000":
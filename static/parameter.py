@@ -1,11 +1,47 @@
+from contextvars import ContextVar, Token
 from functools import wraps
-from typing import Callable, Any, Dict, Optional, TypeVar, Type
+from typing import Callable, Any, Dict, FrozenSet, Optional, TypeVar, Type
 
 # 定義一個 TypeVar 來表示被裝飾函式的型別以保留原始簽名資訊
 F = TypeVar('F', bound=Callable[..., Any])
 # 定義一個 TypeVar 來表示 ParamStore 類別本身
 T = TypeVar('T', bound='ParamStore')
 
+# 每個媒體各自的狀態旗標，多個媒體同時處理時不能互相覆寫
+ITEM_SCOPED_KEYS: FrozenSet[str] = frozenset({
+    'mpd_audio', 'mpd_video', 'hls_audio', 'hls_video', 'slice_path_fail', 'no_video_audio',
+})
+_item_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar('paramstore_item_scope', default=None)
+
+
+class _ScopedStore(dict):
+    """ITEM_SCOPED_KEYS 在媒體範圍內時讀寫該媒體自己的副本，其餘鍵維持全域"""
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        scope: Optional[Dict[str, Any]] = _item_scope.get()
+        if scope is not None and key in ITEM_SCOPED_KEYS:
+            scope[key] = value
+        else:
+            super().__setitem__(key, value)
+
+    def __getitem__(self, key: str) -> Any:
+        scope: Optional[Dict[str, Any]] = _item_scope.get()
+        if scope is not None and key in ITEM_SCOPED_KEYS:
+            return scope[key]
+        return super().__getitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        scope: Optional[Dict[str, Any]] = _item_scope.get()
+        if scope is not None and key in ITEM_SCOPED_KEYS:
+            return key in scope
+        return super().__contains__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        scope: Optional[Dict[str, Any]] = _item_scope.get()
+        if scope is not None and key in ITEM_SCOPED_KEYS:
+            return scope.get(key, default)
+        return super().get(key, default)
+
 
 class ParamStore:
     # 類別變數的型別註釋
@@ -20,7 +56,7 @@ class ParamStore:
             # Type hinting for super().__new__(cls) returns an instance of T
             cls._instance = super().__new__(cls)
             # 在 __new__ 中進行初始化以確保 _store 只被建立一次
-            cls._instance._store = dict(external_dict) if external_dict else {}
+            cls._instance._store = _ScopedStore(external_dict or {})
             # 標記已初始化以便 __init__ 跳過重複的初始化邏輯
             cls._instance._initialized = True
         return cls._instance
@@ -30,7 +66,7 @@ class ParamStore:
         # 單例模式中__init__ 僅在第一次實例化時執行核心邏輯
         if not hasattr(self, '_initialized'):
             # 由於 __new__ 已經處理了 _store 的初始化和 _initialized 的設定
-            self._store = dict(external_dict) if external_dict else {}
+            self._store = _ScopedStore(external_dict or {})
             self._initialized = True
     
     # 裝飾器的方法型別註釋
@@ -55,8 +91,22 @@ class ParamStore:
     def has(self, key: str) -> bool:
         return key in self._store
 
+    # 透過 paramstore[key] 讀寫，ITEM_SCOPED_KEYS 會落在目前媒體的範圍內
+    def __getitem__(self, key: str) -> Any:
+        return self._store[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._store[key] = value
+
     # all 方法的型別註釋回傳一個副本 (Dict[str, Any])
     def all(self) -> Dict[str, Any]:
         return dict(self._store)
 
+    def begin_item_scope(self) -> Token:
+        """開始一個媒體範圍，之後同一個 context 內的 ITEM_SCOPED_KEYS 互不干擾"""
+        return _item_scope.set({})
+
+    def end_item_scope(self, token: Token) -> None:
+        _item_scope.reset(token)
+
 paramstore: ParamStore = ParamStore()
\ No newline at end of file
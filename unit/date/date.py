@@ -1,7 +1,7 @@
 import re
 from datetime import datetime, timedelta, timezone
 from dateutil import parser as dateutil_parser
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 from inputimeout import inputimeout, TimeoutOccurred
 
@@ -253,4 +253,33 @@ def get_formatted_publish_date(published_at: str, fmt :str) -> Optional[str]:
     if published_at:
         dt:str = TimeHandler(published_at).convert_utc_to_offset_time(brisbane_offset, fmt)
         return dt
-    return None
\ No newline at end of file
+    return None
+
+def parse_published_at(published_at: Optional[str]) -> Optional[datetime]:
+    """API 的 ISO 8601 時間（結尾 Z）轉成帶時區的 datetime，無法解析時回傳 None"""
+    if not published_at:
+        return None
+    try:
+        return datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def window_start(time_a: Optional[datetime], time_b: Optional[datetime]) -> Optional[datetime]:
+    """時間範圍的起點；兩端都有值時才會篩選，與各篩選條件 time_a <= published_at <= time_b 一致"""
+    if isinstance(time_a, datetime) and isinstance(time_b, datetime):
+        return time_a
+    return None
+
+def page_before_window(published: Iterable[Optional[str]], start: Optional[datetime]) -> bool:
+    """列表由新到舊排序：整頁都早於 start 時，之後的頁面也不會落在時間範圍內；
+    有無法解析的日期或空頁時不提前停止"""
+    if start is None:
+        return False
+    newest: Optional[datetime] = None
+    for value in published:
+        dt: Optional[datetime] = parse_published_at(value)
+        if dt is None:
+            return False
+        if newest is None or dt > newest:
+            newest = dt
+    return newest is not None and newest < start
@@ -1,18 +1,23 @@
 import asyncio
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 from lib.__init__ import use_proxy
+from lib.community_index import CommunityIndex, IndexSync, open_index
 from lib.lock_cookie import cookie_session
 from mystate.fanclub import FanClub
 from static.color import Color
 from static.parameter import paramstore
+from unit.date.date import page_before_window, window_start
 from unit.handle.handle_log import setup_logging
 from unit.http.request_berriz_api import Live, MediaList
 
 MediaItem = Dict[str, Union[str, Dict, bool]]
 SelectedMedia = Dict[str, List[Dict]]
 
+# 每頁筆數；太大時第一個回應很慢，太小則請求次數過多
+PAGE_SIZE: int = 100
+
 
 logger = setup_logging('GetMediaList', 'turquoise')
 
@@ -40,10 +45,14 @@ class MediaParser:
         self.time_b: Optional[datetime] = time_b
         self.fcinfo = None
         self.FanClubFilter = FanClubFilter()
+        # Fanclub 身份每個社群只查詢一次，兩個 cursor 同時解析時共用同一個請求
+        self._fcinfo_task: Optional[asyncio.Future] = None
     
     async def parse(self, _data: Dict[str, Any]) -> Tuple[List[Dict], List[Dict], List[Dict], Optional[str], bool]:
         # Fanclub 身份檢查
-        FCINFO: Optional[Any] = await self.FanClubFilter.is_fanclub()
+        if self._fcinfo_task is None:
+            self._fcinfo_task = asyncio.ensure_future(self.FanClubFilter.is_fanclub())
+        FCINFO: Optional[Any] = await self._fcinfo_task
         self.fcinfo = FCINFO
         
         # Chunk 1: extract core
@@ -145,6 +154,13 @@ class MediaParser:
                     not_fanclub.append(item)
         return fanclub, not_fanclub
 
+    def before_window(self, _data: Dict[str, Any]) -> bool:
+        """列表由新到舊排序：整頁都早於時間範圍時，後面的頁面也不會落在範圍內"""
+        return page_before_window(
+            ((item.get("media") or {}).get("publishedAt") for item in _data.get("data", {}).get("contents", [])),
+            window_start(self.time_a, self.time_b),
+        )
+
     async def _extract_pagination(self, _data: Dict[str, Any]) -> Tuple[Optional[str], bool]:
         pagination: Dict[str, Any] = _data.get("data", {})
         cursor: Optional[str] = pagination.get("cursor", {}).get("next")
@@ -159,80 +175,62 @@ class MediaFetcher:
         self.MP: MediaParser = MediaParser(community_id, communityname, time_a, time_b)
         self.LIVE: classmethod = Live()
         self.MediaList: classmethod = MediaList()
+        self.index: Optional[CommunityIndex] = open_index(community_id)
 
     async def get_all_media_lists(self) -> Tuple[List[Dict], List[Dict], List[Dict]] | bool:
-        vod_total: List[Dict] = []
-        photo_total: List[Dict] = []
-        live_total: List[Dict] = []
-        params: Dict[str, Any] = await self._build_params(cursor=None)
-
-        while True:
-            media_data , live_data = await self._fetch_data(params)
-            
-            if not (media_data or live_data):
-                self.error_printer(media_data, live_data)
-                break
-
-            # 並行解析 + build params
-            (vods, photos, params_media, has_next_media), \
-            (lives, params_live, has_next_live) = await asyncio.gather(
-                self._process_media_chunk(media_data),
-                self._process_live_chunk(live_data),
-            )
-
-            vod_total  .extend(vods)
-            photo_total.extend(photos)
-            live_total .extend(lives)
-
-            if not (has_next_media or has_next_live):
-                break
-
-            # 合併下一輪要用的 params
-            params = {
-                "media": params_media,
-                "live":  params_live,
-            }
-
+        # 媒體與直播回放各自沿著自己的 cursor 翻頁，互不等待
+        media_pages, live_pages = await asyncio.gather(
+            self._walk(self.MediaList.media_list, 'Media data', 'media'),
+            self._walk(self.LIVE.fetch_live_replay, 'Live data', 'live'),
+        )
+        vod_total: List[Dict] = [item for vods, _, _, _, _ in media_pages for item in vods]
+        photo_total: List[Dict] = [item for _, photos, _, _, _ in media_pages for item in photos]
+        live_total: List[Dict] = [item for _, _, lives, _, _ in live_pages for item in lives]
         return vod_total, photo_total, live_total
 
-    def error_printer(self, media_data: Dict[str, Any], live_data: Dict[str, Any]):
-        if not media_data and live_data:
-            M = 'Media data'
-        elif not live_data and media_data:
-            M = 'Live data'
-        else:
-            M = 'Media and Live data'
-            logger.warning(
-                f"Fail to get 【{Color.fg('light_yellow')}{M}"
-                f"{Color.fg('gold')}】"
-            )
-
-    async def _fetch_data(
-        self, params: Dict[str, Any]
-    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-            async with asyncio.TaskGroup() as tg:
-                media_task = tg.create_task(self.MediaList.media_list(self.community_id, params, use_proxy))
-                live_task = tg.create_task(self.LIVE.fetch_live_replay(self.community_id, params, use_proxy))
-            
-            media_data = media_task.result()
-            live_data = live_task.result()
-            return media_data, live_data
-
-    async def _process_media_chunk(
-        self, media_data: Dict[str, Any]) -> Tuple[List[Dict], List[Dict], Dict[str, Any], bool]:
-        vods, photos, _, cursor, has_next = await self.MP.parse(media_data)
-        next_params: Dict[str, Any] = await self._build_params(cursor)
-        return vods, photos, next_params, has_next
-
-    async def _process_live_chunk(
-        self, live_data: Dict[str, Any]) -> Tuple[List[Dict], Dict[str, Any], bool]:
-        _, _, lives, cursor, has_next = await self.MP.parse(live_data)
-        next_params: Dict[str, Any] = await self._build_params(cursor)
-        return lives, next_params, has_next
-    
+    async def _walk(self, fetch: Callable[..., Awaitable[Optional[Dict[str, Any]]]], name: str, kind: str) -> List[Tuple]:
+        """依 cursor 逐頁取得單一列表；解析第 N 頁時第 N+1 頁已經在請求中，
+        整頁都早於 time_a 或接上本機索引上次同步的位置時提前停止"""
+        pages: List[Tuple] = []
+        sync: Optional[IndexSync] = self.index.sync(kind) if self.index is not None else None
+        complete: bool = False
+        fetched: int = 0
+        task: Optional[asyncio.Task] = asyncio.create_task(
+            fetch(self.community_id, await self._build_params(None), use_proxy)
+        )
+        try:
+            while task is not None:
+                data: Optional[Dict[str, Any]] = await task
+                task = None
+                if not self.MP._is_valid_response(data):
+                    self.error_printer(name, fetched)
+                    break
+                fetched += 1
+                cursor, has_next = await self.MP._extract_pagination(data)
+                reached: bool = sync.add_page(await self.MP._get_contents(data), cursor) if sync else False
+                complete = reached or not (has_next and cursor)
+                if not complete and not self.MP.before_window(data):
+                    task = asyncio.create_task(fetch(self.community_id, await self._build_params(cursor), use_proxy))
+                if sync is None:
+                    pages.append(await self.MP.parse(data))
+        finally:
+            if task is not None:
+                task.cancel()
+        if sync is not None:
+            # 新頁面已寫入索引，選單改由索引提供完整列表
+            contents: List[Dict] = await asyncio.to_thread(sync.finish, complete)
+            pages.append(await self.MP.parse({"code": "0000", "data": {"contents": contents}}))
+        logger.debug(f"{name}: {fetched} pages")
+        return pages
+
+    def error_printer(self, name: str, page: int) -> None:
+        logger.warning(
+            f"Fail to get 【{Color.fg('light_yellow')}{name}"
+            f"{Color.fg('gold')}】 page {page + 1}{Color.reset()}"
+        )
+
     async def _build_params(self, cursor: Optional[str]) -> Dict[str, Any]:
-        pagesize: int = 999999999
-        params: Dict[str, Any] = {"pageSize": pagesize, "languageCode": "en"}
+        params: Dict[str, Any] = {"pageSize": PAGE_SIZE, "languageCode": "en"}
         if cursor:
             params["next"] = cursor
-        return params
\ No newline at end of file
+        return params
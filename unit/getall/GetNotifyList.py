@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple, Union, Callable, Awaitable
 
 from lib.__init__ import use_proxy
+from unit.date.date import page_before_window, window_start
 from unit.handle.handle_log import setup_logging
 from unit.http.request_berriz_api import Notify
 
@@ -20,6 +21,8 @@ class NotifyFetcher:
         params: Dict[str, Any] = {"pageSize": 100, "languageCode": "en"}
         all_contents: List[Dict[str, Any]] = []
 
+        start: Optional[datetime] = window_start(time_a, time_b)
+
         while True:
             self.json_data = await self._fetch_data(params)
             if not self.json_data:
@@ -27,7 +30,8 @@ class NotifyFetcher:
 
             contents, params, hasNext = await self.basic_sort_josn()
             all_contents.extend(contents)
-            if hasNext is False:
+            # 通知由新到舊排序，整頁都早於時間範圍時不必再往下翻
+            if hasNext is False or page_before_window((item.get('publishedAt') for item in contents), start):
                 live_list: List[Dict[str, Any]] = await Process_Notify(all_contents)._extract_media_items(time_a, time_b)
                 return live_list
         return None
@@ -5,6 +5,9 @@ import random
 
 import aiohttp
 
+from lib.concurrency import AdaptiveLimiter, get_limiter
+from lib.ratelimit import throttle
+from lib.session_pool import get_cdn_session
 from static.color import Color
 from lib.path import Path
 from unit.handle.handle_log import setup_logging
@@ -33,7 +36,6 @@ class ImageDownloader:
         total=30.0,
         connect=13.0,
     )
-    _connector_limit: int = 50
     _file_io_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
     _file_write_max_retries: int = 3
     _file_write_base_delay: float = 0.5
@@ -78,6 +80,7 @@ class ImageDownloader:
             # Collect all chunks in memory first
             async for chunk in response.content.iter_chunked(10240):
                 chunks.append(chunk)
+                await throttle(len(chunk), 'image')
             
             # Offload blocking file I/O to thread pool with retry
             loop = asyncio.get_running_loop()
@@ -123,17 +126,23 @@ class ImageDownloader:
         Returns:
             True if download successful, False otherwise
         """
+        limiter: AdaptiveLimiter = get_limiter(str(url))
+
         async def _download_with_session(sess: aiohttp.ClientSession) -> bool:
             for attempt in range(7, 14):
                 try:
-                    async with sess.get(url) as resp:
+                    async with limiter, sess.get(url, headers=ImageDownloader._headers, timeout=ImageDownloader._timeout) as resp:
                         logger.info(f"{Color.fg('light_gray')}{url}{Color.reset()} - {Color.fg('graphite')}{resp.status}{Color.reset()}")
+                        limiter.on_status(resp.status, resp.headers)
                         resp.raise_for_status()
                         logger.info(f"{Color.fg('periwinkle')}{file_path}{Color.reset()}")
                         await ImageDownloader._write_to_file(resp, file_path)
+                        limiter.observe(resp.content_length or 0)
                     return True
                     
-                except (aiohttp.ClientError, aiohttp.http_exceptions.HttpProcessingError) as e:
+                except (aiohttp.ClientError, aiohttp.http_exceptions.HttpProcessingError, asyncio.TimeoutError) as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        limiter.on_timeout()
                     logger.warning(f"[Network Attempt {attempt}/10] Failed to download {url}: {e}")
                     if attempt == 10:
                         logger.error(f"{url} download failed after 10 attempts")
@@ -158,17 +167,11 @@ class ImageDownloader:
                     raise
             return False
 
-        # Use provided session or create temporary one
+        # Use provided session or the process-wide CDN session pool
         if session:
             return await _download_with_session(session)
         else:
-            connector = aiohttp.TCPConnector(limit=ImageDownloader._connector_limit)
-            async with aiohttp.ClientSession(
-                headers=ImageDownloader._headers,
-                timeout=ImageDownloader._timeout,
-                connector=connector
-            ) as temp_session:
-                return await _download_with_session(temp_session)
+            return await _download_with_session(await get_cdn_session())
 
     @classmethod
     def shutdown_executor(cls) -> None:
@@ -2,7 +2,7 @@ import asyncio
 import os
 import sys
 from functools import lru_cache
-from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from pathlib import Path
 
 import aiofiles
@@ -10,6 +10,7 @@ import yaml
 
 from lib.lock_cookie import cookie_session
 from lib.media_queue import MediaQueue
+from lib.pipeline import Pipeline
 from lock.donwnload_lock import UUIDSetStore
 from static.color import Color
 from static.route import Route
@@ -90,6 +91,8 @@ class MediaProcessor:
         """Initialize the MediaProcessor with a UUIDSetStore."""
         self.store: UUIDSetStore = UUIDSetStore()
         self.selected_media = selected_media
+        # ID → 標題，第一次需要回報略過項目時才建立
+        self._title_map: Optional[Dict[str, str]] = None
         # 實例變數的類型提示
         self.media_processors: Dict[str, MediaProcessor.ProcessorFunc] = {
             "VOD": self._process_vod_items,
@@ -140,17 +143,24 @@ class MediaProcessor:
                 ]
                 await asyncio.gather(*tasks)
             case None:
-                media_id_list = []
-                for media_id, media_type in media_ids:
-                    media_id_list.append(media_id)
-                    self.print_process_items(media_ids, media_type)
-                    skip_media_id = await self._check_download_pkl(media_id)
-                    if skip_media_id:
-                        await self._handle_choice(skip_media_id)
-                        continue
-                    if self.cookie_check(media_ids):
+                media_id_list = [media_id for media_id, _ in media_ids]
+                jobs: List[Tuple[str, Awaitable[None]]] = []
+                self.print_process_items(media_ids, media_ids[0][1])
+                skipped: Set[str] = await self._check_download_batch(media_id_list)
+                await self._handle_choice([media_id for media_id in map(str, media_id_list) if media_id in skipped])
+                pending: List[Tuple[str, str]] = [
+                    (media_id, media_type) for media_id, media_type in media_ids if str(media_id) not in skipped
+                ]
+                if pending and self.cookie_check(media_ids):
+                    for media_id, media_type in pending:
                         processor: BerrizProcessor = BerrizProcessor(media_id, media_type, self.selected_media)
-                        await processor.run()
+                        jobs.append((media_id, processor.run()))
+                # 多個媒體時分階段排程，下一個媒體下載時上一個可以同時混流
+                if len(jobs) > 1:
+                    await Pipeline().run(jobs)
+                else:
+                    for _, job in jobs:
+                        await job
                 if video_dup is False and paramstore.get('key') is None:
                     self.add_to_duplicate(media_id_list)
 
@@ -178,23 +188,37 @@ class MediaProcessor:
         if notice_dup is False:
             self.add_to_duplicate(notice_ids)
 
-    async def _check_download_pkl(self, media_id: str | int) -> str | None:
-        """Check if media_id exists in the store."""
-        media_id_str = str(media_id)
-        
-        # 如果任何一個重複檢查為 False 且存在於 store 中，則返回 media_id
-        if any(dup is False for dup in [image_dup, video_dup, post_dup, notice_dup]) and self.store.exists(media_id_str):
-            return media_id_str
-        return None
-
-    async def _handle_choice(self, skip_media_id: str) -> None:
-        """Handle skipping media from 'vods' and 'photos' 'lives' 'post' 'notice' that already exist."""
-        for media_type in ("vods", "photos", 'lives', "post", "notice"):
-            for item in self.selected_media.get(media_type, []):
-                if str(item.get("mediaId")) == skip_media_id or item.get("postId") == skip_media_id:
+    async def _check_download_batch(self, media_ids: Iterable[str | int]) -> Set[str]:
+        """Return the media_ids that already exist in the store, resolved in one lookup."""
+        # 所有重複檢查都開啟時不需要查詢 store
+        if all(dup is not False for dup in [image_dup, video_dup, post_dup, notice_dup]):
+            return set()
+        return self.store.exists_many(str(media_id) for media_id in media_ids)
+
+    def _titles(self) -> Dict[str, str]:
+        if self._title_map is None:
+            self._title_map = {}
+            for media_type in ("vods", "photos", 'lives', "post", "notice"):
+                for item in self.selected_media.get(media_type, []):
                     title: str = item.get("title", "Unknown Title")
-                    logger.info(f"{Color.bg('crimson')}Already exists{Color.reset()}{Color.fg('light_gray')}, skip download.{Color.reset()}{Color.bg('amber')} {title}{Color.reset()}")
-                    return
+                    for key in ("mediaId", "postId"):
+                        if item.get(key) is not None:
+                            self._title_map.setdefault(str(item[key]), title)
+        return self._title_map
+
+    async def _handle_choice(self, skip_media_ids: List[str]) -> None:
+        """Report skipped media from 'vods' and 'photos' 'lives' 'post' 'notice' that already exist in one log line."""
+        if not skip_media_ids:
+            return
+        title_map: Dict[str, str] = self._titles()
+        titles: List[str] = [title_map.get(media_id, "Unknown Title") for media_id in skip_media_ids]
+        shown: str = ', '.join(titles) if len(titles) < 14 else f"{', '.join(titles[-13:])} ..."
+        logger.info(
+            f"{Color.bg('crimson')}Already exists{Color.reset()}{Color.fg('light_gray')}, skip download.{Color.reset()} "
+            f"{Color.fg('light_gray')}Count:{Color.reset()} {Color.fg('spring_green')}{len(titles)}{Color.reset()}"
+            f"{Color.bg('amber')} {shown}{Color.reset()}"
+        )
+        logger.debug(f"Skipped existing media: {dict(zip(skip_media_ids, titles))}")
 
     async def process_media_queue(
         self, media_queue: MediaQueue
@@ -206,17 +230,18 @@ class MediaProcessor:
         notice_ids: List[str] = []  # Temporary list to collect NOTICE media IDs
         tasks: List[asyncio.Task] = []  # List to collect async tasks
 
+        items: List[Tuple[str, str]] = []
         while not media_queue.is_empty():
-            item: Tuple[str, str] | None = media_queue.dequeue()
-            media_id: str
-            media_type: str
-            media_id, media_type = item
-            skip_media_id: str | None = await self._check_download_pkl(media_id) if await self.check_duplicate(media_type) else None
-            
-            if skip_media_id:
-                await self._handle_choice(skip_media_id)
+            items.append(media_queue.dequeue())
+        # 先一次查出所有已下載的 ID，再分類剩下的項目
+        skipped: Set[str] = await self._check_download_batch(
+            [media_id for media_id, media_type in items if await self.check_duplicate(media_type)]
+        )
+        await self._handle_choice([str(media_id) for media_id, _ in items if str(media_id) in skipped])
+
+        for media_id, media_type in items:
+            if str(media_id) in skipped:
                 continue
-            
             if media_type == "PHOTO":
                 photo_ids.append(media_id)  # Collect PHOTO media IDs
             elif media_type in("VOD", "LIVE"):
@@ -16,7 +16,7 @@ from key.local_vault import SQLiteKeyVault
 from key.msprpro import GetMPD_prd
 from key.pssh import GetMPD_wv
 
-from static.PlaybackInfo import LivePlaybackInfo, PlaybackInfo
+from static.PlaybackInfo import ON_AIR_STATUSES, LivePlaybackInfo, PlaybackInfo
 from static.PublicInfo import PublicInfo
 from static.api_error_handle import api_error_handle
 from static.color import Color
@@ -236,7 +236,7 @@ class BerrizProcessor:
                 elif self.media_type == 'LIVE':
                     lives_list = self.selected_media.get('lives', [])
                     LP = lives_list[0].get('live', {}).get('liveStatus') if lives_list else None
-                    if LP == 'REPLAY':
+                    if LP == 'REPLAY' or (LP in ON_AIR_STATUSES and CFG['Download']['live_record'] is True):
                         playback = await self.Playback_info.get_live_playback_info(self.media_id, use_proxy)
                         public = await self.Public_context.get_public_context(self.media_id, use_proxy)
                 return playback, public
@@ -274,16 +274,20 @@ class BerrizProcessor:
         
         logger.info(BerrizProcessor.print_title(public_info))
         key, dash_playback_url, raw_mpd, hls_playback_url, raw_hls = await self.drm_handle(playback_info)
-        if not any(not v for v in (dash_playback_url, raw_mpd, hls_playback_url, raw_hls)):
+        required = {
+            "dash_playback_url": dash_playback_url,
+            "raw_mpd": raw_mpd,
+            "hls_playback_url": hls_playback_url,
+            "raw_hls": raw_hls
+        }
+        if getattr(playback_info, "on_air", False):
+            # 直播中只以 HLS 錄製，不一定有 MPD
+            required = {"hls_playback_url": hls_playback_url, "raw_hls": raw_hls}
+            logger.info(f"{Color.fg('light_gray')}Live is on air, recording from the live edge{Color.reset()}")
+        if all(required.values()):
             await start_download(public_info, playback_info, key, raw_mpd, dash_playback_url, hls_playback_url, raw_hls)
         else:
-            missing = {
-                "dash_playback_url": dash_playback_url,
-                "raw_mpd": raw_mpd,
-                "hls_playback_url": hls_playback_url,
-                "raw_hls": raw_hls
-            }
-            for name, value in missing.items():
+            for name, value in required.items():
                 if not value:
                     logger.warning(f"Missing or invalid: {name} = {repr(value)}")
     
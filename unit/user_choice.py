@@ -8,7 +8,9 @@ from typing import Dict, List, Set, Tuple, Union, Optional, Any
 from InquirerPy import inquirer
 from InquirerPy.base.control import Choice
 
+from lib.load_yaml_config import CFG
 from static.color import Color
+from static.PlaybackInfo import ON_AIR_STATUSES
 from unit.handle.handle_log import setup_logging
 from unit.community.community import custom_dict, get_community
 
@@ -162,7 +164,11 @@ class InquirerPySelector:
             for n in picks:
                 if (t := display_map[n])[0] == "live":
                     item = self.live_items[t[1]]
-                    if item.get('live', {}).get('liveStatus') == 'REPLAY':
+                    live_status = item.get('live', {}).get('liveStatus')
+                    if live_status == 'REPLAY':
+                        lives.append(item)
+                    elif live_status in ON_AIR_STATUSES and CFG['Download']['live_record'] is True:
+                        # 直播中：從直播邊緣開始錄製
                         lives.append(item)
                     else:
                         logger.warning(
@@ -207,6 +213,8 @@ def format_core(item: Dict[str, Any], t: str) -> str:
                     return f"{item['live']['replay']['duration'] / 60:.1f}min"
                 case 'END':
                     return 'NO-Replay'
+                case status if status in ON_AIR_STATUSES:
+                    return 'ON-AIR'
 
         elif t == "post" and item.get("imageInfo"):
             image_count: str = f"{len(item.get('imageInfo')[1])}"